@@ -0,0 +1,222 @@
+"""
+Benchmarks de escalado sobre inventarios sintéticos.
+
+Para cada tamaño genera un inventario (ver benchmarks.generador) en un
+directorio temporal y mide las operaciones que dependen del número de activos:
+
+    generar_indices, generar_vault_completo, verificación del vault (la misma
+    que hace escanear_sistema / el arranque), las tres a partir de un único
+    recorrido (core.escaner), el plan de recalibraciones (core.planificador),
+    preparar_datos_velas, exportar_a_pdf (sobre una muestra) y anexado de
+    eventos al log.
+
+Uso:
+    python -m benchmarks.ejecutar [--tamanos 1000,10000,100000] [--salida resultados.json]
+
+Los resultados se escriben en JSON (por defecto en benchmarks/resultados/)
+para poder compararlos entre versiones.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import argparse
+import subprocess
+from datetime import datetime
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ_REPO not in sys.path:
+    sys.path.insert(0, RAIZ_REPO)
+
+from benchmarks.generador import crear_inventario  # noqa: E402
+
+TAMANOS_POR_DEFECTO = (1000, 10000, 100000)
+DIRECTORIO_RESULTADOS = os.path.join(RAIZ_REPO, "benchmarks", "resultados")
+
+
+def _medida(segundos, elementos):
+    return {
+        "segundos": round(segundos, 6),
+        "elementos": elementos,
+        "us_por_elemento": round(segundos * 1e6 / elementos, 3) if elementos else None,
+    }
+
+
+def _cronometrar(funcion, *args, **kwargs):
+    inicio = time.perf_counter()
+    resultado = funcion(*args, **kwargs)
+    return time.perf_counter() - inicio, resultado
+
+
+def _cargar_instrumentos():
+    instrumentos = []
+    for root, _, files in os.walk(os.path.join("data", "instrumentos")):
+        for file in files:
+            if file.endswith(".json"):
+                ruta = os.path.join(root, file)
+                with open(ruta, 'r', encoding='utf-8') as f:
+                    instrumentos.append((ruta, json.load(f)))
+    return instrumentos
+
+
+def medir_operaciones(activos, muestras_pdf=5, eventos_log=50):
+    """Mide las operaciones sobre el inventario del directorio actual"""
+    from core.indices import generar_indices
+    from core.seguridad import generar_vault_completo, invalidar_cache_hashes
+    from core.verificacion import iterar_verificacion
+    from core.grafica_generator import preparar_datos_velas
+    from core.logger import SessionLogger
+    from core.escaner import escanear
+    from core.planificador import planificar_inventario
+
+    operaciones = {}
+
+    t, _ = _cronometrar(generar_indices)
+    operaciones["generar_indices"] = _medida(t, activos)
+
+    t, _ = _cronometrar(planificar_inventario)
+    operaciones["planificar"] = _medida(t, activos)
+
+    # Cada operación por separado parte sin caché de hashes
+    invalidar_cache_hashes()
+    t, (_, total) = _cronometrar(generar_vault_completo)
+    operaciones["generar_vault_completo"] = _medida(t, total)
+
+    # Sin caché de hashes, como en el primer escaneo de una sesión
+    invalidar_cache_hashes()
+    t, verificadas = _cronometrar(lambda: sum(1 for _ in iterar_verificacion()))
+    operaciones["verificacion_vault"] = _medida(t, verificadas)
+
+    # Arranque + cierre con un solo recorrido: índices, verificación y vault
+    invalidar_cache_hashes()
+
+    def _combinado():
+        escaneo = escanear()
+        generar_indices(escaneo)
+        verificadas = sum(1 for _ in iterar_verificacion(rutas=escaneo["rutas"], hashes=escaneo["hashes"]))
+        generar_vault_completo(escaneo)
+        return verificadas
+    t, verificadas = _cronometrar(_combinado)
+    operaciones["escaneo_combinado"] = _medida(t, verificadas)
+
+    instrumentos = _cargar_instrumentos()
+    t, _ = _cronometrar(lambda: [preparar_datos_velas(d) for _, d in instrumentos])
+    operaciones["preparar_datos_velas"] = _medida(t, len(instrumentos))
+
+    if muestras_pdf:
+        from core.pdf_generator import exportar_a_pdf
+        destino = tempfile.mkdtemp(prefix="ici_")
+        try:
+            muestra = [d for _, d in instrumentos if d.get('historial')][:muestras_pdf]
+            t, _ = _cronometrar(lambda: [exportar_a_pdf(d, destino) for d in muestra])
+            operaciones["exportar_a_pdf"] = _medida(t, len(muestra))
+        finally:
+            shutil.rmtree(destino, ignore_errors=True)
+
+    if eventos_log:
+        logger = SessionLogger("metrologia_log.json")
+        logger.registrar_accion_administrativa("benchmark", "BENCHMARK")
+        t, _ = _cronometrar(lambda: [logger.log_event("NAV", f"Evento de prueba {i}") for i in range(eventos_log)])
+        operaciones["anexar_evento_log"] = _medida(t, eventos_log)
+
+    return operaciones
+
+
+def ejecutar(tamanos=TAMANOS_POR_DEFECTO, familias=10, calibraciones=3, puntos=5, lecturas=3,
+             semilla=2026, muestras_pdf=5, eventos_log=50, directorio_trabajo=None, mantener=False,
+             informar=print):
+    """
+    Returns:
+        dict: entorno, parámetros y medidas por tamaño
+    """
+    resultados = {}
+    anterior = os.getcwd()
+    for activos in tamanos:
+        raiz = tempfile.mkdtemp(prefix=f"inventario_{activos}_", dir=directorio_trabajo)
+        try:
+            informar(f"[{activos}] Generando inventario en {raiz}...")
+            t_generacion, resumen = _cronometrar(
+                crear_inventario, raiz, activos=activos, familias=familias, calibraciones=calibraciones,
+                puntos=puntos, lecturas=lecturas, semilla=semilla
+            )
+            os.chdir(raiz)
+            try:
+                operaciones = medir_operaciones(activos, muestras_pdf, eventos_log)
+            finally:
+                os.chdir(anterior)
+            resultados[str(activos)] = {
+                "activos": activos,
+                "inventario": resumen,
+                "generacion_s": round(t_generacion, 3),
+                "operaciones": operaciones,
+            }
+            for nombre, medida in operaciones.items():
+                informar(f"[{activos}] {nombre:<24} {medida['segundos']:>10.3f} s  "
+                         f"({medida['us_por_elemento']} µs/elemento)")
+        finally:
+            if not mantener:
+                shutil.rmtree(raiz, ignore_errors=True)
+
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "entorno": _entorno(),
+        "parametros": {
+            "familias": familias, "calibraciones": calibraciones, "puntos": puntos,
+            "lecturas": lecturas, "semilla": semilla, "muestras_pdf": muestras_pdf,
+            "eventos_log": eventos_log,
+        },
+        "resultados": resultados,
+    }
+
+
+def _entorno():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=RAIZ_REPO,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "procesadores": os.cpu_count(),
+        "commit": commit,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de escalado con inventarios sintéticos")
+    parser.add_argument("--tamanos", default=",".join(str(t) for t in TAMANOS_POR_DEFECTO),
+                        help="Número de activos por ejecución, separados por comas")
+    parser.add_argument("--familias", type=int, default=10)
+    parser.add_argument("--calibraciones", type=int, default=3)
+    parser.add_argument("--puntos", type=int, default=5)
+    parser.add_argument("--lecturas", type=int, default=3)
+    parser.add_argument("--semilla", type=int, default=2026)
+    parser.add_argument("--muestras-pdf", type=int, default=5, help="Informes ICI a exportar (0 para omitir)")
+    parser.add_argument("--eventos-log", type=int, default=50, help="Eventos a anexar al log (0 para omitir)")
+    parser.add_argument("--directorio-trabajo", help="Dónde generar los inventarios (por defecto, el temporal del sistema)")
+    parser.add_argument("--mantener", action="store_true", help="No borrar los inventarios generados")
+    parser.add_argument("--salida", help="Archivo JSON de resultados")
+    args = parser.parse_args(argv)
+
+    tamanos = [int(t) for t in args.tamanos.split(",") if t.strip()]
+    informe = ejecutar(tamanos, args.familias, args.calibraciones, args.puntos, args.lecturas,
+                       args.semilla, args.muestras_pdf, args.eventos_log,
+                       args.directorio_trabajo, args.mantener)
+
+    salida = args.salida
+    if not salida:
+        os.makedirs(DIRECTORIO_RESULTADOS, exist_ok=True)
+        salida = os.path.join(DIRECTORIO_RESULTADOS, f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(salida, 'w', encoding='utf-8') as f:
+        json.dump(informe, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""
+Generador de inventarios sintéticos reproducibles para los benchmarks.
+
+Crea, bajo un directorio raíz, la misma estructura que usa la aplicación:
+
+    data/instrumentos/<FAMILIA>/<ID>/<ID>.json   (con historial de calibraciones)
+    data/patrones/<FAMILIA>/<ID>/<ID>.json
+    hashes_vault.json, hashes_vault.merkle
+    metrologia_log.json, metrologia_log.hash
+
+El esquema de cada JSON es el de los archivos reales (mismas claves, tipos y
+formato de volcado) y todo se deriva de una semilla, de modo que dos
+ejecuciones con los mismos parámetros producen inventarios idénticos.
+"""
+
+import os
+import json
+import random
+from datetime import date, datetime, timedelta
+
+FECHA_BASE = date(2026, 1, 1)
+MATERIALES = ("Acero templado", "Cerámica", "Carburo de tungsteno")
+
+
+def _familias_instrumentos(n):
+    return [f"FAMILIA INSTRUMENTOS {i:03d}" for i in range(1, n + 1)]
+
+
+def _familias_patrones(n):
+    return [f"FAMILIA PATRONES {i:03d}" for i in range(1, n + 1)]
+
+
+def _id(prefijo, numero):
+    return f"{prefijo}-{numero:06d}"
+
+
+def _guardar_json(ruta, datos):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, indent=4, ensure_ascii=False)
+
+
+def _patron(rng, id_patron, familia, valor_nominal):
+    fecha = FECHA_BASE - timedelta(days=rng.randint(0, 900))
+    return {
+        "id": id_patron,
+        "familia": familia,
+        "descripcion": f"Patrón sintético {valor_nominal}mm",
+        "valor_nominal": valor_nominal,
+        "incertidumbre": round(rng.uniform(0.00005, 0.0003), 6),
+        "material": rng.choice(MATERIALES),
+        "clase": rng.choice(("0", "1", "2")),
+        "periodicidad_meses": rng.choice((12, 24)),
+        "fecha_ultima_calibracion": fecha.isoformat(),
+        "certificado": f"CERT-{id_patron}-{fecha.year}",
+    }
+
+
+def _calibracion(rng, fecha, rango_max, patrones, puntos, lecturas):
+    paso = rango_max / puntos
+    filas = []
+    error_maximo = 0.0
+    for p in range(1, puntos + 1):
+        nominal = round(paso * p, 3)
+        sesgo = rng.gauss(0, 0.002)
+        valores = [round(nominal + sesgo + rng.gauss(0, 0.0005), 6) for _ in range(lecturas)]
+        media = round(sum(valores) / lecturas, 6)
+        error = round(media - nominal, 6)
+        error_maximo = max(error_maximo, abs(error))
+        filas.append({
+            "id_patron": rng.choice(patrones),
+            "valor_nominal": nominal,
+            "media_lecturas": media,
+            "error": error,
+            "incertidumbre_k2": round(rng.uniform(0.001, 0.003), 6),
+            "lecturas": valores,
+        })
+    return {
+        "fecha_calibracion": fecha.strftime("%Y-%m-%d %H:%M"),
+        "responsable": "admin",
+        "puntos": filas,
+        "error_maximo": round(error_maximo, 6),
+        "apto": error_maximo <= 0.005,
+    }
+
+
+def _instrumento(rng, id_inst, familia, familia_patrones, patrones, calibraciones, puntos, lecturas):
+    rango_max = rng.choice((25, 50, 100, 150, 300))
+    historial = []
+    fecha = datetime.combine(FECHA_BASE, datetime.min.time()) - timedelta(days=365 * calibraciones)
+    for _ in range(calibraciones):
+        fecha += timedelta(days=rng.randint(300, 400), minutes=rng.randint(0, 600))
+        historial.append(_calibracion(rng, fecha, rango_max, patrones, puntos, lecturas))
+    return {
+        "id": id_inst,
+        "familia": familia,
+        "descripcion": f"Instrumento sintético 0-{rango_max}mm",
+        "rango_min": "0",
+        "rango_max": str(rango_max),
+        "resolucion": rng.choice((0.01, 0.001, 0.0001)),
+        "periodicidad_meses": rng.choice((6, 12, 24)),
+        "fecha_compra": (FECHA_BASE - timedelta(days=rng.randint(400, 4000))).isoformat(),
+        "fecha_ultima_calibracion": historial[-1]["fecha_calibracion"][:10] if historial else "",
+        "patrones_sugeridos": familia_patrones,
+        "incertidumbre_elemento": round(rng.uniform(0.001, 0.003), 6),
+        "historial": historial,
+    }
+
+
+def crear_inventario(raiz, activos=1000, familias=10, calibraciones=3, puntos=5, lecturas=3,
+                     proporcion_patrones=0.1, sesiones_log=None, eventos_por_sesion=20, semilla=2026):
+    """
+    Genera un inventario sintético completo bajo 'raiz'.
+
+    Args:
+        activos: número total de activos (instrumentos + patrones)
+        familias: familias de instrumentos (los patrones usan la mitad, mínimo 1)
+        calibraciones, puntos, lecturas: forma del historial de cada instrumento
+        proporcion_patrones: fracción de los activos que son patrones
+        sesiones_log: sesiones del log (por defecto, una por cada 100 activos)
+
+    Returns:
+        dict: resumen con el número de instrumentos, patrones, sesiones y la raíz de Merkle
+    """
+    from core.seguridad import generar_hash_archivo, guardar_vault_hashes
+    from core.merkle import construir_arbol, guardar_arbol, familia_de_ruta
+
+    rng = random.Random(semilla)
+    anterior = os.getcwd()
+    os.makedirs(raiz, exist_ok=True)
+    os.chdir(raiz)
+    try:
+        n_patrones = max(1, int(activos * proporcion_patrones))
+        n_instrumentos = max(0, activos - n_patrones)
+        fams_pat = _familias_patrones(max(1, familias // 2))
+        fams_inst = _familias_instrumentos(max(1, familias))
+
+        vault, familias_vault = {}, {}
+
+        ids_patrones = []
+        for i in range(n_patrones):
+            familia = fams_pat[i % len(fams_pat)]
+            id_patron = _id("PT", i + 1)
+            ruta = os.path.join("data", "patrones", familia, id_patron, f"{id_patron}.json")
+            _guardar_json(ruta, _patron(rng, id_patron, familia, (i % 20 + 1) * 5))
+            vault[id_patron] = generar_hash_archivo(ruta)
+            familias_vault[id_patron] = familia_de_ruta(ruta)
+            ids_patrones.append(id_patron)
+
+        for i in range(n_instrumentos):
+            familia = fams_inst[i % len(fams_inst)]
+            id_inst = _id("IN", i + 1)
+            ruta = os.path.join("data", "instrumentos", familia, id_inst, f"{id_inst}.json")
+            _guardar_json(ruta, _instrumento(rng, id_inst, familia, fams_pat[i % len(fams_pat)], ids_patrones,
+                                             calibraciones, puntos, lecturas))
+            vault[id_inst] = generar_hash_archivo(ruta)
+            familias_vault[id_inst] = familia_de_ruta(ruta)
+
+        guardar_vault_hashes(vault)
+        arbol = construir_arbol(vault, familias_vault)
+        guardar_arbol(arbol)
+
+        # Log de auditoría con el mismo formato que SessionLogger
+        if sesiones_log is None:
+            sesiones_log = max(1, activos // 100)
+        inicio = datetime.combine(FECHA_BASE, datetime.min.time()) - timedelta(days=sesiones_log)
+        log = []
+        for s in range(sesiones_log):
+            momento = inicio + timedelta(days=s)
+            eventos = [{"time": momento.strftime("%H:%M:%S"), "action": "SYSTEM: App iniciada"}]
+            for e in range(eventos_por_sesion - 1):
+                id_evento = _id("IN", rng.randint(1, max(1, n_instrumentos)))
+                eventos.append({"time": (momento + timedelta(seconds=e)).strftime("%H:%M:%S"),
+                                "action": f"NAV: Acceso a Ficha → {id_evento}"})
+            log.append({
+                "session_number": s + 1,
+                "start_time": momento.strftime("%Y-%m-%dT%H:%M:%S"),
+                "user": "admin",
+                "events": eventos,
+                "end_time": (momento + timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%S"),
+            })
+        log[-1]["events"].append({
+            "time": "23:59:59",
+            "action": f"SYSTEM: [CERRANDO APP] Hash vault: {arbol['raiz'][:16]}... "
+                      f"(total: {len(vault)} elementos) Raíz Merkle: {arbol['raiz']}"
+        })
+        with open("metrologia_log.json", 'w', encoding='utf-8') as f:
+            json.dump(log, f, indent=2, ensure_ascii=False)
+        with open("metrologia_log.hash", 'w', encoding='utf-8') as f:
+            f.write(generar_hash_archivo("metrologia_log.json"))
+
+        return {
+            "instrumentos": n_instrumentos,
+            "patrones": n_patrones,
+            "sesiones_log": sesiones_log,
+            "raiz_merkle": arbol["raiz"],
+        }
+    finally:
+        os.chdir(anterior)
@@ -0,0 +1,263 @@
+"""
+Almacén de adjuntos direccionado por contenido.
+
+Los certificados y documentos de cada activo se guardan una sola vez como
+blobs nombrados por su SHA-256 en <datos>/.adjuntos y se enlazan (hardlink,
+reflink o copia como último recurso) dentro de la carpeta 'documentos' del
+activo. Cada carpeta 'documentos' lleva un manifiesto con sus referencias y
+el hash del manifiesto se registra en el vault como '<ID>@adjuntos'.
+
+El almacén se sitúa en la carpeta de datos del propio activo
+(<datos>/<rama>/<familia>/<ID>), no en el directorio de trabajo, para que
+blobs y documentos queden en el mismo volumen y el hardlink sea posible.
+
+Los blobs no se marcan como de solo lectura: un hardlink comparte inodo, así
+que el permiso se aplicaría también a los documentos de cada ficha (y en
+Windows impediría borrar la carpeta del activo). Una edición en sitio de un
+documento enlazado altera el blob y todas sus copias, y verificar_adjuntos
+la detecta por el SHA-256.
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+from datetime import datetime
+
+from .seguridad import generar_hash_archivo, generar_y_guardar_hash_vault, cargar_vault_hashes
+
+CARPETA_BLOBS = ".adjuntos"
+RUTA_BLOBS = os.path.join("data", CARPETA_BLOBS)
+CARPETA_DOCUMENTOS = "documentos"
+NOMBRE_MANIFIESTO = ".manifiesto_adjuntos"
+SUFIJO_VAULT = "@adjuntos"
+
+_TAM_BLOQUE = 1024 * 1024
+
+
+def hash_contenido(ruta_archivo):
+    """SHA-256 del contenido (sin sal): es la dirección del blob en el almacén"""
+    h = hashlib.sha256()
+    with open(ruta_archivo, "rb") as f:
+        for bloque in iter(lambda: f.read(_TAM_BLOQUE), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def almacen_de_activo(carpeta_activo):
+    """Almacén de blobs de la carpeta de datos que contiene <datos>/<rama>/<familia>/<ID>"""
+    raiz = os.path.abspath(carpeta_activo)
+    for _ in range(3):
+        raiz = os.path.dirname(raiz)
+    return os.path.join(raiz, CARPETA_BLOBS)
+
+
+def ruta_blob(sha256, almacen=RUTA_BLOBS):
+    """Ruta del blob dentro del almacén (particionado por los 2 primeros caracteres)"""
+    return os.path.join(almacen, sha256[:2], sha256)
+
+
+def ruta_manifiesto(carpeta_activo):
+    """Ruta del manifiesto de adjuntos de un activo"""
+    return os.path.join(carpeta_activo, CARPETA_DOCUMENTOS, NOMBRE_MANIFIESTO)
+
+
+def clave_vault(id_elemento):
+    """Clave con la que se registra en el vault el manifiesto de un activo"""
+    return f"{id_elemento}{SUFIJO_VAULT}"
+
+
+def clave_vault_de_ruta(ruta_archivo):
+    """Clave del vault para un JSON de activo o para un manifiesto de adjuntos"""
+    nombre = os.path.basename(ruta_archivo)
+    if nombre == NOMBRE_MANIFIESTO:
+        return clave_vault(os.path.basename(os.path.dirname(os.path.dirname(ruta_archivo))))
+    return nombre.replace(".json", "")
+
+
+def _reflink(origen, destino):
+    """Clonado copy-on-write (btrfs/xfs). Lanza OSError si no está soportado"""
+    if not sys.platform.startswith("linux"):
+        raise OSError("reflink no soportado en esta plataforma")
+    import fcntl
+    FICLONE = 0x40049409
+    with open(origen, "rb") as f_src, open(destino, "wb") as f_dst:
+        try:
+            fcntl.ioctl(f_dst.fileno(), FICLONE, f_src.fileno())
+        except OSError:
+            f_dst.close()
+            os.remove(destino)
+            raise
+
+
+def _enlazar(origen, destino):
+    """Materializa un blob en 'destino': hardlink, reflink o copia. Devuelve el método usado"""
+    try:
+        os.link(origen, destino)
+        return "hardlink"
+    except OSError:
+        pass
+    try:
+        _reflink(origen, destino)
+        return "reflink"
+    except OSError:
+        pass
+    shutil.copy2(origen, destino)
+    return "copia"
+
+
+def almacenar_blob(ruta_origen, almacen=RUTA_BLOBS):
+    """
+    Guarda el archivo en el almacén si no existe ya un blob con su contenido.
+
+    Returns:
+        tuple: (sha256, tamaño en bytes)
+    """
+    sha = hash_contenido(ruta_origen)
+    destino = ruta_blob(sha, almacen)
+    if not os.path.exists(destino):
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        temporal = f"{destino}.tmp"
+        shutil.copy2(ruta_origen, temporal)
+        os.replace(temporal, destino)
+    return sha, os.path.getsize(destino)
+
+
+def cargar_manifiesto(carpeta_activo):
+    """Carga el manifiesto de adjuntos de un activo (vacío si no existe)"""
+    ruta = ruta_manifiesto(carpeta_activo)
+    if os.path.exists(ruta):
+        try:
+            with open(ruta, "r", encoding="utf-8") as f:
+                manifiesto = json.load(f)
+            if isinstance(manifiesto, dict) and isinstance(manifiesto.get("adjuntos"), dict):
+                return manifiesto
+        except (json.JSONDecodeError, OSError):
+            pass
+    return {"version": 1, "adjuntos": {}}
+
+
+def guardar_manifiesto(carpeta_activo, manifiesto):
+    """Guarda el manifiesto con orden estable para que su hash sea reproducible"""
+    ruta = ruta_manifiesto(carpeta_activo)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, indent=2, ensure_ascii=False, sort_keys=True)
+    os.replace(temporal, ruta)
+    return ruta
+
+
+def _nombre_libre(adjuntos, carpeta_docs, nombre, sha):
+    """Evita pisar un adjunto distinto con el mismo nombre: 'cert.pdf' -> 'cert (2).pdf'"""
+    base, ext = os.path.splitext(nombre)
+    candidato = nombre
+    n = 2
+    while True:
+        entrada = adjuntos.get(candidato)
+        if entrada is None and not os.path.exists(os.path.join(carpeta_docs, candidato)):
+            return candidato
+        if entrada is not None and entrada.get("sha256") == sha:
+            return candidato
+        candidato = f"{base} ({n}){ext}"
+        n += 1
+
+
+def registrar_adjunto(carpeta_activo, id_elemento, ruta_origen, nombre=None):
+    """
+    Añade un documento a la ficha de un activo a través del almacén.
+
+    Args:
+        carpeta_activo: Carpeta del activo (la que contiene <ID>.json)
+        id_elemento: ID del activo
+        ruta_origen: Archivo seleccionado por el usuario
+        nombre: Nombre visible en 'documentos' (por defecto, el del origen)
+
+    Returns:
+        tuple: (nombre final en 'documentos', sha256)
+    """
+    almacen = almacen_de_activo(carpeta_activo)
+    sha, tamano = almacenar_blob(ruta_origen, almacen)
+
+    carpeta_docs = os.path.join(carpeta_activo, CARPETA_DOCUMENTOS)
+    os.makedirs(carpeta_docs, exist_ok=True)
+
+    manifiesto = cargar_manifiesto(carpeta_activo)
+    adjuntos = manifiesto["adjuntos"]
+    nombre_final = _nombre_libre(adjuntos, carpeta_docs, nombre or os.path.basename(ruta_origen), sha)
+
+    destino = os.path.join(carpeta_docs, nombre_final)
+    if not os.path.exists(destino):
+        metodo = _enlazar(ruta_blob(sha, almacen), destino)
+    else:
+        metodo = adjuntos.get(nombre_final, {}).get("enlace", "copia")
+
+    if adjuntos.get(nombre_final, {}).get("sha256") != sha:
+        adjuntos[nombre_final] = {
+            "sha256": sha,
+            "tamano": tamano,
+            "enlace": metodo,
+            "fecha": datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+        }
+        ruta = guardar_manifiesto(carpeta_activo, manifiesto)
+        generar_y_guardar_hash_vault(ruta, clave_vault(id_elemento))
+
+    return nombre_final, sha
+
+
+def verificar_adjuntos(carpeta_activo, id_elemento, vault=None, blobs_verificados=None):
+    """
+    Verifica el manifiesto contra el vault y cada documento contra su SHA-256.
+
+    Los documentos enlazados por hardlink comparten inodo con su blob, por lo
+    que cada blob se verifica una sola vez aunque lo referencien varias fichas
+    (pasar el mismo diccionario 'blobs_verificados' entre llamadas).
+
+    Returns:
+        tuple: (ok, mensaje, lista de nombres con problemas)
+    """
+    ruta = ruta_manifiesto(carpeta_activo)
+    if not os.path.exists(ruta):
+        return True, "Sin adjuntos registrados", []
+
+    if vault is None:
+        vault = cargar_vault_hashes()
+    if blobs_verificados is None:
+        blobs_verificados = {}
+
+    hash_guardado = vault.get(clave_vault(id_elemento))
+    if hash_guardado is None:
+        return False, f"No existe hash en vault para los adjuntos de {id_elemento}", []
+    if generar_hash_archivo(ruta) != hash_guardado:
+        return False, f"Manifiesto de adjuntos de {id_elemento} modificado", []
+
+    problemas = []
+    almacen = almacen_de_activo(carpeta_activo)
+    carpeta_docs = os.path.join(carpeta_activo, CARPETA_DOCUMENTOS)
+    for nombre, entrada in cargar_manifiesto(carpeta_activo)["adjuntos"].items():
+        sha = entrada.get("sha256", "")
+        ruta_doc = os.path.join(carpeta_docs, nombre)
+        if not os.path.exists(ruta_doc):
+            problemas.append(nombre)
+            continue
+
+        blob = ruta_blob(sha, almacen)
+        try:
+            mismo_inodo = os.path.exists(blob) and os.path.samefile(ruta_doc, blob)
+        except OSError:
+            mismo_inodo = False
+
+        if mismo_inodo:
+            if sha not in blobs_verificados:
+                blobs_verificados[sha] = hash_contenido(blob) == sha
+            valido = blobs_verificados[sha]
+        else:
+            valido = hash_contenido(ruta_doc) == sha
+
+        if not valido:
+            problemas.append(nombre)
+
+    if problemas:
+        return False, f"Adjuntos alterados en {id_elemento}: {', '.join(problemas)}", problemas
+    return True, "Adjuntos verificados", []
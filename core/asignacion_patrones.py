@@ -0,0 +1,139 @@
+"""
+Asignación de patrones a los puntos de calibración de uno o varios instrumentos.
+
+    from core import asignacion_patrones
+
+    asignacion_patrones.sugerir(patrones, 5, rango_min=0, rango_max=150)   # [patron, ...] por nominal
+    asignacion_patrones.asignar([(0, 25), (0, 150), (0, 150)], patrones, 5)  # una lista por instrumento
+
+'patrones' son dicts con id, valor_nominal e incertidumbre (los de
+CalibrationWindow.cargar_patrones_disponibles o las filas de
+data/index_patrones.json); se devuelven los mismos dicts.
+
+Los valores ideales de cada instrumento se reparten a intervalos iguales
+entre el menor y el mayor nominal disponibles dentro de su rango (el primer y
+el último patrón, como hasta ahora). Cada punto admite los patrones cuyo
+nominal queda a medio paso o menos de su valor ideal: una ventana sobre los
+nominales ordenados que se obtiene con dos bisect. Entre los candidatos se
+elige el de menor coste:
+
+    coste = desviación / paso + PESO_INCERTIDUMBRE * u / u_max - PESO_REUTILIZACION * reutilización
+
+La reutilización vale 1 si el patrón ya está asignado en el lote y, si no, la
+mitad de la fracción de ventanas del lote que lo contienen (se cuentan todas de
+una vez con un array de diferencias). Así el rango queda cubierto de forma
+uniforme, se prefieren los patrones de menor incertidumbre y el lote se
+resuelve con pocos patrones distintos. Los puntos se resuelven de la ventana
+más estrecha a la más ancha; si a una no le queda ningún candidato libre (el
+instrumento ya usa todos) se toma el patrón libre más cercano de su rango.
+Los instrumentos con el mismo rango se resuelven una sola vez y reciben el
+mismo juego de patrones.
+"""
+
+import bisect
+from itertools import accumulate
+
+PUNTOS_DEFECTO = 5          # como la ventana de calibración
+PESO_INCERTIDUMBRE = 0.25
+PESO_REUTILIZACION = 0.25
+
+
+def _objetivos(nominales, inicio, final, num_puntos):
+    """(valores ideales, paso) de num_puntos entre el primer y el último nominal de nominales[inicio:final]"""
+    bajo, alto = nominales[inicio], nominales[final - 1]
+    if num_puntos == 1:
+        return [bajo], (alto - bajo) or 1.0
+    paso = (alto - bajo) / (num_puntos - 1)
+    return [bajo + k * paso for k in range(num_puntos)], paso or 1.0
+
+
+def _mas_cercano_libre(nominales, objetivo, inicio, final, elegidos):
+    """Índice libre (no en elegidos) de nominales[inicio:final] más cercano a objetivo"""
+    derecha = bisect.bisect_left(nominales, objetivo, inicio, final)
+    izquierda = derecha - 1
+    while izquierda >= inicio or derecha < final:
+        if derecha < final and (izquierda < inicio or
+                                nominales[derecha] - objetivo <= objetivo - nominales[izquierda]):
+            if derecha not in elegidos:
+                return derecha
+            derecha += 1
+        else:
+            if izquierda not in elegidos:
+                return izquierda
+            izquierda -= 1
+    return None
+
+
+def asignar(rangos, patrones, num_puntos,
+            peso_incertidumbre=PESO_INCERTIDUMBRE, peso_reutilizacion=PESO_REUTILIZACION):
+    """
+    Patrones de cada instrumento de un lote.
+
+    Args:
+        rangos: [(rango_min, rango_max)] de cada instrumento
+        patrones: dicts con id, valor_nominal e incertidumbre
+        num_puntos: puntos de calibración por instrumento
+
+    Returns:
+        list: por instrumento, los patrones elegidos ordenados por nominal
+              (todos los de su rango si no hay más de num_puntos)
+    """
+    ordenados = sorted(patrones, key=lambda p: (p['valor_nominal'], p['incertidumbre'], str(p.get('id'))))
+    nominales = [p['valor_nominal'] for p in ordenados]
+    rangos = [tuple(r) for r in rangos]
+    distintos = list(dict.fromkeys(rangos))
+    elegidos = [set() for _ in distintos]
+    usados = set()
+    puntos = []                               # (candidatos, instrumento, objetivo, paso, inicio, final, a, b)
+    diferencias = [0] * (len(ordenados) + 1)
+
+    for i, (rango_min, rango_max) in enumerate(distintos):
+        inicio = bisect.bisect_left(nominales, rango_min)
+        final = bisect.bisect_right(nominales, rango_max)
+        if final <= inicio or num_puntos <= 0:
+            continue
+        if num_puntos >= final - inicio:
+            elegidos[i].update(range(inicio, final))
+            usados.update(range(inicio, final))
+            continue
+        objetivos, paso = _objetivos(nominales, inicio, final, num_puntos)
+        for objetivo in objetivos:
+            a = bisect.bisect_left(nominales, objetivo - paso / 2, inicio, final)
+            b = bisect.bisect_right(nominales, objetivo + paso / 2, inicio, final)
+            puntos.append((b - a, i, objetivo, paso, inicio, final, a, b))
+            diferencias[a] += 1
+            diferencias[b] -= 1
+
+    cobertura = list(accumulate(diferencias))
+    cobertura_max = max(cobertura, default=0) or 1
+    u_max = max((p['incertidumbre'] for p in ordenados), default=0.0) or 1.0
+
+    puntos.sort(key=lambda p: p[:3])
+    for _, i, objetivo, paso, inicio, final, a, b in puntos:
+        mejor, coste_mejor = None, None
+        for j in range(a, b):
+            if j in elegidos[i]:
+                continue
+            reutilizacion = 1.0 if j in usados else cobertura[j] / (2 * cobertura_max)
+            coste = (abs(nominales[j] - objetivo) / paso
+                     + peso_incertidumbre * ordenados[j]['incertidumbre'] / u_max
+                     - peso_reutilizacion * reutilizacion)
+            if coste_mejor is None or coste < coste_mejor:
+                mejor, coste_mejor = j, coste
+        if mejor is None:
+            mejor = _mas_cercano_libre(nominales, objetivo, inicio, final, elegidos[i])
+        elegidos[i].add(mejor)
+        usados.add(mejor)
+
+    por_rango = {r: [ordenados[j] for j in sorted(indices)] for r, indices in zip(distintos, elegidos)}
+    return [list(por_rango[r]) for r in rangos]
+
+
+def sugerir(patrones, num_puntos, rango_min=float('-inf'), rango_max=float('inf')):
+    """Patrones para los puntos de un solo instrumento (ver asignar)"""
+    return asignar([(rango_min, rango_max)], patrones, num_puntos)[0]
+
+
+def patrones_distintos(asignacion):
+    """IDs distintos que usa una asignación (lo que hay que preparar para el lote)"""
+    return sorted({p.get('id') for elegidos in asignacion for p in elegidos}, key=str)
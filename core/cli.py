@@ -0,0 +1,399 @@
+"""
+Línea de comandos sin interfaz gráfica para tareas programadas.
+
+    python -m core indices
+    python -m core vault verificar
+    python -m core vault reconstruir --usuario admin
+    python -m core ici exportar [ID ...] [--destino DIR]
+    python -m core log verificar
+    python -m core log buscar [--tipo T] [--usuario U] [--activo ID] [--texto "..."] [--desde F] [--hasta F]
+    python -m core plan [--semanas N] [--desde AAAA-MM-DD] [--puntos N]
+    python -m core montecarlo [ID ...] [--muestras N] [--procesos N] [--historial]
+
+Todas las órdenes admiten --json (un único objeto JSON en la salida estándar)
+y --directorio (raíz de la instalación; las rutas de datos son relativas a ella).
+
+Códigos de salida: 0 correcto, 1 problema de integridad o fallos parciales,
+2 error de uso o de ejecución.
+"""
+
+import os
+import sys
+import json
+import argparse
+
+SALIDA_OK = 0
+SALIDA_PROBLEMAS = 1
+SALIDA_ERROR = 2
+
+RUTA_LOG = "metrologia_log.json"
+RUTA_HASH_LOG = "metrologia_log.hash"
+VARIABLE_PASSWORD = "METROLOGIA_PASSWORD"
+
+
+class ErrorCLI(Exception):
+    """Error de ejecución que termina la orden con SALIDA_ERROR"""
+
+
+# --- Órdenes ---------------------------------------------------------------
+
+def orden_indices(args):
+    from .indices import generar_indices
+    totales = generar_indices()
+    return SALIDA_OK, {"indices": totales}
+
+
+def orden_vault_verificar(args):
+    from .seguridad import cargar_vault_hashes, verificar_raiz_vault
+    from .escaner import escanear
+    from .verificacion import iterar_verificacion, id_activo_de_clave
+
+    vault = cargar_vault_hashes()
+    if not vault:
+        raise ErrorCLI("El vault de hashes no existe o está vacío")
+    escaneo = escanear(indexar=False)
+    rutas = escaneo["rutas"]
+
+    comprometidos, ausentes = [], []
+    integros = 0
+    for clave, estado, _ in iterar_verificacion(vault=vault, rutas=rutas, hashes=escaneo["hashes"]):
+        if estado is True:
+            integros += 1
+        elif estado is False:
+            comprometidos.append(clave)
+        else:
+            ausentes.append(clave)
+
+    registrados = {id_activo_de_clave(c) for c in vault}
+    sin_registrar = sorted(i for i in rutas if i not in registrados)
+
+    raiz_ok, raiz_actual, raiz_log = verificar_raiz_vault()
+    resultado = {
+        "total": len(vault),
+        "integros": integros,
+        "comprometidos": comprometidos,
+        "ausentes": ausentes,
+        "sin_registrar": sin_registrar,
+        "raiz_merkle": {"ok": raiz_ok, "actual": raiz_actual, "log": raiz_log},
+    }
+    problemas = comprometidos or sin_registrar or raiz_ok is False
+    return (SALIDA_PROBLEMAS if problemas else SALIDA_OK), resultado
+
+
+def _autorizar_admin(usuario):
+    """Misma regla que la interfaz: solo la cuenta 'admin' del grupo técnicos"""
+    from .credenciales import verificar
+
+    password = os.environ.get(VARIABLE_PASSWORD)
+    if password is None:
+        if not sys.stdin.isatty():
+            raise ErrorCLI(f"Contraseña no disponible: defina {VARIABLE_PASSWORD} o ejecute de forma interactiva")
+        import getpass
+        password = getpass.getpass(f"Contraseña de {usuario}: ")
+    datos = verificar(usuario, password)
+    if not datos or usuario != 'admin' or datos.get('user_type') != 'tecnicos':
+        raise ErrorCLI("Acceso denegado: se requieren credenciales de administrador")
+    return datos
+
+
+def orden_vault_reconstruir(args):
+    from .seguridad import generar_vault_completo, sellar_log_sistema
+    from .logger import SessionLogger
+
+    datos = _autorizar_admin(args.usuario)
+    nombre = datos.get('nombre_completo', args.usuario)
+
+    raiz, total = generar_vault_completo()
+    if not raiz:
+        raise ErrorCLI("No se pudo regenerar el vault")
+
+    # Sesión administrativa (no incrementa el contador) con la nueva raíz,
+    # y log resellado para que el siguiente arranque de la aplicación lo acepte
+    logger = SessionLogger(RUTA_LOG)
+    logger.registrar_accion_administrativa(
+        args.usuario, "REGENERACIÓN_VAULT",
+        f"Vault regenerado desde línea de comandos ({total} elementos) por {nombre}"
+    )
+    logger.log_hash_vault(raiz, total, "CLI")
+    logger.end_session()
+    sellar_log_sistema()
+    return SALIDA_OK, {"raiz_merkle": raiz, "total": total, "usuario": args.usuario}
+
+
+def _activos_con_historial(ids=None):
+    """[(id, ruta_json, data)] de los instrumentos con calibraciones registradas"""
+    from .verificacion import mapa_rutas_activos
+
+    rutas = mapa_rutas_activos()
+    if ids:
+        desconocidos = [i for i in ids if i not in rutas]
+        if desconocidos:
+            raise ErrorCLI(f"Activos no encontrados: {', '.join(desconocidos)}")
+        seleccion = ids
+    else:
+        seleccion = sorted(rutas)
+
+    activos = []
+    for id_activo in seleccion:
+        with open(rutas[id_activo], 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('historial'):
+            activos.append((id_activo, rutas[id_activo], data))
+    return activos
+
+
+def orden_ici_exportar(args):
+    # fpdf y matplotlib solo se cargan en esta orden
+    from .pdf_generator import exportar_a_pdf
+
+    if args.destino:
+        os.makedirs(args.destino, exist_ok=True)
+
+    generados, fallidos = [], []
+    for id_activo, ruta_json, data in _activos_con_historial(args.ids):
+        try:
+            ruta_pdf = exportar_a_pdf(data, args.destino or ruta_json)
+            generados.append({"id": id_activo, "pdf": ruta_pdf})
+        except Exception as e:
+            fallidos.append({"id": id_activo, "error": str(e)})
+
+    codigo = SALIDA_PROBLEMAS if fallidos else SALIDA_OK
+    return codigo, {"generados": generados, "fallidos": fallidos}
+
+
+def orden_log_verificar(args):
+    from .seguridad import generar_hash_archivo, obtener_ultima_raiz_merkle_del_log
+    from .serializacion import cargar_archivo
+
+    if not os.path.exists(RUTA_LOG):
+        raise ErrorCLI(f"No existe {RUTA_LOG}")
+    try:
+        sesiones = cargar_archivo(RUTA_LOG)
+    except json.JSONDecodeError as e:
+        return SALIDA_PROBLEMAS, {"integro": False, "motivo": f"Log ilegible: {e}"}
+
+    hash_actual = generar_hash_archivo(RUTA_LOG)
+    hash_guardado = None
+    if os.path.exists(RUTA_HASH_LOG):
+        with open(RUTA_HASH_LOG, 'r', encoding='utf-8') as f:
+            hash_guardado = f.read().strip()
+
+    integro = hash_guardado is not None and hash_actual == hash_guardado
+    resultado = {
+        "integro": integro,
+        "hash_actual": hash_actual,
+        "hash_guardado": hash_guardado,
+        "sesiones": len(sesiones),
+        "eventos": sum(len(s.get('events', [])) for s in sesiones),
+        "ultima_raiz_merkle": obtener_ultima_raiz_merkle_del_log(),
+    }
+    if hash_guardado is None:
+        resultado["motivo"] = f"No existe {RUTA_HASH_LOG}"
+    elif not integro:
+        resultado["motivo"] = "El log no coincide con su hash guardado"
+    return (SALIDA_OK if integro else SALIDA_PROBLEMAS), resultado
+
+
+def orden_log_buscar(args):
+    from .indice_eventos import consultar, reconstruir_indice
+
+    if args.reconstruir:
+        reconstruir_indice(RUTA_LOG)
+    eventos = consultar(tipo=args.tipo, usuario=args.usuario, sesion=args.sesion,
+                        desde=args.desde, hasta=args.hasta, activo=args.activo,
+                        texto=args.texto, limite=args.limite, ruta_log=RUTA_LOG)
+    return SALIDA_OK, {"total": len(eventos), "eventos": eventos}
+
+
+def orden_plan(args):
+    from datetime import date
+    from .planificador import planificar_inventario
+
+    try:
+        desde = date.fromisoformat(args.desde) if args.desde else None
+    except ValueError:
+        raise ErrorCLI(f"Fecha no válida: {args.desde}")
+    if args.semanas < 1:
+        raise ErrorCLI("--semanas debe ser al menos 1")
+    if args.puntos is not None and args.puntos < 1:
+        raise ErrorCLI("--puntos debe ser al menos 1")
+    if not os.path.exists(os.path.join("data", "index_instrumentos.json")):
+        raise ErrorCLI("No existe data/index_instrumentos.json (ejecute 'python -m core indices')")
+    plan = planificar_inventario(desde=desde, semanas=args.semanas, puntos=args.puntos)
+    return (SALIDA_PROBLEMAS if plan["bloqueados"] else SALIDA_OK), plan
+
+
+def orden_montecarlo(args):
+    from .planificador import cargar_indices, completar_filas, CAMPOS_PATRON
+    from .montecarlo import tareas_instrumento, recalcular, incertidumbres_patrones
+
+    if args.muestras < 1000:
+        raise ErrorCLI("--muestras debe ser al menos 1000")
+    _, filas_patrones = cargar_indices()
+    u_patrones = incertidumbres_patrones(completar_filas(filas_patrones, CAMPOS_PATRON))
+    tareas = []
+    for _, _, data in _activos_con_historial(args.ids):
+        tareas.extend(tareas_instrumento(data, u_patrones, args.historial))
+    calibraciones = recalcular(tareas, args.muestras, procesos=args.procesos, semilla=args.semilla)
+    no_validados = sum(1 for c in calibraciones for p in c["puntos"] if not p["gum_valido"])
+    return SALIDA_OK, {"calibraciones": calibraciones, "muestras": args.muestras, "no_validados": no_validados}
+
+
+# --- Salida de texto -------------------------------------------------------
+
+def _formatear(orden, resultado):
+    if orden == "indices":
+        return "\n".join(f"[OK] index_{rama}.json: {n} activos" for rama, n in resultado["indices"].items())
+    if orden == "vault verificar":
+        raiz = resultado["raiz_merkle"]
+        lineas = [
+            f"Entradas del vault: {resultado['total']}",
+            f"Íntegras: {resultado['integros']}",
+            f"Comprometidas: {len(resultado['comprometidos'])}",
+            f"Sin archivo en disco: {len(resultado['ausentes'])}",
+            f"Activos sin registrar en el vault: {len(resultado['sin_registrar'])}",
+        ]
+        lineas += [f"  [COMPROMETIDO] {c}" for c in resultado["comprometidos"]]
+        lineas += [f"  [SIN REGISTRAR] {i}" for i in resultado["sin_registrar"]]
+        if raiz["ok"] is None:
+            lineas.append("Raíz Merkle: el log aún no registra ninguna")
+        else:
+            estado = "coincide con el log" if raiz["ok"] else "NO coincide con el log"
+            lineas.append(f"Raíz Merkle {(raiz['actual'] or 'inexistente')[:16]}... {estado}")
+        return "\n".join(lineas)
+    if orden == "vault reconstruir":
+        return f"[OK] Vault regenerado ({resultado['total']} elementos). Raíz Merkle: {resultado['raiz_merkle']}"
+    if orden == "ici exportar":
+        lineas = [f"[OK] {g['id']}: {g['pdf']}" for g in resultado["generados"]]
+        lineas += [f"[ERROR] {f['id']}: {f['error']}" for f in resultado["fallidos"]]
+        lineas.append(f"{len(resultado['generados'])} informes generados, {len(resultado['fallidos'])} fallidos")
+        return "\n".join(lineas)
+    if orden == "log verificar":
+        if resultado["integro"]:
+            return f"[OK] Log íntegro ({resultado['sesiones']} sesiones, {resultado['eventos']} eventos)"
+        return f"[SECURITY] {resultado.get('motivo', 'Log no íntegro')}"
+    if orden == "log buscar":
+        lineas = [f"{e['fecha']} {e['hora']}  #{e['sesion']:<6} {e['usuario']:<12} {e['tipo']:<10} {e['mensaje']}"
+                  for e in resultado["eventos"]]
+        lineas.append(f"{resultado['total']} eventos")
+        return "\n".join(lineas)
+    if orden == "plan":
+        lineas = [f"Plan del {resultado['desde']} al {resultado['hasta']}"]
+        for semana in resultado["semanas"]:
+            if not semana["lotes"]:
+                continue
+            lineas.append(f"{semana['semana']} (lunes {semana['lunes']}): {semana['instrumentos']} instrumentos")
+            for lote in semana["lotes"]:
+                estado = "[BLOQUEADO]" if lote["bloqueado"] else f"{len(lote['patrones'])} patrones"
+                vencidos = f", {lote['vencidos']} vencidos" if lote["vencidos"] else ""
+                lineas.append(f"  {lote['familia_patrones'] or 'SIN PATRÓN ASIGNADO'} "
+                              f"{lote['rango_min']:g}-{lote['rango_max']:g}: {estado}{vencidos}")
+                if "asignacion" in lote:
+                    lineas.append(f"    Preparar: {', '.join(lote['patrones_a_preparar']) or '-'}")
+                    lineas += [f"    {i}: {', '.join(lote['asignacion'][i])}" for i in lote["instrumentos"]]
+                else:
+                    lineas.append(f"    {', '.join(lote['instrumentos'])}")
+                if lote["patrones_no_vigentes"]:
+                    lineas.append(f"    Recalibrar antes: {', '.join(lote['patrones_no_vigentes'])}")
+        if resultado["patrones_caducan"]:
+            lineas.append("Patrones que caducan en el plan:")
+            lineas += [f"  [CADUCA] {p['id']} ({p['familia']}) {p['vencimiento']}" for p in resultado["patrones_caducan"]]
+        lineas.append(f"{resultado['total']} instrumentos en {resultado['lotes']} lotes, "
+                      f"{resultado['bloqueados']} bloqueados, {len(resultado['sin_fecha'])} sin fecha")
+        return "\n".join(lineas)
+    if orden == "montecarlo":
+        lineas = []
+        for cal in resultado["calibraciones"]:
+            lineas.append(f"{cal['id']} ({cal['fecha']})")
+            for p in cal["puntos"]:
+                inf, sup = p["intervalo"]
+                marca = "" if p["gum_valido"] else "  [GUM NO VALIDADA]"
+                lineas.append(f"  {p['valor_nominal']:>10g}  E={p['error']:+.4f}  U(GUM)={p['incertidumbre_k2']:.4f}  "
+                              f"U(MC)={p['incertidumbre_mc']:.4f}  95%=[{inf:+.4f}, {sup:+.4f}]{marca}")
+        lineas.append(f"{len(resultado['calibraciones'])} calibraciones, {resultado['muestras']} muestras por punto, "
+                      f"{resultado['no_validados']} puntos sin validar la GUM")
+        return "\n".join(lineas)
+    return json.dumps(resultado, ensure_ascii=False)
+
+
+# --- Entrada -----------------------------------------------------------------
+
+def crear_parser():
+    comun = argparse.ArgumentParser(add_help=False)
+    comun.add_argument("--json", action="store_true", help="Salida en JSON")
+    comun.add_argument("--directorio", help="Raíz de la instalación (por defecto, el directorio actual)")
+
+    parser = argparse.ArgumentParser(prog="python -m core", description="Tareas de Metrology Core sin interfaz gráfica")
+    ordenes = parser.add_subparsers(dest="orden", required=True)
+
+    p = ordenes.add_parser("indices", parents=[comun], help="Regenera data/index_*.json")
+    p.set_defaults(funcion=orden_indices, nombre="indices")
+
+    p_vault = ordenes.add_parser("vault", help="Vault de hashes")
+    acciones_vault = p_vault.add_subparsers(dest="accion", required=True)
+    p = acciones_vault.add_parser("verificar", parents=[comun], help="Verifica cada activo y la raíz de Merkle")
+    p.set_defaults(funcion=orden_vault_verificar, nombre="vault verificar")
+    p = acciones_vault.add_parser("reconstruir", parents=[comun], help="Regenera el vault completo (administrador)")
+    p.add_argument("--usuario", default="admin")
+    p.set_defaults(funcion=orden_vault_reconstruir, nombre="vault reconstruir")
+
+    p_ici = ordenes.add_parser("ici", help="Informes ICI")
+    acciones_ici = p_ici.add_subparsers(dest="accion", required=True)
+    p = acciones_ici.add_parser("exportar", parents=[comun], help="Genera el PDF ICI de los activos indicados (o de todos)")
+    p.add_argument("ids", nargs="*", metavar="ID")
+    p.add_argument("--destino", help="Carpeta de salida (por defecto, la del activo)")
+    p.set_defaults(funcion=orden_ici_exportar, nombre="ici exportar")
+
+    p_log = ordenes.add_parser("log", help="Log de auditoría")
+    acciones_log = p_log.add_subparsers(dest="accion", required=True)
+    p = acciones_log.add_parser("verificar", parents=[comun], help="Comprueba el log contra su hash")
+    p.set_defaults(funcion=orden_log_verificar, nombre="log verificar")
+    p = acciones_log.add_parser("buscar", parents=[comun], help="Busca eventos con el índice de eventos")
+    p.add_argument("--tipo", help="SECURITY, DATA, AUTH...")
+    p.add_argument("--usuario")
+    p.add_argument("--sesion", help="Número de sesión")
+    p.add_argument("--desde", metavar="AAAA-MM-DD")
+    p.add_argument("--hasta", metavar="AAAA-MM-DD")
+    p.add_argument("--activo", metavar="ID", help="ID de activo o de informe citado en el evento")
+    p.add_argument("--texto", help="Texto del mensaje")
+    p.add_argument("--limite", type=int)
+    p.add_argument("--reconstruir", action="store_true", help="Regenera el índice desde el log antes de buscar")
+    p.set_defaults(funcion=orden_log_buscar, nombre="log buscar")
+
+    p = ordenes.add_parser("plan", parents=[comun], help="Lotes semanales de recalibración por juego de patrones")
+    p.add_argument("--semanas", type=int, default=12)
+    p.add_argument("--desde", metavar="AAAA-MM-DD", help="Inicio del plan (por defecto, hoy)")
+    p.add_argument("--puntos", type=int, help="Asigna patrones a N puntos por instrumento en cada lote")
+    p.set_defaults(funcion=orden_plan, nombre="plan")
+
+    p = ordenes.add_parser("montecarlo", parents=[comun], help="Incertidumbre por Monte Carlo (JCGM 101) de las calibraciones")
+    p.add_argument("ids", nargs="*", metavar="ID")
+    p.add_argument("--muestras", type=int, default=200_000, help="Extracciones por punto (por defecto, 200000)")
+    p.add_argument("--procesos", type=int, help="Procesos en paralelo (por defecto, uno por CPU)")
+    p.add_argument("--historial", action="store_true", help="Todas las calibraciones, no solo la última")
+    p.add_argument("--semilla", type=int, help="Semilla para resultados reproducibles")
+    p.set_defaults(funcion=orden_montecarlo, nombre="montecarlo")
+
+    return parser
+
+
+def main(argv=None):
+    parser = crear_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        if args.directorio:
+            os.chdir(args.directorio)
+        codigo, resultado = args.funcion(args)
+    except ErrorCLI as e:
+        codigo, resultado = SALIDA_ERROR, {"error": str(e)}
+    except Exception as e:
+        codigo, resultado = SALIDA_ERROR, {"error": f"{type(e).__name__}: {e}"}
+
+    if args.json:
+        print(json.dumps(dict(resultado, orden=args.nombre, codigo=codigo), indent=2, ensure_ascii=False))
+    elif "error" in resultado:
+        print(f"[ERROR] {resultado['error']}", file=sys.stderr)
+    else:
+        print(_formatear(args.nombre, resultado))
+    return codigo
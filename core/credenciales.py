@@ -0,0 +1,133 @@
+"""
+Servicio de credenciales compartido por el login, la gestión de usuarios y
+las confirmaciones administrativas.
+
+La clave Fernet se deriva con PBKDF2 (100 000 iteraciones) una sola vez por
+proceso. Las contraseñas descifradas solo viven durante la comparación: de
+cada contraseña almacenada se guarda un verificador HMAC con un secreto
+aleatorio del proceso, de modo que las re-autenticaciones posteriores no
+vuelven a descifrar y se resuelven con una comparación en tiempo constante.
+"""
+
+import os
+import sys
+import hmac
+import hashlib
+import threading
+from base64 import b64encode, b64decode
+
+CLAVE_MAESTRA = "METROLOGIA_2024_SECURE_KEY_MASTER"
+SALT = b"metrologia_salt_2024"
+ITERACIONES = 100000
+PREFIJO_CIFRADO = "encrypted:"
+RUTA_USUARIOS = os.path.join("config", "users.json")
+GRUPOS_USUARIOS = ("tecnicos", "visor")
+
+_cifrador = None
+_lock = threading.Lock()
+# Secreto del proceso para los verificadores; nunca se persiste
+_SECRETO_VERIFICADOR = os.urandom(32)
+# contraseña almacenada (texto cifrado) -> HMAC de la contraseña en claro
+_verificadores = {}
+
+
+def ruta_usuarios():
+    """Ruta de users.json (junto al ejecutable si la aplicación está empaquetada)"""
+    if hasattr(sys, '_MEIPASS'):
+        return os.path.join(os.path.dirname(sys.executable), '_internal', RUTA_USUARIOS)
+    return os.path.join(os.path.abspath("."), RUTA_USUARIOS)
+
+
+def obtener_cifrador():
+    """Fernet con la clave derivada; el KDF se ejecuta solo la primera vez"""
+    global _cifrador
+    if _cifrador is None:
+        with _lock:
+            if _cifrador is None:
+                from cryptography.fernet import Fernet
+                from cryptography.hazmat.primitives import hashes
+                from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+                kdf = PBKDF2HMAC(
+                    algorithm=hashes.SHA256(),
+                    length=32,
+                    salt=SALT,
+                    iterations=ITERACIONES,
+                )
+                _cifrador = Fernet(b64encode(kdf.derive(CLAVE_MAESTRA.encode())))
+    return _cifrador
+
+
+def encriptar_password(password):
+    """Encripta una contraseña usando Fernet (AES)"""
+    if not password or password.startswith(PREFIJO_CIFRADO):
+        return password
+    encrypted_password = obtener_cifrador().encrypt(password.encode())
+    return PREFIJO_CIFRADO + b64encode(encrypted_password).decode()
+
+
+def desencriptar_password(password):
+    """
+    Desencripta una contraseña usando Fernet (AES).
+    Las contraseñas en texto plano (formato antiguo) se devuelven tal cual.
+    """
+    if not password or not password.startswith(PREFIJO_CIFRADO):
+        return password
+    encrypted_password = b64decode(password[len(PREFIJO_CIFRADO):])
+    return obtener_cifrador().decrypt(encrypted_password).decode()
+
+
+def _verificador(password):
+    return hmac.new(_SECRETO_VERIFICADOR, password.encode(), hashlib.sha256).digest()
+
+
+def verificador_de(password_almacenada):
+    """
+    Verificador HMAC de una contraseña almacenada (cifrada o en texto plano).
+    Se calcula una vez por valor almacenado; un cambio de contraseña produce
+    otro texto cifrado y, por tanto, otra entrada.
+
+    Returns:
+        bytes o None si la contraseña almacenada no se puede descifrar
+    """
+    verificador = _verificadores.get(password_almacenada)
+    if verificador is None:
+        try:
+            verificador = _verificador(desencriptar_password(password_almacenada))
+        except Exception:
+            return None
+        _verificadores[password_almacenada] = verificador
+    return verificador
+
+
+def coincide_verificador(verificador, password):
+    """Compara en tiempo constante un verificador con la contraseña introducida"""
+    return hmac.compare_digest(verificador, _verificador(password))
+
+
+def comprobar_password(password_almacenada, password_introducida):
+    """Compara en tiempo constante la contraseña introducida con la almacenada"""
+    if not password_almacenada or password_introducida is None:
+        return False
+    esperado = verificador_de(password_almacenada)
+    if esperado is None:
+        return False
+    return coincide_verificador(esperado, password_introducida)
+
+
+def verificar(username, password, ruta=None, grupos=GRUPOS_USUARIOS):
+    """
+    Autentica a un usuario contra users.json (vía el directorio indexado).
+
+    Returns:
+        dict: datos del usuario con 'user_type' o None si las credenciales no son válidas
+    """
+    from .usuarios import get_directorio
+    usuario = get_directorio(ruta).autenticar(username, password)
+    if usuario and usuario.get('user_type') in grupos:
+        return usuario
+    return None
+
+
+def olvidar_verificadores():
+    """Descarta los verificadores en memoria (p. ej. tras editar los usuarios)"""
+    _verificadores.clear()
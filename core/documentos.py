@@ -0,0 +1,161 @@
+"""
+Caché de documentos JSON de activos para todo el proceso.
+
+    from core.documentos import cargar_documento, copia_documento
+
+    data = cargar_documento(ruta_json)     # vista de solo lectura
+    data = copia_documento(ruta_json)      # dict/list normales para modificar y guardar
+
+Cada entrada se indexa por ruta absoluta y se valida con la firma del archivo
+(inodo, tamaño, mtime y ctime): si el archivo cambia en disco la siguiente
+lectura lo vuelve a cargar. Las vistas son de solo lectura (dicts que no
+admiten asignaciones y tuplas en lugar de listas) para que ningún lector
+altere lo que ven los demás.
+
+Al leer un archivo también se registra su hash con sal en la caché de
+seguridad, de modo que verificarlo después no obliga a leerlo otra vez.
+core.guardado registra aquí cada activo que guarda. Las entradas se
+descartan por antigüedad de uso cuando el total supera LIMITE_BYTES
+(tamaño en disco de los JSON).
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+from .perfilado import medir
+from .serializacion import cargar
+from .seguridad import generar_hash_bytes, cachear_hash
+
+LIMITE_BYTES = 16 * 1024 * 1024
+
+_lock = threading.Lock()
+_documentos = OrderedDict()   # ruta absoluta -> (firma, tamaño, vista)
+_bytes_totales = 0
+_aciertos = 0
+_fallos = 0
+
+
+class VistaDocumento(dict):
+    """dict de solo lectura (sigue siendo un dict para isinstance, json y .get)"""
+
+    __slots__ = ()
+
+    def _solo_lectura(self, *args, **kwargs):
+        raise TypeError("Documento en caché de solo lectura: use copia_documento() o copia_mutable()")
+
+    __setitem__ = __delitem__ = __ior__ = _solo_lectura
+    clear = pop = popitem = setdefault = update = _solo_lectura
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return copia_mutable(self)
+
+    def __reduce__(self):
+        return (VistaDocumento, (dict(self),))
+
+
+def congelar(obj):
+    """Vista de solo lectura de una estructura JSON (dicts y listas anidados)"""
+    if isinstance(obj, dict):
+        return VistaDocumento((k, congelar(v)) for k, v in obj.items())
+    if isinstance(obj, list):
+        return tuple(congelar(v) for v in obj)
+    return obj
+
+
+def copia_mutable(obj):
+    """Copia modificable de una vista (o de cualquier estructura JSON)"""
+    if isinstance(obj, dict):
+        return {k: copia_mutable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [copia_mutable(v) for v in obj]
+    return obj
+
+
+def _firma(ruta):
+    st = os.stat(ruta)
+    return (st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns)
+
+
+def _insertar(clave, firma, tamano, vista):
+    global _bytes_totales
+    with _lock:
+        anterior = _documentos.pop(clave, None)
+        if anterior is not None:
+            _bytes_totales -= anterior[1]
+        _documentos[clave] = (firma, tamano, vista)
+        _bytes_totales += tamano
+        while _bytes_totales > LIMITE_BYTES and len(_documentos) > 1:
+            _, (_, liberado, _) = _documentos.popitem(last=False)
+            _bytes_totales -= liberado
+
+
+@medir("json.cargar_documento")
+def cargar_documento(ruta):
+    """
+    Documento JSON como vista de solo lectura, leído de disco solo si cambió.
+
+    Raises:
+        OSError, ValueError: como open()/json.load()
+    """
+    global _aciertos, _fallos
+    clave = os.path.abspath(ruta)
+    firma = _firma(clave)
+    with _lock:
+        entrada = _documentos.get(clave)
+        if entrada is not None and entrada[0] == firma:
+            _documentos.move_to_end(clave)
+            _aciertos += 1
+            return entrada[2]
+        _fallos += 1
+
+    with open(clave, 'rb') as f:
+        contenido = f.read()
+    vista = congelar(cargar(contenido.decode('utf-8', errors='ignore')))
+    cachear_hash(clave, generar_hash_bytes(contenido), firma)
+    _insertar(clave, firma, len(contenido), vista)
+    return vista
+
+
+def copia_documento(ruta):
+    """Documento como dict/list modificables (para editar y guardar)"""
+    return copia_mutable(cargar_documento(ruta))
+
+
+def registrar_documento(ruta, datos, tamano):
+    """Guarda en caché el contenido recién escrito en 'ruta' (lo llama core.guardado)"""
+    clave = os.path.abspath(ruta)
+    try:
+        firma = _firma(clave)
+    except OSError:
+        invalidar_documentos([clave])
+        return
+    _insertar(clave, firma, tamano, congelar(datos))
+
+
+def invalidar_documentos(rutas=None):
+    """Descarta las rutas indicadas o, sin argumentos, toda la caché"""
+    global _bytes_totales
+    with _lock:
+        if rutas is None:
+            _documentos.clear()
+            _bytes_totales = 0
+            return
+        for ruta in rutas:
+            entrada = _documentos.pop(os.path.abspath(ruta), None)
+            if entrada is not None:
+                _bytes_totales -= entrada[1]
+
+
+def estadisticas():
+    with _lock:
+        return {
+            "documentos": len(_documentos),
+            "bytes": _bytes_totales,
+            "limite_bytes": LIMITE_BYTES,
+            "aciertos": _aciertos,
+            "fallos": _fallos,
+        }
@@ -0,0 +1,116 @@
+"""
+Recorrido único de data/ para índices, vault y verificación.
+
+    escaneo = escanear()
+    generar_indices(escaneo)          # filas de data/index_<rama>.json
+    generar_vault_completo(escaneo)   # hashes y familias del vault
+    iterar_verificacion(vault=..., rutas=escaneo["rutas"], hashes=escaneo["hashes"])
+
+Cada JSON de activo se lee una sola vez: del mismo buffer salen su hash con
+sal, la fila del índice y la entrada del mapa ID -> ruta. Los hashes quedan en
+la caché de seguridad, así que un escaneo posterior sin índice (indexar=False)
+solo lee los archivos que han cambiado desde entonces.
+"""
+
+import os
+
+from .perfilado import medir
+from .serializacion import cargar
+from .seguridad import generar_hash_bytes, cachear_hash, hash_en_cache, _firma_archivo
+from .indices import _fila_indice
+from .merkle import familia_de_ruta
+from .adjuntos import NOMBRE_MANIFIESTO, clave_vault
+
+DATA_PATH = "data"
+# Mismo orden que generar_vault_completo: ante IDs repetidos prevalece instrumentos
+RAMAS = ("patrones", "instrumentos")
+
+
+def _hash_archivo(ruta, leer):
+    """(hash, bytes o None): reutiliza la caché salvo que haga falta el contenido"""
+    if not leer:
+        hash_valor = hash_en_cache(ruta)
+        if hash_valor is not None:
+            return hash_valor, None
+    firma = _firma_archivo(ruta)
+    with open(ruta, 'rb') as f:
+        contenido = f.read()
+    hash_valor = generar_hash_bytes(contenido)
+    cachear_hash(ruta, hash_valor, firma)
+    return hash_valor, contenido
+
+
+@medir("escaner.recorrer")
+def escanear(base=DATA_PATH, indexar=True):
+    """
+    Recorre data/<rama>/ una vez.
+
+    Args:
+        base: carpeta data (relativa o absoluta)
+        indexar: parsear cada JSON para obtener su fila de índice; sin índice,
+                 los archivos sin cambios no se vuelven a leer
+
+    Returns:
+        dict con:
+            filas: {rama: [fila de índice]} (rutas relativas a data/, como generar_indices)
+            vault: {clave: hash} (activos y manifiestos '<ID>@adjuntos')
+            familias: {clave: familia} para el árbol de Merkle
+            rutas: {ID: ruta del JSON} para los activos data/<rama>/<familia>/<ID>/<ID>.json
+            hashes: {ID: hash} de esos mismos JSON
+            errores: rutas que no se pudieron leer o parsear
+            leidos: archivos leídos de disco
+    """
+    escaneo = {"filas": {}, "vault": {}, "familias": {}, "rutas": {}, "hashes": {},
+               "errores": [], "leidos": 0}
+    vault, familias = escaneo["vault"], escaneo["familias"]
+
+    for rama in RAMAS:
+        carpeta = os.path.join(base, rama)
+        if not os.path.exists(carpeta):
+            continue
+        filas = escaneo["filas"].setdefault(rama, [])
+
+        for root, _, files in os.walk(carpeta):
+            partes = os.path.relpath(root, carpeta).split(os.sep)
+            for file in files:
+                ruta = os.path.join(root, file)
+                if file.endswith('.json'):
+                    clave = file.replace('.json', '')
+                    try:
+                        hash_valor, contenido = _hash_archivo(ruta, indexar)
+                    except OSError:
+                        escaneo["errores"].append(ruta)
+                        continue
+                    if contenido is not None:
+                        escaneo["leidos"] += 1
+                    vault[clave] = hash_valor
+                    familias[clave] = familia_de_ruta(ruta)
+
+                    # <familia>/<ID>/<ID>.json: activo localizable por ID
+                    if len(partes) == 2 and file == f"{partes[1]}.json":
+                        escaneo["rutas"][clave] = ruta
+                        escaneo["hashes"][clave] = hash_valor
+
+                    if indexar:
+                        try:
+                            fila = _fila_indice(cargar(contenido), os.path.join(DATA_PATH, os.path.relpath(ruta, base)))
+                        except (ValueError, AttributeError):
+                            escaneo["errores"].append(ruta)
+                            continue
+                        if fila is not None:
+                            filas.append(fila)
+
+                elif file == NOMBRE_MANIFIESTO:
+                    # <activo>/documentos/.manifiesto_adjuntos
+                    clave = clave_vault(os.path.basename(os.path.dirname(root)))
+                    try:
+                        hash_valor, contenido = _hash_archivo(ruta, False)
+                    except OSError:
+                        escaneo["errores"].append(ruta)
+                        continue
+                    if contenido is not None:
+                        escaneo["leidos"] += 1
+                    vault[clave] = hash_valor
+                    familias[clave] = familia_de_ruta(ruta)
+
+    return escaneo
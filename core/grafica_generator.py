@@ -1,8 +1,9 @@
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
 import numpy as np
 import os
 
+from .perfilado import medir
+from .modelo import como_instrumento
+
 # Paleta técnica para la interfaz
 COLORES = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A', '#98D8C8', '#F7DC6F', '#BB8FCE', '#85C1E2', '#F8B88B', '#52BE80']
 
@@ -10,31 +11,19 @@ def preparar_datos_velas(data, indice_seleccionado=-1):
     """
     Calcula min, max y media por cada punto nominal para el eje X real.
     Agrupa las lecturas para obtener la dispersion (velas).
+    'data' es un Instrumento de core.modelo (o el dict del activo).
     """
-    if not data.get('historial'):
-        return [], [], [], []
-    
     # Usar el índice seleccionado o la última calibración por defecto
-    if indice_seleccionado >= 0 and indice_seleccionado < len(data['historial']):
-        calibracion = data['historial'][indice_seleccionado]
-    else:
-        calibracion = data['historial'][-1]
-    
-    puntos = calibracion.get('puntos', [])
+    calibracion = como_instrumento(data).calibracion(indice_seleccionado)
+    if calibracion is None:
+        return [], [], [], []
     
     agrupados = {}
-    for p in puntos:
-        try:
-            nom = float(p.get('valor_nominal', 0))
-            lecturas = p.get('lecturas', [])
+    for i, nom in enumerate(calibracion.nominales):
+        lecturas = calibracion.lecturas_punto(i)
+        if lecturas:
             # Errores individuales: Lectura - Nominal (base 0)
-            errores = [float(l) - nom for l in lecturas]
-            
-            if nom not in agrupados:
-                agrupados[nom] = []
-            agrupados[nom].extend(errores)
-        except (ValueError, TypeError):
-            continue
+            agrupados.setdefault(nom, []).extend(l - nom for l in lecturas)
     
     x_nominales = sorted(agrupados.keys())
     y_medias = [np.mean(agrupados[n]) for n in x_nominales]
@@ -43,20 +32,25 @@ def preparar_datos_velas(data, indice_seleccionado=-1):
     
     return x_nominales, y_medias, y_mins, y_maxs
 
+@medir("grafica.interfaz")
 def crear_grafica_metrologia(data, indice_seleccionado=-1):
     """
     Funcion para la INTERFAZ (PyQt). 
     Muestra el sistema de velas sobre el RANGO TOTAL del equipo.
     """
-    x, y_med, y_min, y_max = preparar_datos_velas(data, indice_seleccionado)
+    # Backend Qt solo para la interfaz; el PDF usa Agg y no debe cargarlo
+    from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+    from matplotlib.figure import Figure
+
+    instrumento = como_instrumento(data)
+    x, y_med, y_min, y_max = preparar_datos_velas(instrumento, indice_seleccionado)
     
     fig = Figure(figsize=(8, 5), facecolor='#252526')
     ax = fig.add_subplot(111)
     ax.set_facecolor('#1e1e1e')
     
     # Configuracion del Rango del Eje X
-    r_min = float(data.get('rango_min', 0))
-    r_max = float(data.get('rango_max', 100))
+    r_min, r_max = instrumento.limites()
     margen = (r_max - r_min) * 0.05 if r_max > r_min else 1
     ax.set_xlim(r_min - margen, r_max + margen)
     
@@ -88,6 +82,7 @@ def crear_grafica_metrologia(data, indice_seleccionado=-1):
     fig.tight_layout()
     return FigureCanvas(fig)
 
+@medir("grafica.pdf")
 def crear_grafica_pdf(data):
     import matplotlib
     matplotlib.use("Agg")  # backend NO interactivo
@@ -96,11 +91,11 @@ def crear_grafica_pdf(data):
     Funcion para el PDF. 
     Genera la grafica de velas con fondo blanco para impresion.
     """
-    x, y_med, y_min, y_max = preparar_datos_velas(data)
+    instrumento = como_instrumento(data)
+    x, y_med, y_min, y_max = preparar_datos_velas(instrumento)
     if not x: return None
     
-    r_min = float(data.get('rango_min', 0))
-    r_max = float(data.get('rango_max', 100))
+    r_min, r_max = instrumento.limites()
 
     plt.ioff()
 
@@ -126,7 +121,7 @@ def crear_grafica_pdf(data):
     plt.legend()
     
     # Guardado temporal para el PDF
-    temp_path = f"data/temp_velas_{data.get('id')}.png"
+    temp_path = f"data/temp_velas_{instrumento.id}.png"
     plt.savefig(temp_path, dpi=150, bbox_inches='tight')
     plt.close('all')
     return temp_path
\ No newline at end of file
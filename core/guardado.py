@@ -0,0 +1,95 @@
+"""
+Guardado de activos como una única transacción de escritura y firma.
+
+    from core.guardado import guardar_activo
+
+    ok, hash_o_error = guardar_activo(ruta_json, datos, "PT-001",
+                                      evento=("DATA", "Calibración registrada"))
+
+El JSON se serializa una sola vez y el hash del vault se calcula sobre esos
+mismos bytes en memoria (sin releer el archivo). El archivo se escribe en un
+temporal del mismo directorio, se sincroniza a disco y se sustituye con
+os.replace, de modo que un cierre inesperado deja la versión anterior o la
+nueva, nunca una a medias. El contenido guardado queda en la caché de
+documentos (core.documentos) y, si es un alta, en el registro de IDs
+(core.registro_ids). Después se actualizan, en este orden, la entrada
+del vault (y su camino en el árbol de Merkle), la fila del índice y el
+evento de auditoría.
+"""
+
+import os
+
+from .perfilado import medir
+from .serializacion import volcar_canonico
+from .seguridad import generar_hash_bytes, registrar_hash_vault, cachear_hash
+from .documentos import registrar_documento
+from . import registro_ids
+
+
+def serializar_activo(datos, sort_keys=True):
+    """Bytes del JSON con el formato estándar de los activos (indent=4, UTF-8); su hash va al vault"""
+    return volcar_canonico(datos, indent=4, sort_keys=sort_keys)
+
+
+def escribir_atomico(ruta, contenido):
+    """Escribe 'contenido' (bytes) en 'ruta' mediante temporal + fsync + os.replace"""
+    temporal = f"{ruta}.tmp"
+    try:
+        with open(temporal, 'wb') as f:
+            f.write(contenido)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, ruta)
+    except OSError:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+
+@medir("guardado.activo")
+def guardar_activo(ruta, datos, id_elemento=None, evento=None, logger=None, sort_keys=True, indice=True):
+    """
+    Guarda un activo y lo firma en el vault en una sola operación.
+
+    Args:
+        ruta: ruta del JSON del activo
+        datos: contenido a guardar
+        id_elemento: ID en el vault (por defecto, el nombre del archivo)
+        evento: (tipo, mensaje[, nivel]) a registrar en el log de auditoría, o None
+        logger: SessionLogger a usar para el evento (por defecto, el global)
+        sort_keys: ordenar claves al serializar
+        indice: actualizar la fila del activo en data/index_<rama>.json
+
+    Returns:
+        tuple: (True, hash) si se guardó y firmó, (False, mensaje) si hubo error
+    """
+    if id_elemento is None:
+        id_elemento = os.path.splitext(os.path.basename(ruta))[0]
+
+    try:
+        contenido = serializar_activo(datos, sort_keys)
+        hash_valor = generar_hash_bytes(contenido)
+        escribir_atomico(ruta, contenido)
+    except (OSError, TypeError, ValueError) as e:
+        return False, f"No se pudo guardar {id_elemento}: {e}"
+
+    cachear_hash(ruta, hash_valor)
+    registrar_documento(ruta, datos, len(contenido))
+    registro_ids.aplicar_cambio(ruta)
+    if not registrar_hash_vault(id_elemento, hash_valor, ruta):
+        return False, f"{id_elemento} guardado, pero no se pudo actualizar el vault"
+
+    if indice:
+        from .indices import actualizar_indices, raiz_datos_de_activo
+        try:
+            actualizar_indices([ruta], datos={ruta: datos}, base=raiz_datos_de_activo(ruta))
+        except (OSError, ValueError):
+            pass  # El índice es derivado: se regenera en el siguiente arranque
+
+    if evento:
+        if logger is None:
+            from .logger import get_logger
+            logger = get_logger()
+        logger.log_event(*evento)
+
+    return True, hash_valor
@@ -0,0 +1,300 @@
+"""
+Índice de eventos del log de auditoría para búsquedas filtradas.
+
+    from core.indice_eventos import consultar
+
+    consultar(tipo="SECURITY", usuario="admin", desde="2026-07-01", hasta="2026-09-30")
+    consultar(activo="ME-0001", texto="ICI generado")
+
+El índice es un archivo JSONL junto al log (metrologia_log.eventos.jsonl) con
+una línea por evento: posición en el log, sesión, usuario, fecha de la
+sesión, hora, tipo, mensaje e IDs de activo citados. SessionLogger añade la
+línea de cada evento que escribe, así que el índice crece con el log sin
+volver a recorrerlo. Los demás cambios del log que hace el logger (sesión
+nueva, cierre) se anotan con una línea de marca. Cada línea guarda la firma
+del log (tamaño y mtime) antes y después de la escritura, de modo que las
+líneas forman una cadena que se rompe si alguien más escribe el log.
+
+En memoria se mantienen listas invertidas por tipo, usuario, sesión, fecha,
+activo y palabra del mensaje. Cada consulta lee solo las líneas añadidas
+desde la anterior. Si el log cambió por otra vía (firma distinta a la última
+marca o cadena rota) o el índice no existe, se reconstruye desde el log: es un archivo
+derivado, como los índices de data/.
+"""
+
+import os
+import re
+import threading
+from bisect import bisect_left, bisect_right, insort
+
+from .perfilado import medir
+from .serializacion import cargar, cargar_archivo, volcar_compacto
+
+RUTA_LOG = "metrologia_log.json"
+
+# IDs de activo y de informe con forma PREFIJO-número (ME-0001, PR-001, ICI-2026-...)
+PATRON_ACTIVO = re.compile(r"\b[A-Z][A-Z0-9]*-\d+\b")
+PATRON_PALABRA = re.compile(r"\w+")
+LONGITUD_MINIMA_PALABRA = 2
+
+_lock = threading.RLock()
+_estados = {}   # ruta absoluta del índice -> _Estado
+
+
+def ruta_indice(ruta_log=RUTA_LOG):
+    return os.path.splitext(ruta_log)[0] + ".eventos.jsonl"
+
+
+def firma_log(ruta_log=RUTA_LOG):
+    """Firma del log (tamaño, mtime) para encadenar las líneas del índice"""
+    try:
+        st = os.stat(ruta_log)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def palabras(texto):
+    """Palabras indexables de un texto (minúsculas, sin repetir)"""
+    return {p for p in PATRON_PALABRA.findall(texto.lower()) if len(p) >= LONGITUD_MINIMA_PALABRA}
+
+
+def registro_evento(sesion, pos_sesion, evento, pos_evento):
+    """Línea del índice para el evento 'pos_evento' de la sesión 'pos_sesion'"""
+    accion = evento.get("action", "")
+    if ":" in accion:
+        tipo, mensaje = accion.split(":", 1)
+    else:
+        tipo, mensaje = "INFO", accion
+    mensaje = mensaje.strip()
+    return {
+        "s": pos_sesion,
+        "e": pos_evento,
+        "sesion": str(sesion.get("session_number", "")),
+        "usuario": sesion.get("user") or "",
+        "fecha": (sesion.get("start_time") or "")[:10],
+        "hora": evento.get("time", ""),
+        "tipo": tipo.strip(),
+        "mensaje": mensaje,
+        "activos": sorted(set(PATRON_ACTIVO.findall(mensaje))),
+    }
+
+
+class _Estado:
+    """Listas invertidas de un índice y posición hasta la que se ha leído"""
+
+    def __init__(self):
+        self.registros = []
+        self.posiciones = set()   # (s, e) ya indexados
+        self.desplazamiento = 0
+        self.inodo = None
+        self.firma_log = None
+        self.roto = False         # alguna línea no continúa la firma anterior
+        self.por_tipo = {}
+        self.por_usuario = {}
+        self.por_sesion = {}
+        self.por_fecha = {}
+        self.fechas = []          # fechas distintas, ordenadas (para rangos)
+        self.por_activo = {}
+        self.por_palabra = {}
+
+    def anadir(self, registro):
+        posicion = (registro["s"], registro["e"])
+        if posicion in self.posiciones:
+            return
+        self.posiciones.add(posicion)
+        n = len(self.registros)
+        self.registros.append(registro)
+        self.por_tipo.setdefault(registro["tipo"].upper(), []).append(n)
+        self.por_usuario.setdefault(registro["usuario"].lower(), []).append(n)
+        self.por_sesion.setdefault(registro["sesion"], []).append(n)
+        fecha = registro["fecha"]
+        if fecha not in self.por_fecha:
+            self.por_fecha[fecha] = []
+            insort(self.fechas, fecha)
+        self.por_fecha[fecha].append(n)
+        for activo in registro["activos"]:
+            self.por_activo.setdefault(activo.upper(), []).append(n)
+        for palabra in palabras(registro["mensaje"]):
+            self.por_palabra.setdefault(palabra, []).append(n)
+
+
+def _leer_nuevas(ruta, estado):
+    """Incorpora las líneas añadidas al índice desde la última lectura"""
+    st = os.stat(ruta)
+    if st.st_ino != estado.inodo or st.st_size < estado.desplazamiento:
+        # Reemplazado o truncado: se vuelve a leer entero
+        estado.__init__()
+        estado.inodo = st.st_ino
+    if st.st_size == estado.desplazamiento:
+        return estado
+
+    with open(ruta, 'rb') as f:
+        f.seek(estado.desplazamiento)
+        bloque = f.read()
+    completo = bloque.rfind(b"\n") + 1    # una línea a medio escribir se lee la próxima vez
+    for linea in bloque[:completo].splitlines():
+        if not linea.strip():
+            continue
+        try:
+            registro = cargar(linea)
+        except ValueError:
+            continue
+        previa = registro.pop("previa", estado.firma_log)
+        if previa != estado.firma_log:
+            estado.roto = True
+        if "marca" in registro:
+            estado.firma_log = registro["marca"]
+        else:
+            estado.firma_log = registro.pop("log", estado.firma_log)
+            estado.anadir(registro)
+    estado.desplazamiento += completo
+    return estado
+
+
+def _anexar_lineas(ruta, lineas):
+    with open(ruta, 'ab') as f:
+        f.write(b"".join(volcar_compacto(l) + b"\n" for l in lineas))
+
+
+@medir("eventos.reconstruir")
+def reconstruir_indice(ruta_log=RUTA_LOG):
+    """Regenera el índice completo desde el log; devuelve el número de eventos indexados"""
+    ruta = ruta_indice(ruta_log)
+    sesiones = cargar_archivo(ruta_log) if os.path.exists(ruta_log) else []
+    lineas = [registro_evento(s, i, ev, j)
+              for i, s in enumerate(sesiones)
+              for j, ev in enumerate(s.get("events", []))]
+    lineas.append({"marca": firma_log(ruta_log)})
+
+    temporal = f"{ruta}.tmp"
+    with open(temporal, 'wb') as f:
+        f.write(b"".join(volcar_compacto(l) + b"\n" for l in lineas))
+    os.replace(temporal, ruta)
+    with _lock:
+        _estados.pop(os.path.abspath(ruta), None)
+    return len(lineas) - 1
+
+
+def anexar_evento(sesiones, ruta_log=RUTA_LOG, previa=None):
+    """
+    Indexa el último evento de la última sesión (lo llama SessionLogger justo
+    después de escribirlo; 'previa' es firma_log() antes de la escritura).
+    Si el índice no existe no hace nada: se reconstruirá en la siguiente consulta.
+    """
+    ruta = ruta_indice(ruta_log)
+    if not sesiones or not os.path.exists(ruta):
+        return
+    sesion = sesiones[-1]
+    eventos = sesion.get("events", [])
+    if not eventos:
+        return
+    registro = registro_evento(sesion, len(sesiones) - 1, eventos[-1], len(eventos) - 1)
+    registro["previa"] = previa
+    registro["log"] = firma_log(ruta_log)
+    try:
+        _anexar_lineas(ruta, [registro])
+    except OSError:
+        pass
+
+
+def marcar_log(ruta_log=RUTA_LOG, previa=None):
+    """Anota un cambio del log sin eventos nuevos ('previa': firma antes del cambio)"""
+    ruta = ruta_indice(ruta_log)
+    if not os.path.exists(ruta):
+        return
+    try:
+        _anexar_lineas(ruta, [{"previa": previa, "marca": firma_log(ruta_log)}])
+    except OSError:
+        pass
+
+
+def _estado_al_dia(ruta_log):
+    ruta = ruta_indice(ruta_log)
+    clave = os.path.abspath(ruta)
+    with _lock:
+        if not os.path.exists(ruta):
+            reconstruir_indice(ruta_log)
+        estado = _leer_nuevas(ruta, _estados.setdefault(clave, _Estado()))
+        if estado.roto or estado.firma_log != firma_log(ruta_log):
+            # El log cambió sin pasar por el logger
+            reconstruir_indice(ruta_log)
+            estado = _leer_nuevas(ruta, _estados.setdefault(clave, _Estado()))
+        return estado
+
+
+def _rango_fechas(estado, desde, hasta):
+    inicio = bisect_left(estado.fechas, desde) if desde else 0
+    fin = bisect_right(estado.fechas, hasta) if hasta else len(estado.fechas)
+    posiciones = set()
+    for fecha in estado.fechas[inicio:fin]:
+        posiciones.update(estado.por_fecha[fecha])
+    return posiciones
+
+
+@medir("eventos.consultar")
+def consultar(tipo=None, usuario=None, sesion=None, desde=None, hasta=None,
+              activo=None, texto=None, limite=None, ruta_log=RUTA_LOG):
+    """
+    Eventos que cumplen todos los filtros indicados, del más reciente al más antiguo.
+
+    Args:
+        tipo: SECURITY, DATA, AUTH... (sin distinguir mayúsculas)
+        usuario: usuario de la sesión (sin distinguir mayúsculas)
+        sesion: número de sesión
+        desde, hasta: fechas 'YYYY-MM-DD' inclusivas (fecha de inicio de la sesión)
+        activo: ID de activo o de informe citado en el mensaje
+        texto: palabras que deben aparecer en el mensaje (y el texto literal)
+        limite: máximo de resultados
+
+    Returns:
+        list: registros del índice (dicts con s, e, sesion, usuario, fecha, hora,
+              tipo, mensaje y activos); s/e son las posiciones en el log
+    """
+    estado = _estado_al_dia(ruta_log)
+
+    candidatos = []
+    if tipo:
+        candidatos.append(estado.por_tipo.get(tipo.strip().upper(), ()))
+    if usuario:
+        candidatos.append(estado.por_usuario.get(usuario.strip().lower(), ()))
+    if sesion not in (None, ""):
+        candidatos.append(estado.por_sesion.get(str(sesion).strip(), ()))
+    if activo:
+        candidatos.append(estado.por_activo.get(activo.strip().upper(), ()))
+    if texto:
+        candidatos.extend(estado.por_palabra.get(p, ()) for p in palabras(texto))
+    if desde or hasta:
+        candidatos.append(_rango_fechas(estado, desde, hasta))
+
+    if candidatos:
+        candidatos.sort(key=len)
+        posiciones = set(candidatos[0])
+        for lista in candidatos[1:]:
+            if not posiciones:
+                break
+            posiciones.intersection_update(lista)
+    else:
+        posiciones = range(len(estado.registros))
+
+    resultado = []
+    frase = texto.strip().lower() if texto else None
+    for n in sorted(posiciones, reverse=True):
+        registro = estado.registros[n]
+        if frase and frase not in registro["mensaje"].lower():
+            continue
+        resultado.append(registro)
+        if limite and len(resultado) >= limite:
+            break
+    return resultado
+
+
+def valores(ruta_log=RUTA_LOG):
+    """Tipos, usuarios y sesiones presentes en el índice (para los filtros de la interfaz)"""
+    estado = _estado_al_dia(ruta_log)
+    return {
+        "tipos": sorted(estado.por_tipo),
+        "usuarios": sorted({r["usuario"] for r in estado.registros if r["usuario"]}),
+        "sesiones": sorted(estado.por_sesion),
+        "fechas": list(estado.fechas),
+    }
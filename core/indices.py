@@ -1,7 +1,10 @@
 import os
 import json
-from datetime import datetime
-from dateutil.relativedelta import relativedelta
+
+from .perfilado import medir
+from .vencimientos import vencimiento_iso
+from .modelo import numero, texto, RANGO_MIN_DEFECTO, RANGO_MAX_DEFECTO
+from .serializacion import cargar_archivo, guardar_compacto
 
 DATA_PATH = "data"
 SOURCES = {
@@ -10,50 +13,131 @@ SOURCES = {
 }
 
 def calcular_vencimiento(fecha_str, meses):
-    try:
-        # Validar que fecha_str no sea None o vacío
-        if not fecha_str or fecha_str == 'N/A' or fecha_str == 'None':
-            return "9999-12-31" # Para que los sin fecha queden al final
-        
-        # Tomamos los primeros 10 caracteres por si viene con hora (como en MI-0001)
-        fecha_base = datetime.strptime(fecha_str[:10], "%Y-%m-%d")
-        return (fecha_base + relativedelta(months=meses)).strftime("%Y-%m-%d")
-    except:
-        return "9999-12-31" # Para que los sin fecha queden al final
-
-def generar_indices():
-    for rama, carpeta in SOURCES.items():
-        lista_index = []
-        if not os.path.exists(carpeta): continue
-
-        for root, _, files in os.walk(carpeta):
-            for file in files:
-                if file.endswith(".json"):
-                    with open(os.path.join(root, file), 'r', encoding='utf-8') as f:
-                        d = json.load(f)
-                        
-                        # --- FILTRO DE ESTADO ---
-                        # Si el estado es 'obsoleto', saltamos este archivo y no se indexa
-                        if d.get("estado") == "obsoleto":
-                            continue
-                        
-                        vencimiento = calcular_vencimiento(
-                            d.get("fecha_ultima_calibracion"), 
-                            d.get("periodicidad_meses", 12)
-                        )
-
-                        lista_index.append({
-                            "id": d.get("id"),
-                            "descripcion": d.get("descripcion"),
-                            "vencimiento": vencimiento,
-                            "familia": d.get("familia"),
-                            "path": os.path.join(root, file)
-                        })
-        # Ordenar por fecha de vencimiento (el que antes caduca, primero)
-        lista_index.sort(key=lambda x: x["vencimiento"])
-
-        with open(os.path.join(DATA_PATH, f"index_{rama}.json"), "w", encoding='utf-8') as f:
-            json.dump(lista_index, f, indent=4, ensure_ascii=False)
+    # "9999-12-31" si no hay fecha, para que los sin fecha queden al final
+    return vencimiento_iso({"fecha_ultima_calibracion": fecha_str, "periodicidad_meses": meses})
+
+def _fila_indice(d, ruta):
+    """Fila del índice para un activo (None si está obsoleto y no debe indexarse)"""
+    # --- FILTRO DE ESTADO ---
+    # Si el estado es 'obsoleto', saltamos este archivo y no se indexa
+    if d.get("estado") == "obsoleto":
+        return None
+
+    # Misma fecha que muestran las fichas (historial o raíz), ver core.vencimientos
+    vencimiento = vencimiento_iso(d)
+
+    fila = {
+        "id": d.get("id"),
+        "descripcion": d.get("descripcion"),
+        "vencimiento": vencimiento,
+        "familia": d.get("familia"),
+        "path": ruta
+    }
+    # Campos que usa el planificador (core.planificador) sin abrir cada JSON
+    if "valor_nominal" in d:
+        fila["valor_nominal"] = numero(d.get("valor_nominal"))
+        fila["incertidumbre"] = numero(d.get("incertidumbre"))
+    else:
+        fila["rango_min"] = numero(d.get("rango_min"), RANGO_MIN_DEFECTO)
+        fila["rango_max"] = numero(d.get("rango_max"), RANGO_MAX_DEFECTO)
+        fila["patrones_sugeridos"] = texto(d.get("patrones_sugeridos"))
+    return fila
+
+def _guardar_indice(rama, lista_index, base=DATA_PATH):
+    # Ordenar por fecha de vencimiento (el que antes caduca, primero)
+    lista_index.sort(key=lambda x: x["vencimiento"])
+
+    # Archivo interno: volcado compacto
+    guardar_compacto(os.path.join(base, f"index_{rama}.json"), lista_index)
+
+@medir("indices.generar")
+def generar_indices(escaneo=None, base=DATA_PATH):
+    """
+    Regenera los índices de todas las ramas y devuelve {rama: filas indexadas}.
+    'escaneo' (core.escaner.escanear) reutiliza un recorrido ya hecho de 'base'.
+    """
+    if escaneo is None:
+        from .escaner import escanear
+        escaneo = escanear(base)
+
+    totales = {}
+    for rama in SOURCES:
+        if rama not in escaneo["filas"]: continue
+        lista_index = list(escaneo["filas"][rama])
+        _guardar_indice(rama, lista_index, base)
+        totales[rama] = len(lista_index)
+    return totales
+
+def raiz_datos_de_activo(ruta):
+    """Carpeta de datos que contiene el JSON <raíz>/<rama>/<familia>/<ID>/<ID>.json"""
+    ruta = os.path.abspath(ruta)
+    for _ in range(4):
+        ruta = os.path.dirname(ruta)
+    return ruta
+
+@medir("indices.actualizar")
+def actualizar_indices(rutas, datos=None, base=DATA_PATH):
+    """
+    Actualiza en los índices solo las filas de los JSON indicados (altas,
+    modificaciones o bajas), sin recorrer el resto de data/.
+    'datos' ({ruta: contenido}) evita releer archivos que el llamante ya tiene en memoria.
+    'base' es la carpeta de datos a la que pertenecen las rutas (la que vigila
+    la aplicación), no el directorio de trabajo; las rutas que quedan fuera de
+    ella se anotan en el log de la sesión.
+
+    Returns:
+        int: número de filas tocadas
+    """
+    raiz = os.path.abspath(base)
+    por_rama = {}
+    fuera = []
+    en_memoria = {os.path.abspath(r): d for r, d in (datos or {}).items()}
+    for ruta in rutas:
+        absoluta = os.path.abspath(ruta)
+        try:
+            relativa = os.path.relpath(absoluta, raiz)
+        except ValueError:
+            relativa = os.pardir    # otra unidad (Windows)
+        partes = relativa.split(os.sep)
+        if partes[0] == os.pardir:
+            fuera.append(ruta)
+            continue
+        # <rama>/<familia>/<ID>/<ID>.json (los índices y el almacén de adjuntos no cuentan)
+        if len(partes) != 4 or partes[0] not in SOURCES or partes[3] != f"{partes[2]}.json":
+            continue
+        por_rama.setdefault(partes[0], {})[partes[2]] = (absoluta, os.path.join(DATA_PATH, relativa))
+
+    if fuera:
+        from .logger import get_logger
+        get_logger().log_error('INDICES', f"Rutas fuera de {raiz} no indexadas: {', '.join(fuera[:5])}"
+                                          + (f" (y {len(fuera) - 5} más)" if len(fuera) > 5 else ""))
+
+    tocadas = 0
+    for rama, cambios in por_rama.items():
+        ruta_index = os.path.join(raiz, f"index_{rama}.json")
+        try:
+            lista_index = cargar_archivo(ruta_index)
+        except (OSError, json.JSONDecodeError):
+            lista_index = []
+
+        # Como en core.escaner, la fila guarda la ruta relativa 'data/<rama>/...'
+        rutas_cambiadas = {relativa for _, relativa in cambios.values()}
+        lista_index = [fila for fila in lista_index
+                       if fila.get("id") not in cambios and fila.get("path") not in rutas_cambiadas]
+        for id_elemento, (absoluta, relativa) in cambios.items():
+            tocadas += 1
+            d = en_memoria.get(absoluta)
+            if d is None:
+                try:
+                    d = cargar_archivo(absoluta)
+                except (OSError, json.JSONDecodeError):
+                    continue  # Baja o archivo a medio escribir: se queda fuera del índice
+            fila = _fila_indice(d, relativa)
+            if fila is not None:
+                lista_index.append(fila)
+
+        _guardar_indice(rama, lista_index, raiz)
+    return tocadas
 
 if __name__ == "__main__":
     generar_indices()
\ No newline at end of file
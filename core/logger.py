@@ -4,12 +4,21 @@ Registra sesiones, navegaciones, calibraciones y eventos del sistema.
 """
 
 import os
-import json
 import sys
 from datetime import datetime
 
 # Importar gestor de sesiones
 from .session_manager import incrementar_sesion, leer_numero_sesion, generar_hash_sesion
+from .perfilado import medir
+from .serializacion import cargar_archivo, guardar_canonico
+from .indice_eventos import firma_log, anexar_evento, marcar_log
+
+# Etiqueta de cada origen del registro del hash del vault
+ORIGENES_HASH_VAULT = {
+    "APP": "CERRANDO APP",
+    "SESION": "CERRANDO SESIÓN",
+    "CLI": "LÍNEA DE COMANDOS",
+}
 
 
 class SessionLogger:
@@ -31,8 +40,7 @@ class SessionLogger:
     def _init_log_file(self):
         """Inicializa o carga el archivo de log"""
         if not os.path.exists(self.log_file):
-            with open(self.log_file, 'w', encoding='utf-8') as f:
-                json.dump([], f, indent=2, ensure_ascii=False)
+            guardar_canonico(self.log_file, [], indent=2)
             
             # Guardar evento de creación inicial como SECURITY
             initial_event = {
@@ -48,8 +56,7 @@ class SessionLogger:
             }
             
             try:
-                with open(self.log_file, 'w', encoding='utf-8') as f:
-                    json.dump([initial_event], f, indent=2, ensure_ascii=False)
+                guardar_canonico(self.log_file, [initial_event], indent=2)
             except Exception as e:
                 self.log(f"Error guardando evento inicial: {e}")
     
@@ -63,6 +70,7 @@ class SessionLogger:
             return True
         return False
     
+    @medir("log.crear_sesion")
     def _create_session(self):
         """Crea la entrada de la sesión en el log con todos los datos"""
         # Si no hay número de sesión, es una acción administrativa
@@ -79,11 +87,11 @@ class SessionLogger:
         }
         
         try:
-            with open(self.log_file, 'r', encoding='utf-8') as f:
-                logs = json.load(f)
+            logs = cargar_archivo(self.log_file)
             logs.append(session_data)
-            with open(self.log_file, 'w', encoding='utf-8') as f:
-                json.dump(logs, f, indent=2, ensure_ascii=False)
+            previa = firma_log(self.log_file)
+            guardar_canonico(self.log_file, logs, indent=2)
+            marcar_log(self.log_file, previa)
             self.session_created = True
         except Exception as e:
             self.log(f"Error creando sesión: {e}")
@@ -186,17 +194,18 @@ class SessionLogger:
         message = f"{elemento_id} marcado como {nuevo_estado.upper()} por {usuario}"
         self.log_event("DATA", message)
     
+    @medir("log.anexar_evento")
     def _append_event_to_file(self, event):
         """Agrega un evento a la sesión actual en el archivo"""
         try:
-            with open(self.log_file, 'r', encoding='utf-8') as f:
-                logs = json.load(f)
+            logs = cargar_archivo(self.log_file)
             
             # Buscar la sesión actual (la última)
             if logs:
                 logs[-1]["events"].append(event)
-                with open(self.log_file, 'w', encoding='utf-8') as f:
-                    json.dump(logs, f, indent=2, ensure_ascii=False)
+                previa = firma_log(self.log_file)
+                guardar_canonico(self.log_file, logs, indent=2)
+                anexar_evento(logs, self.log_file, previa)
         
         except Exception as e:
             self.log(f"Error escribiendo evento: {e}")
@@ -206,20 +215,18 @@ class SessionLogger:
         Registra el hash del vault de forma forzada (independiente de sesión)
         
         Args:
-            hash_vault: Hash generado del vault
+            hash_vault: Raíz de Merkle del vault (se registra completa)
             total_hashes: Total de elementos en el vault
-            evento_tipo: "APP" para cierre de app, "SESION" para cierre de sesión
+            evento_tipo: "APP" para cierre de app, "SESION" para cierre de sesión, "CLI" para la línea de comandos
         """
         try:
             # Forzar creación de sesión solo si no existe ninguna
             if not self.session_created:
                 self._create_session()
             
-            event_time = datetime.now().strftime("%H:%M:%S")
-            if evento_tipo == "APP":
-                message = f"[CERRANDO APP] Hash vault: {hash_vault[:16]}... (total: {total_hashes} elementos)"
-            else:
-                message = f"[CERRANDO SESIÓN] Hash vault: {hash_vault[:16]}... (total: {total_hashes} elementos)"
+            # Un origen desconocido se registra con su propio nombre, nunca como cierre de sesión
+            origen = ORIGENES_HASH_VAULT.get(evento_tipo, evento_tipo)
+            message = f"[{origen}] Hash vault: {hash_vault[:16]}... (total: {total_hashes} elementos) Raíz Merkle: {hash_vault}"
             
             # Usar el método estándar log_event para evitar duplicación
             self.log_event("SYSTEM", message)
@@ -232,14 +239,14 @@ class SessionLogger:
         end_time = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
         
         try:
-            with open(self.log_file, 'r', encoding='utf-8') as f:
-                logs = json.load(f)
+            logs = cargar_archivo(self.log_file)
             
             # Actualizar la sesión actual (la última)
             if logs:
                 logs[-1]["end_time"] = end_time
-                with open(self.log_file, 'w', encoding='utf-8') as f:
-                    json.dump(logs, f, indent=2, ensure_ascii=False)
+                previa = firma_log(self.log_file)
+                guardar_canonico(self.log_file, logs, indent=2)
+                marcar_log(self.log_file, previa)
         
         except Exception as e:
             self.log(f"Error finalizando sesión: {e}")
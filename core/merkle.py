@@ -0,0 +1,376 @@
+"""
+Árbol de Merkle sobre el vault de hashes.
+
+El vault plano (hashes_vault.json) se mantiene como fuente de los hashes por
+activo; este módulo construye sobre él un árbol de dos niveles:
+
+    raíz global  <-  raíces de familia (ordenadas por familia)
+    raíz familia <-  hojas (ordenadas por clave del vault)
+
+El árbol se guarda en hashes_vault.merkle con todos sus niveles, de modo que
+actualizar un activo solo recalcula su camino hasta la raíz (O(log N)) y
+verificar un activo o una familia no obliga a recalcular el resto.
+
+cargar_arbol() mantiene en memoria el árbol con el WAL del vault aplicado.
+La primera carga (y la siguiente a reescribir el árbol o el vault) lee el
+archivo y aplica todo el WAL. Las demás solo aplican los registros anexados
+desde la carga anterior y devuelven una copia, que es O(N) en listas de hashes
+sin leer ni parsear JSON. Cada registro aplicado cuesta O(log N) si el activo
+ya estaba en su familia, y O(tamaño de la familia) si es un alta.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from bisect import bisect_left
+
+from .serializacion import cargar_archivo, guardar_compacto
+
+RUTA_MERKLE = "hashes_vault.merkle"
+FAMILIA_DESCONOCIDA = "_sin_familia"
+RAMAS = ("patrones", "instrumentos")
+
+# Prefijos de dominio: una hoja nunca puede hacerse pasar por un nodo interno
+_PREFIJO_HOJA = b"\x00"
+_PREFIJO_NODO = b"\x01"
+
+_lock = threading.Lock()
+_cargado = None   # {"firmas", "wal_inodo", "posicion", "arbol"} del último cargar_arbol
+
+
+def hash_hoja(clave, hash_archivo):
+    """Hash de la hoja de un activo (liga la clave del vault con su hash)"""
+    return hashlib.sha256(_PREFIJO_HOJA + clave.encode("utf-8") + b"\x00" + hash_archivo.encode("ascii")).hexdigest()
+
+
+def hash_nodo(izquierda, derecha):
+    """Hash de un nodo interno a partir de sus dos hijos"""
+    return hashlib.sha256(_PREFIJO_NODO + bytes.fromhex(izquierda) + bytes.fromhex(derecha)).hexdigest()
+
+
+def familia_de_ruta(ruta_archivo):
+    """
+    Deduce la familia ('patrones/BLOQUES PATRON') de la ruta de un JSON de
+    activo o de un manifiesto de adjuntos.
+    """
+    partes = os.path.normpath(ruta_archivo).split(os.sep)
+    for i in range(len(partes) - 2, 0, -1):
+        if partes[i] in RAMAS and partes[i - 1] == "data":
+            return f"{partes[i]}/{partes[i + 1]}"
+    return FAMILIA_DESCONOCIDA
+
+
+def construir_niveles(hojas):
+    """
+    Construye todos los niveles de un árbol binario a partir de sus hojas.
+    Un nodo sin pareja sube tal cual al nivel superior.
+
+    Returns:
+        list: niveles[0] son las hojas y niveles[-1] == [raíz]
+    """
+    if not hojas:
+        return [[]]
+    niveles = [list(hojas)]
+    while len(niveles[-1]) > 1:
+        actual = niveles[-1]
+        superior = [hash_nodo(actual[i], actual[i + 1]) for i in range(0, len(actual) - 1, 2)]
+        if len(actual) % 2:
+            superior.append(actual[-1])
+        niveles.append(superior)
+    return niveles
+
+
+def raiz_de_niveles(niveles):
+    """Raíz de un árbol construido con construir_niveles ('' si está vacío)"""
+    return niveles[-1][0] if niveles and niveles[-1] else ""
+
+
+def actualizar_camino(niveles, indice, nueva_hoja):
+    """Sustituye una hoja y recalcula solo los nodos de su camino a la raíz"""
+    niveles[0][indice] = nueva_hoja
+    for n in range(1, len(niveles)):
+        indice //= 2
+        inferior = niveles[n - 1]
+        izquierda = 2 * indice
+        if izquierda + 1 < len(inferior):
+            niveles[n][indice] = hash_nodo(inferior[izquierda], inferior[izquierda + 1])
+        else:
+            niveles[n][indice] = inferior[izquierda]
+
+
+def _prueba_en_niveles(niveles, indice):
+    """Hermanos necesarios para subir desde 'indice' hasta la raíz: [(lado, hash), ...]"""
+    prueba = []
+    for n in range(len(niveles) - 1):
+        nivel = niveles[n]
+        hermano = indice ^ 1
+        if hermano < len(nivel):
+            prueba.append(("izq" if hermano < indice else "der", nivel[hermano]))
+        indice //= 2
+    return prueba
+
+
+def _subir_prueba(nodo, prueba):
+    for lado, hermano in prueba:
+        nodo = hash_nodo(hermano, nodo) if lado == "izq" else hash_nodo(nodo, hermano)
+    return nodo
+
+
+def construir_arbol(vault, familias):
+    """
+    Construye el árbol completo.
+
+    Args:
+        vault: dict clave -> hash (vault plano)
+        familias: dict clave -> familia; las claves sin familia van a FAMILIA_DESCONOCIDA
+    """
+    agrupado = {}
+    for clave in vault:
+        agrupado.setdefault(familias.get(clave, FAMILIA_DESCONOCIDA), []).append(clave)
+
+    arbol = {"version": 1, "familias": {}}
+    for familia, claves in agrupado.items():
+        claves.sort()
+        arbol["familias"][familia] = {
+            "claves": claves,
+            "niveles": construir_niveles([hash_hoja(c, vault[c]) for c in claves])
+        }
+    _reconstruir_nivel_familias(arbol)
+    return arbol
+
+
+def _reconstruir_nivel_familias(arbol):
+    orden = sorted(arbol["familias"])
+    arbol["orden_familias"] = orden
+    arbol["niveles"] = construir_niveles([raiz_de_niveles(arbol["familias"][f]["niveles"]) for f in orden])
+    arbol["raiz"] = raiz_de_niveles(arbol["niveles"])
+
+
+def _indice_clave(datos_familia, clave):
+    """Posición de la clave en las hojas de una familia (None si no está)"""
+    if not datos_familia:
+        return None
+    claves = datos_familia["claves"]
+    i = bisect_left(claves, clave)
+    return i if i < len(claves) and claves[i] == clave else None
+
+
+def familias_del_arbol(arbol):
+    """Mapa clave -> familia registrado en el árbol"""
+    return {clave: familia for familia, datos in arbol.get("familias", {}).items() for clave in datos["claves"]}
+
+
+def actualizar_hoja(arbol, clave, hash_archivo, familia):
+    """
+    Registra el nuevo hash de un activo.
+
+    Si la clave ya existe en su familia solo se recalculan los nodos de su
+    camino (O(log N)); un alta o un cambio de familia reconstruye la familia
+    afectada.
+    """
+    movida = False
+    if _indice_clave(arbol["familias"].get(familia), clave) is None:
+        for otra, datos in list(arbol["familias"].items()):
+            i = _indice_clave(datos, clave)
+            if i is None:
+                continue
+            # Cambio de familia: sale de la anterior
+            movida = True
+            del datos["claves"][i]
+            datos["niveles"] = construir_niveles(datos["niveles"][0][:i] + datos["niveles"][0][i + 1:])
+            if not datos["claves"]:
+                del arbol["familias"][otra]
+
+    nueva_familia = familia not in arbol["familias"]
+    datos = arbol["familias"].setdefault(familia, {"claves": [], "niveles": [[]]})
+    claves = datos["claves"]
+    hoja = hash_hoja(clave, hash_archivo)
+    i = bisect_left(claves, clave)
+
+    if i < len(claves) and claves[i] == clave:
+        actualizar_camino(datos["niveles"], i, hoja)
+    else:
+        claves.insert(i, clave)
+        hojas = datos["niveles"][0]
+        hojas.insert(i, hoja)
+        datos["niveles"] = construir_niveles(hojas)
+
+    orden = arbol.get("orden_familias", [])
+    if nueva_familia or movida or familia not in orden:
+        _reconstruir_nivel_familias(arbol)
+    else:
+        actualizar_camino(arbol["niveles"], orden.index(familia), raiz_de_niveles(datos["niveles"]))
+        arbol["raiz"] = raiz_de_niveles(arbol["niveles"])
+
+
+def prueba_inclusion(arbol, clave, familia=None):
+    """
+    Prueba de inclusión de un activo: familia, hoja y hermanos hasta la raíz global.
+    Si se indica la familia (familia_de_ruta) se busca solo en ella; si la
+    clave no está ahí se recorren las demás.
+
+    Returns:
+        dict o None si la clave no está en el árbol
+    """
+    familias = arbol.get("familias", {})
+    candidatas = list(familias.items())
+    if familia in familias:
+        candidatas.insert(0, (familia, familias[familia]))
+    for familia, datos in candidatas:
+        i = _indice_clave(datos, clave)
+        if i is not None:
+            return {
+                "familia": familia,
+                "hoja": datos["niveles"][0][i],
+                "prueba": _prueba_en_niveles(datos["niveles"], i)
+                          + _prueba_en_niveles(arbol["niveles"], arbol["orden_familias"].index(familia))
+            }
+    return None
+
+
+def verificar_prueba(clave, hash_archivo, prueba, raiz):
+    """Comprueba en O(log N) que un (clave, hash) pertenece al árbol de raíz dada"""
+    return _subir_prueba(hash_hoja(clave, hash_archivo), prueba) == raiz
+
+
+def raiz_desde_vault(vault, arbol):
+    """
+    Recalcula la raíz a partir del vault plano, usando la asignación de
+    familias del árbol guardado. Es lo que se compara con la raíz del log.
+    """
+    return construir_arbol(vault, familias_del_arbol(arbol))["raiz"]
+
+
+def _descender(niveles_guardados, niveles_actuales, nivel, indice, salida):
+    if niveles_guardados[nivel][indice] == niveles_actuales[nivel][indice]:
+        return
+    if nivel == 0:
+        salida.append(indice)
+        return
+    for hijo in (2 * indice, 2 * indice + 1):
+        if hijo < len(niveles_actuales[nivel - 1]):
+            _descender(niveles_guardados, niveles_actuales, nivel - 1, hijo, salida)
+
+
+def comparar_familia(arbol, familia, hashes_actuales):
+    """
+    Compara una familia con los hashes actuales de sus archivos.
+
+    Args:
+        hashes_actuales: dict clave -> hash calculado ahora para esa familia
+
+    Returns:
+        list: claves alteradas, añadidas o desaparecidas (vacía si coincide)
+    """
+    datos = arbol.get("familias", {}).get(familia, {"claves": [], "niveles": [[]]})
+    claves = datos["claves"]
+    actuales = sorted(hashes_actuales)
+
+    if actuales != claves:
+        # Altas o bajas: la forma del árbol cambia y no se puede descender
+        registradas = set(claves)
+        cambiadas = [c for c in actuales if c not in registradas]
+        cambiadas += [c for c in claves if c not in hashes_actuales]
+        cambiadas += [c for c in actuales if c in registradas
+                      and hash_hoja(c, hashes_actuales[c]) != datos["niveles"][0][bisect_left(claves, c)]]
+        return sorted(cambiadas)
+
+    niveles_actuales = construir_niveles([hash_hoja(c, hashes_actuales[c]) for c in claves])
+    if raiz_de_niveles(niveles_actuales) == raiz_de_niveles(datos["niveles"]):
+        return []
+
+    indices = []
+    _descender(datos["niveles"], niveles_actuales, len(niveles_actuales) - 1, 0, indices)
+    return [claves[i] for i in indices]
+
+
+def localizar_discrepancias(arbol, hashes_por_familia):
+    """
+    Localiza los activos alterados bajando por el árbol solo en las familias
+    cuya raíz no coincide.
+
+    Args:
+        hashes_por_familia: dict familia -> {clave: hash actual}
+
+    Returns:
+        dict: familia -> lista de claves con discrepancia
+    """
+    resultado = {}
+    for familia in set(hashes_por_familia) | set(arbol.get("familias", {})):
+        cambiadas = comparar_familia(arbol, familia, hashes_por_familia.get(familia, {}))
+        if cambiadas:
+            resultado[familia] = cambiadas
+    return resultado
+
+
+def _firma(ruta):
+    try:
+        st = os.stat(ruta)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def _copiar_arbol(arbol):
+    """Copia que el llamante puede modificar sin alterar el árbol en memoria"""
+    copia = dict(arbol)
+    copia["familias"] = {familia: dict(datos, claves=list(datos["claves"]),
+                                       niveles=[list(n) for n in datos["niveles"]])
+                         for familia, datos in arbol["familias"].items()}
+    copia["niveles"] = [list(n) for n in arbol.get("niveles", [])]
+    copia["orden_familias"] = list(arbol.get("orden_familias", []))
+    return copia
+
+
+def cargar_arbol():
+    """
+    Carga el árbol guardado (None si no existe o está dañado), con los
+    cambios pendientes del WAL del vault ya aplicados (ver el docstring del
+    módulo para el coste).
+    """
+    global _cargado
+    from core.seguridad import leer_wal_vault_desde, obtener_ruta_vault, obtener_ruta_wal_vault
+
+    # Compactar reescribe el árbol o el vault y vacía el WAL: cambian sus firmas
+    firmas = (_firma(RUTA_MERKLE), _firma(obtener_ruta_vault()))
+    if firmas[0] is None:
+        with _lock:
+            _cargado = None
+        return None
+    firma_wal = _firma(obtener_ruta_wal_vault())
+    wal_inodo = firma_wal[0] if firma_wal else None
+
+    with _lock:
+        previo = _cargado
+        reutilizable = (previo is not None and previo["firmas"] == firmas and
+                        (previo["posicion"] == 0 or
+                         (previo["wal_inodo"] == wal_inodo and firma_wal[1] >= previo["posicion"])))
+        if reutilizable:
+            arbol, posicion = previo["arbol"], previo["posicion"]
+        else:
+            try:
+                arbol = cargar_archivo(RUTA_MERKLE)
+            except (json.JSONDecodeError, OSError):
+                _cargado = None
+                return None
+            if not (isinstance(arbol, dict) and "familias" in arbol and "raiz" in arbol):
+                _cargado = None
+                return None
+            posicion = 0
+
+        registros, posicion = leer_wal_vault_desde(posicion)
+        for registro in registros:
+            actualizar_hoja(arbol, registro["clave"], registro["hash"],
+                            registro.get("familia") or FAMILIA_DESCONOCIDA)
+        _cargado = {"firmas": firmas, "wal_inodo": wal_inodo, "posicion": posicion, "arbol": arbol}
+        return _copiar_arbol(arbol)
+
+
+def guardar_arbol(arbol):
+    """Guarda el árbol de forma atómica"""
+    try:
+        guardar_compacto(RUTA_MERKLE, arbol, sort_keys=True)
+        return True
+    except Exception:
+        return False
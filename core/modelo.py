@@ -0,0 +1,288 @@
+"""
+Modelo tipado de activos: Instrumento, Patron, Calibracion y Punto.
+
+    from core import modelo
+
+    inst = modelo.cargar_instrumento(ruta_json)   # normalizado una vez por versión del archivo
+    inst.rango_min, inst.rango_max                # float (None si falta en el JSON)
+    inst.limites()                                # (min, max) con los valores por defecto
+    cal = inst.ultima_calibracion()               # Calibracion o None
+    cal.nominales, cal.errores                    # array('d')
+    for p in cal.puntos(): p.lecturas             # Punto (lecturas en array('d'))
+
+    pat = modelo.cargar_patron(ruta_json)
+    inst = modelo.como_instrumento(data)          # dict, vista o Instrumento
+
+El JSON guarda los números de forma irregular (rango_min "0" como texto,
+incertidumbre copiada de un QTextEdit, coma decimal, lecturas como texto
+'[1.0, 2.0]'...). El cargador los convierte una sola vez con numero() y las
+clases solo contienen floats e ints válidos, así que los consumidores no
+necesitan float() ni try/except. El rango y la periodicidad que faltan (o no
+se pueden leer) quedan en None, no en un valor inventado: formato() los
+muestra como 'N/A' y limites() aplica el rango por defecto de quien lo use.
+
+Cada Calibracion guarda sus puntos por columnas en array('d') (nominal,
+media, error e incertidumbre k=2) y todas las lecturas seguidas en un único
+array('d'), con los cortes de cada punto; Punto es la vista de una fila.
+
+El modelo es de lectura: para modificar y guardar un activo se sigue usando
+copia_documento() y core.guardado; 'datos' conserva el documento original.
+Como en core.vencimientos, el resultado de una vista de core.documentos se
+recuerda mientras la caché devuelva la misma vista (el archivo no cambió).
+"""
+
+import math
+import re
+import threading
+from array import array
+from collections import OrderedDict
+
+from .documentos import VistaDocumento, cargar_documento
+
+PATRON_NUMERO = re.compile(r"[-+]?(?:\d+(?:[.,]\d*)?|[.,]\d+)(?:[eE][-+]?\d+)?")
+
+RANGO_MIN_DEFECTO = 0.0
+RANGO_MAX_DEFECTO = 100.0
+RESOLUCION_DEFECTO = 0.001
+INCERTIDUMBRE_ELEMENTO_DEFECTO = 0.005
+LIMITE_MEMO = 4096
+
+_lock = threading.Lock()
+_memo = OrderedDict()     # id(vista) -> (vista, objeto del modelo)
+
+
+def numero(valor, defecto=0.0):
+    """
+    float de un valor del JSON: números, textos con coma decimal o unidades
+    ('0,002 mm') y None/''/'N/A' (-> defecto).
+    """
+    if isinstance(valor, bool):
+        return defecto
+    if isinstance(valor, (int, float)):
+        valor = float(valor)
+        return valor if math.isfinite(valor) else defecto
+    if isinstance(valor, str):
+        m = PATRON_NUMERO.search(valor)
+        if m:
+            try:
+                valor = float(m.group().replace(',', '.'))
+            except ValueError:
+                return defecto
+            return valor if math.isfinite(valor) else defecto
+    return defecto
+
+
+def entero(valor, defecto):
+    valor = numero(valor, None)
+    return int(valor) if valor else defecto
+
+
+def formato(valor, vacio='N/A'):
+    """Número para mostrar ('N/A' si falta)"""
+    return vacio if valor is None else f"{valor:g}"
+
+
+def lista_numeros(valor):
+    """array('d') de una lista de lecturas (o del texto '[1.0, 2.0]'); descarta lo que no es número"""
+    if isinstance(valor, str):
+        valor = valor.replace('[', '').replace(']', '').split(',')
+    resultado = array('d')
+    for v in valor or ():
+        v = numero(v, None)
+        if v is not None:
+            resultado.append(v)
+    return resultado
+
+
+def texto(valor, defecto=''):
+    return defecto if valor is None else str(valor)
+
+
+class Punto:
+    """Fila de una calibración"""
+
+    __slots__ = ("id_patron", "valor_nominal", "media", "error", "incertidumbre_k2", "lecturas")
+
+    def __init__(self, id_patron, valor_nominal, media, error, incertidumbre_k2, lecturas):
+        self.id_patron = id_patron
+        self.valor_nominal = valor_nominal
+        self.media = media
+        self.error = error
+        self.incertidumbre_k2 = incertidumbre_k2
+        self.lecturas = lecturas
+
+    @property
+    def total(self):
+        """Incertidumbre total |E| + U"""
+        return abs(self.error) + self.incertidumbre_k2
+
+
+class Calibracion:
+    """Una entrada del historial, con los puntos por columnas"""
+
+    __slots__ = ("fecha", "responsable", "apto", "error_maximo",
+                 "id_patrones", "nominales", "medias", "errores", "incertidumbres",
+                 "lecturas", "cortes")
+
+    def __init__(self, fecha, responsable, apto, error_maximo):
+        self.fecha = fecha
+        self.responsable = responsable
+        self.apto = apto
+        self.error_maximo = error_maximo
+        self.id_patrones = []
+        self.nominales = array('d')
+        self.medias = array('d')
+        self.errores = array('d')
+        self.incertidumbres = array('d')
+        self.lecturas = array('d')
+        self.cortes = array('l', [0])
+
+    @classmethod
+    def desde_dict(cls, d):
+        cal = cls(texto(d.get('fecha_calibracion')), texto(d.get('responsable'), 'N/A'),
+                  bool(d.get('apto', False)), numero(d.get('error_maximo')))
+        for p in d.get('puntos') or ():
+            cal.anadir_punto(p)
+        return cal
+
+    def anadir_punto(self, p):
+        nominal = numero(p.get('valor_nominal'))
+        lecturas = lista_numeros(p.get('lecturas'))
+        media_calculada = sum(lecturas) / len(lecturas) if lecturas else nominal
+        media = numero(p.get('media_lecturas', p.get('media')), media_calculada)
+        self.id_patrones.append(texto(p.get('id_patron')))
+        self.nominales.append(nominal)
+        self.medias.append(media)
+        self.errores.append(numero(p.get('error'), media - nominal))
+        self.incertidumbres.append(numero(p.get('incertidumbre_k2')))
+        self.lecturas.extend(lecturas)
+        self.cortes.append(len(self.lecturas))
+
+    def __len__(self):
+        return len(self.nominales)
+
+    @property
+    def fecha_dia(self):
+        """'YYYY-MM-DD' de la fecha de calibración"""
+        return self.fecha[:10]
+
+    def lecturas_punto(self, i):
+        return self.lecturas[self.cortes[i]:self.cortes[i + 1]]
+
+    def punto(self, i):
+        return Punto(self.id_patrones[i], self.nominales[i], self.medias[i], self.errores[i],
+                     self.incertidumbres[i], self.lecturas_punto(i))
+
+    def puntos(self):
+        return [self.punto(i) for i in range(len(self))]
+
+    def incertidumbre_total(self):
+        """Máximo de |E| + U entre los puntos (0.0 sin puntos)"""
+        return max((abs(e) + u for e, u in zip(self.errores, self.incertidumbres)), default=0.0)
+
+    def max_lecturas(self):
+        return max((self.cortes[i + 1] - self.cortes[i] for i in range(len(self))), default=0)
+
+
+class Instrumento:
+    __slots__ = ("id", "familia", "descripcion", "rango_min", "rango_max", "resolucion",
+                 "periodicidad_meses", "incertidumbre_elemento", "patrones_sugeridos",
+                 "estado", "historial", "datos")
+
+    @classmethod
+    def desde_dict(cls, d):
+        inst = cls()
+        inst.id = texto(d.get('id'), 'N/A')
+        inst.familia = texto(d.get('familia'))
+        inst.descripcion = texto(d.get('descripcion'), 'N/A')
+        inst.rango_min = numero(d.get('rango_min'), None)
+        inst.rango_max = numero(d.get('rango_max'), None)
+        inst.resolucion = numero(d.get('resolucion'), RESOLUCION_DEFECTO)
+        inst.periodicidad_meses = entero(d.get('periodicidad_meses'), None)
+        inst.incertidumbre_elemento = numero(d.get('incertidumbre_elemento'), INCERTIDUMBRE_ELEMENTO_DEFECTO)
+        inst.patrones_sugeridos = texto(d.get('patrones_sugeridos'), 'N/A')
+        inst.estado = texto(d.get('estado')).lower()
+        inst.historial = tuple(Calibracion.desde_dict(c) for c in d.get('historial') or ())
+        inst.datos = d
+        return inst
+
+    def limites(self, defecto_min=RANGO_MIN_DEFECTO, defecto_max=RANGO_MAX_DEFECTO):
+        """(rango_min, rango_max) con los valores por defecto para los que faltan"""
+        return (defecto_min if self.rango_min is None else self.rango_min,
+                defecto_max if self.rango_max is None else self.rango_max)
+
+    def ultima_calibracion(self):
+        return self.historial[-1] if self.historial else None
+
+    def calibracion(self, indice=-1):
+        """Calibración 'indice' del historial (fuera de rango: la última; None sin historial)"""
+        if 0 <= indice < len(self.historial):
+            return self.historial[indice]
+        return self.ultima_calibracion()
+
+    def con_historial(self, calibraciones):
+        """Copia del instrumento con otro historial (p. ej. una sola calibración para su ICI)"""
+        copia = Instrumento()
+        for campo in Instrumento.__slots__:
+            setattr(copia, campo, getattr(self, campo))
+        copia.historial = tuple(calibraciones)
+        return copia
+
+
+class Patron:
+    __slots__ = ("id", "familia", "descripcion", "valor_nominal", "incertidumbre",
+                 "periodicidad_meses", "estado", "material", "clase", "certificado", "datos")
+
+    @classmethod
+    def desde_dict(cls, d):
+        pat = cls()
+        pat.id = texto(d.get('id'), 'N/A')
+        pat.familia = texto(d.get('familia'))
+        pat.descripcion = texto(d.get('descripcion'))
+        pat.valor_nominal = numero(d.get('valor_nominal'))
+        pat.incertidumbre = numero(d.get('incertidumbre'))
+        pat.periodicidad_meses = entero(d.get('periodicidad_meses'), None)
+        pat.estado = texto(d.get('estado')).lower()
+        pat.material = texto(d.get('material'))
+        pat.clase = texto(d.get('clase'))
+        pat.certificado = texto(d.get('certificado'))
+        pat.datos = d
+        return pat
+
+
+def _desde_documento(data, clase):
+    if not isinstance(data, VistaDocumento):
+        return clase.desde_dict(data)
+    with _lock:
+        entrada = _memo.get(id(data))
+        if entrada is not None and entrada[0] is data and isinstance(entrada[1], clase):
+            _memo.move_to_end(id(data))
+            return entrada[1]
+    objeto = clase.desde_dict(data)
+    with _lock:
+        # Se guarda la vista con el objeto: su id no se reutiliza mientras viva aquí
+        _memo[id(data)] = (data, objeto)
+        while len(_memo) > LIMITE_MEMO:
+            _memo.popitem(last=False)
+    return objeto
+
+
+def como_instrumento(data):
+    """Instrumento de un dict de activo (o el propio Instrumento)"""
+    return data if isinstance(data, Instrumento) else _desde_documento(data, Instrumento)
+
+
+def como_patron(data):
+    return data if isinstance(data, Patron) else _desde_documento(data, Patron)
+
+
+def cargar_instrumento(ruta):
+    """
+    Raises:
+        OSError, ValueError: como cargar_documento()
+    """
+    return como_instrumento(cargar_documento(ruta))
+
+
+def cargar_patron(ruta):
+    return como_patron(cargar_documento(ruta))
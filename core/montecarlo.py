@@ -0,0 +1,233 @@
+"""
+Propagación de incertidumbre por Monte Carlo (JCGM 101:2008, suplemento 1 de la GUM).
+
+    from core import montecarlo
+
+    montecarlo.propagar(puntos, resolucion)               # un resultado por punto
+    montecarlo.evaluar_instrumento(data, u_patrones)      # última calibración (o todo el historial)
+    montecarlo.recalcular(tareas, procesos=4)             # todo el parque, en paralelo
+
+Modelo de cada punto, el mismo que la combinación lineal de save_calibration:
+
+    E = media + δrep + δres - (nominal + δpat)
+
+    δrep  repetibilidad de la media: s/√n · t(n-1)  (n >= 2; sin lecturas repetidas no aporta)
+    δres  resolución: rectangular en ±resolución/2
+    δpat  patrón: normal con u = U(k=2)/2 del certificado
+
+Se extraen 'muestras' valores de E (10^5-10^6) para todos los puntos de una
+calibración a la vez, como un array de numpy de puntos x muestras (en bloques
+de puntos para no pasar de LIMITE_ELEMENTOS). De cada punto se obtiene la
+media, la incertidumbre típica y el intervalo de cobertura probabilísticamente
+simétrico al 95 %; su semiancho se informa junto a incertidumbre_k2 (GUM), y
+gum_valido indica si el intervalo de la GUM queda validado según JCGM 101 §8
+(diferencias en los extremos <= δ, con U redondeada a dos cifras significativas).
+
+Con 2 o 3 lecturas la incertidumbre típica u es None: la t de n-1 grados de
+libertad no tiene varianza finita y JCGM 101 §6.4.9 solo la define para n > 3.
+Para esos puntos se informa el intervalo de cobertura, que sí está definido.
+
+Es opcional: save_calibration solo lo usa con METROLOGIA_MONTECARLO=1 (o
+activar()), y el recálculo del parque es la orden 'python -m core montecarlo'.
+"""
+
+import os
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .perfilado import medir
+from .modelo import como_instrumento, numero
+
+VARIABLE_ENTORNO = "METROLOGIA_MONTECARLO"
+MUESTRAS_DEFECTO = 200_000
+PROBABILIDAD = 0.95
+LIMITE_ELEMENTOS = 4_000_000      # muestras por bloque de puntos (32 MB en float64)
+CIFRAS_SIGNIFICATIVAS = 2
+
+_activo = os.environ.get(VARIABLE_ENTORNO, "").strip().lower() in ("1", "true", "si", "sí")
+
+
+def activar(estado=True):
+    global _activo
+    _activo = bool(estado)
+
+
+def esta_activo():
+    return _activo
+
+
+def incertidumbre_gum(lecturas, incertidumbre_patron, resolucion):
+    """U (k=2) por combinación lineal, como save_calibration (nunca menor que la resolución)"""
+    n = len(lecturas)
+    u_a = float(np.std(lecturas, ddof=1)) / math.sqrt(n) if n > 1 else 0.0
+    u_res = resolucion / math.sqrt(12)
+    uc = math.sqrt(u_a ** 2 + (incertidumbre_patron / 2) ** 2 + u_res ** 2)
+    return max(2 * uc, resolucion)
+
+
+def _tolerancia(incertidumbre, cifras=CIFRAS_SIGNIFICATIVAS):
+    """δ de JCGM 101 §7.9.2: media unidad de la última cifra significativa de U"""
+    if incertidumbre <= 0:
+        return 0.0
+    return 0.5 * 10 ** (math.floor(math.log10(incertidumbre)) - cifras + 1)
+
+
+def _muestrear(rng, medias, errores_medios, escalas, grados, u_patron, semiancho_res, muestras):
+    """Array puntos x muestras de E"""
+    forma = (len(medias), muestras)
+    e = rng.standard_t(grados[:, None], size=forma)
+    e *= escalas[:, None]
+    e += errores_medios[:, None]
+    e += rng.uniform(-semiancho_res, semiancho_res, size=forma)
+    e -= rng.normal(0.0, u_patron[:, None], size=forma)
+    return e
+
+
+@medir("montecarlo.propagar")
+def propagar(puntos, resolucion, muestras=MUESTRAS_DEFECTO, probabilidad=PROBABILIDAD, semilla=None):
+    """
+    Monte Carlo de todos los puntos de una calibración.
+
+    Args:
+        puntos: dicts con valor_nominal, lecturas e incertidumbre_patron (U k=2
+                del patrón); incertidumbre_k2 opcional (la de la GUM a validar;
+                si falta se calcula con incertidumbre_gum)
+        resolucion: resolución del instrumento
+        muestras: extracciones por punto
+        semilla: semilla o SeedSequence del generador (None: aleatoria)
+
+    Returns:
+        list: por punto, dict con valor_nominal, error, u (None con 2 o 3
+              lecturas), intervalo [inf, sup],
+              incertidumbre_mc (semiancho del intervalo), incertidumbre_k2,
+              gum_valido y muestras
+    """
+    if not puntos:
+        return []
+    rng = np.random.default_rng(semilla)
+    lecturas = [np.asarray(p['lecturas'], dtype=np.float64) for p in puntos]
+    nominales = np.array([p['valor_nominal'] for p in puntos], dtype=np.float64)
+    n = np.array([len(l) for l in lecturas])
+    medias = np.array([l.mean() if len(l) else nom for l, nom in zip(lecturas, nominales)])
+    desviaciones = np.array([l.std(ddof=1) if len(l) > 1 else 0.0 for l in lecturas])
+    escalas = np.where(n > 1, desviaciones / np.sqrt(np.maximum(n, 1)), 0.0)
+    grados = np.maximum(n - 1, 1).astype(np.float64)
+    sin_varianza = ((n > 1) & (n <= 3)).tolist()
+    u_patron = np.array([p['incertidumbre_patron'] / 2 for p in puntos], dtype=np.float64)
+    gum = [p.get('incertidumbre_k2') or incertidumbre_gum(l, p['incertidumbre_patron'], resolucion)
+           for p, l in zip(puntos, lecturas)]
+
+    cola = (1 - probabilidad) / 2
+    bloque = max(1, LIMITE_ELEMENTOS // muestras)
+    resultados = []
+    for inicio in range(0, len(puntos), bloque):
+        tramo = slice(inicio, inicio + bloque)
+        e = _muestrear(rng, medias[tramo], medias[tramo] - nominales[tramo], escalas[tramo],
+                       grados[tramo], u_patron[tramo], resolucion / 2, muestras)
+        inferiores, superiores = np.quantile(e, [cola, 1 - cola], axis=1)
+        errores, u = e.mean(axis=1), e.std(axis=1, ddof=1)
+        del e
+        for i, (inf, sup, error, ut) in enumerate(zip(inferiores.tolist(), superiores.tolist(),
+                                                      errores.tolist(), u.tolist()), start=inicio):
+            estimado = float(medias[i] - nominales[i])
+            delta = _tolerancia(gum[i])
+            resultados.append({
+                "valor_nominal": float(nominales[i]),
+                "error": round(error, 6),
+                "u": None if sin_varianza[i] else round(ut, 6),
+                "intervalo": [round(inf, 6), round(sup, 6)],
+                "incertidumbre_mc": round((sup - inf) / 2, 6),
+                "incertidumbre_k2": round(gum[i], 6),
+                "gum_valido": (abs(estimado - gum[i] - inf) <= delta and
+                               abs(estimado + gum[i] - sup) <= delta),
+                "muestras": muestras,
+            })
+    return resultados
+
+
+def _incertidumbre_patron_estimada(lecturas, incertidumbre_k2, resolucion):
+    """U (k=2) del patrón despejada de la U guardada, para patrones que ya no están en el inventario"""
+    n = len(lecturas)
+    u_a = float(np.std(lecturas, ddof=1)) / math.sqrt(n) if n > 1 else 0.0
+    resto = (incertidumbre_k2 / 2) ** 2 - u_a ** 2 - resolucion ** 2 / 12
+    return 2 * math.sqrt(max(resto, 0.0))
+
+
+def puntos_calibracion(calibracion, resolucion, u_patrones):
+    """
+    Puntos de entrada de propagar() para una Calibracion de core.modelo.
+
+    Args:
+        u_patrones: {ID de patrón: U k=2}; los que falten se estiman desde la U guardada
+    """
+    puntos = []
+    for i in range(len(calibracion)):
+        lecturas = calibracion.lecturas_punto(i)
+        id_patron = calibracion.id_patrones[i]
+        u_patron = u_patrones.get(id_patron)
+        if u_patron is None:
+            u_patron = _incertidumbre_patron_estimada(lecturas, calibracion.incertidumbres[i], resolucion)
+        puntos.append({
+            "id_patron": id_patron,
+            "valor_nominal": calibracion.nominales[i],
+            "lecturas": lecturas,
+            "incertidumbre_patron": u_patron,
+            "incertidumbre_k2": calibracion.incertidumbres[i] or None,
+        })
+    return puntos
+
+
+def tareas_instrumento(data, u_patrones, historial=False):
+    """[(id, fecha, resolucion, puntos)] de la última calibración del instrumento (o de todas)"""
+    instrumento = como_instrumento(data)
+    calibraciones = instrumento.historial if historial else instrumento.historial[-1:]
+    return [(instrumento.id, cal.fecha, instrumento.resolucion,
+             puntos_calibracion(cal, instrumento.resolucion, u_patrones))
+            for cal in calibraciones if len(cal)]
+
+
+def _evaluar_tarea(tarea, muestras, probabilidad, semilla):
+    id_activo, fecha, resolucion, puntos = tarea
+    resultados = propagar(puntos, resolucion, muestras, probabilidad, semilla)
+    for punto, resultado in zip(puntos, resultados):
+        resultado["id_patron"] = punto["id_patron"]
+    return {"id": id_activo, "fecha": fecha, "puntos": resultados}
+
+
+def _evaluar_tanda(tareas, muestras, probabilidad, semillas):
+    return [_evaluar_tarea(t, muestras, probabilidad, s) for t, s in zip(tareas, semillas)]
+
+
+@medir("montecarlo.recalcular")
+def recalcular(tareas, muestras=MUESTRAS_DEFECTO, probabilidad=PROBABILIDAD, procesos=None, semilla=None):
+    """
+    Monte Carlo de muchas calibraciones (ver tareas_instrumento) en un
+    ProcessPoolExecutor; con procesos=1 se calcula en este proceso. Cada
+    calibración usa su propio flujo aleatorio derivado de 'semilla', así que
+    el resultado no depende del número de procesos.
+
+    Returns:
+        list: {id, fecha, puntos (ver propagar)} en el orden de 'tareas'
+    """
+    tareas = list(tareas)
+    semillas = np.random.SeedSequence(semilla).spawn(len(tareas))
+    procesos = procesos or os.cpu_count() or 1
+    if procesos == 1 or len(tareas) < 2:
+        return _evaluar_tanda(tareas, muestras, probabilidad, semillas)
+
+    # Tandas de calibraciones por proceso: menos envíos entre procesos
+    tamano = max(1, math.ceil(len(tareas) / (procesos * 4)))
+    tandas = [(tareas[i:i + tamano], semillas[i:i + tamano]) for i in range(0, len(tareas), tamano)]
+    resultados = []
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        futuros = [pool.submit(_evaluar_tanda, t, muestras, probabilidad, s) for t, s in tandas]
+        for futuro in futuros:
+            resultados.extend(futuro.result())
+    return resultados
+
+
+def incertidumbres_patrones(filas_patrones):
+    """{ID: U k=2} de las filas de data/index_patrones.json"""
+    return {f.get("id"): numero(f.get("incertidumbre")) for f in filas_patrones if "incertidumbre" in f}
@@ -1,6 +1,8 @@
 from fpdf import FPDF
 from datetime import datetime
 from .grafica_generator import crear_grafica_pdf
+from .perfilado import medir
+from .modelo import como_instrumento, formato
 import os
 import unicodedata
 
@@ -59,21 +61,23 @@ class PDFGenerador(FPDF):
             self.cell(0, 10, limpiar_texto_pdf(texto_pagina), 0, 0, "L")
             self.cell(0, 10, f"Fecha impresion: {datetime.now().strftime('%d/%m/%Y')}", 0, 0, "R")
         
+@medir("pdf.exportar")
 def exportar_a_pdf(data, ruta_entrada):
     """
     Genera el PDF del informe ICI con todos los digitos a 4 decimales
     y grafica de tendencia lineal.
+    'data' es un Instrumento de core.modelo (o el dict del activo).
     """
+    instrumento = como_instrumento(data)
+
     # 1. Determinacion de la ruta de salida
-    id_elemento = data.get('id', 'N/A')
+    id_elemento = instrumento.id
     fecha_cal = datetime.now().strftime('%Y%m%d')
     
-    if data.get('historial'):
-        ultima = data['historial'][-1]
-        ultima_fecha = ultima.get('fecha_calibracion', '')
-        if ultima_fecha:
-            # Extrae YYYYMMDD de "YYYY-MM-DD HH:MM"
-            fecha_cal = ultima_fecha.split()[0].replace("-", "")
+    ultima = instrumento.ultima_calibracion()
+    if ultima is not None and ultima.fecha:
+        # Extrae YYYYMMDD de "YYYY-MM-DD HH:MM"
+        fecha_cal = ultima.fecha.split()[0].replace("-", "")
 
     id_informe = f"ICI-{id_elemento}-{fecha_cal}"
     
@@ -108,21 +112,19 @@ def exportar_a_pdf(data, ruta_entrada):
     pdf.set_text_color(0, 0, 0)
     
     # Limpieza completa de caracteres para FPDF
-    desc = limpiar_texto_pdf(data.get('descripcion', 'N/A'))
-    patrones = limpiar_texto_pdf(data.get('patrones_sugeridos', 'N/A'))
-    responsable = limpiar_texto_pdf(ultima.get('responsable', 'N/A'))
+    desc = limpiar_texto_pdf(instrumento.descripcion)
+    patrones = limpiar_texto_pdf(instrumento.patrones_sugeridos)
+    responsable = limpiar_texto_pdf(ultima.responsable if ultima is not None else 'N/A')
     
     col_w = 45
     pdf.cell(col_w, 6, "Descripcion:", 0, 0); pdf.set_font("Arial", "B", 10); pdf.cell(0, 6, desc, 0, 1); pdf.set_font("Arial", "", 10)
-    pdf.cell(col_w, 6, "Rango de medida:", 0, 0); pdf.cell(0, 6, f"{data.get('rango_min', 'N/A')} - {data.get('rango_max', 'N/A')} mm", 0, 1)
-    pdf.cell(col_w, 6, "Periodicidad:", 0, 0); pdf.cell(0, 6, f"{data.get('periodicidad_meses', 'N/A')} meses", 0, 1)
+    pdf.cell(col_w, 6, "Rango de medida:", 0, 0); pdf.cell(0, 6, f"{formato(instrumento.rango_min)} - {formato(instrumento.rango_max)} mm", 0, 1)
+    pdf.cell(col_w, 6, "Periodicidad:", 0, 0); pdf.cell(0, 6, f"{formato(instrumento.periodicidad_meses)} meses", 0, 1)
     pdf.cell(col_w, 6, "Patrones utilizados:", 0, 0); pdf.cell(0, 6, patrones, 0, 1)
     pdf.ln(3)
 
     # --- BLOQUE 2: RESULTADOS DE LA CALIBRACION ---
-    if data.get('historial'):
-        ultima = data['historial'][-1]
-        
+    if ultima is not None:
         pdf.set_fill_color(245, 245, 245)
         pdf.set_font("Arial", "B", 11)
         pdf.cell(0, 8, "  RESUMEN DE CALIBRACION", 0, 1, fill=True)
@@ -130,7 +132,7 @@ def exportar_a_pdf(data, ruta_entrada):
         
         pdf.set_font("Arial", "", 10)
         # Formatear fecha de calibración a formato europeo DD/MM/YYYY
-        fecha_cal_formateada = ultima.get('fecha_calibracion', 'N/A')
+        fecha_cal_formateada = ultima.fecha or 'N/A'
         if fecha_cal_formateada != 'N/A':
             try:
                 # Convertir de "YYYY-MM-DD HH:MM:SS" a "DD/MM/YYYY"
@@ -160,31 +162,22 @@ def exportar_a_pdf(data, ruta_entrada):
         pdf.set_font("Arial", "", 8)
         pdf.set_text_color(0, 0, 0)
         
-        for idx, punto in enumerate(ultima.get('puntos', []), 1):
+        for idx, punto in enumerate(ultima.puntos(), 1):
             # Formateo estricto a 4 decimales
-            try:
-                nominal = float(punto.get('valor_nominal', 0))
-                media = float(punto.get('media_lecturas', 0))
-                error = float(punto.get('error', 0))
-                incert = float(punto.get('incertidumbre_k2', 0))
-                total = abs(error) + incert
-            except (ValueError, TypeError):
-                nominal = media = error = incert = total = 0.0
-            
             pdf.cell(10, 7, str(idx), 1, 0, "C")
-            pdf.cell(22, 7, limpiar_texto_pdf(str(punto.get('id_patron', 'N/A'))), 1, 0, "C")
-            pdf.cell(22, 7, f"{nominal:.4f}", 1, 0, "C")
-            pdf.cell(22, 7, f"{media:.4f}", 1, 0, "C")
-            pdf.cell(22, 7, f"{error:.4f}", 1, 0, "C")
-            pdf.cell(22, 7, f"{incert:.4f}", 1, 0, "C")
+            pdf.cell(22, 7, limpiar_texto_pdf(punto.id_patron or 'N/A'), 1, 0, "C")
+            pdf.cell(22, 7, f"{punto.valor_nominal:.4f}", 1, 0, "C")
+            pdf.cell(22, 7, f"{punto.media:.4f}", 1, 0, "C")
+            pdf.cell(22, 7, f"{punto.error:.4f}", 1, 0, "C")
+            pdf.cell(22, 7, f"{punto.incertidumbre_k2:.4f}", 1, 0, "C")
             
             pdf.set_font("Arial", "B", 8)
-            pdf.cell(40, 7, f"{total:.4f} mm", 1, 0, "C")
+            pdf.cell(40, 7, f"{punto.total:.4f} mm", 1, 0, "C")
             pdf.set_font("Arial", "", 8)
             
             # Color segun estado APTO/NO APTO
-            pdf.set_text_color(39, 174, 96) if ultima.get('apto') else pdf.set_text_color(231, 76, 60)
-            pdf.cell(28, 7, "APTO" if ultima.get('apto') else "FUERA TOL.", 1, 1, "C")
+            pdf.set_text_color(39, 174, 96) if ultima.apto else pdf.set_text_color(231, 76, 60)
+            pdf.cell(28, 7, "APTO" if ultima.apto else "FUERA TOL.", 1, 1, "C")
             pdf.set_text_color(0, 0, 0)
 
         # --- NOTA DE CONFORMIDAD DE TRAZABILIDAD ---
@@ -193,7 +186,7 @@ def exportar_a_pdf(data, ruta_entrada):
         pdf.set_text_color(100, 100, 100)
         
         # Formatear fecha de calibración a formato europeo DD/MM/YYYY
-        fecha_nota = ultima.get('fecha_calibracion', datetime.now().strftime('%Y-%m-%d')).split()[0]
+        fecha_nota = (ultima.fecha or datetime.now().strftime('%Y-%m-%d')).split()[0]
         try:
                 # Convertir de "YYYY-MM-DD" a "DD/MM/YYYY"
                 fecha_dt = datetime.strptime(fecha_nota, '%Y-%m-%d')
@@ -216,7 +209,7 @@ def exportar_a_pdf(data, ruta_entrada):
         pdf.cell(0, 8, "  ANALISIS GRAFICO DE DESVIACION LINEAL", 0, 1, fill=True)
         
         # Llamada al generador de grafica (ahora usa eje X en mm)
-        grafica_path = crear_grafica_pdf(data)
+        grafica_path = crear_grafica_pdf(instrumento)
         if grafica_path and os.path.exists(grafica_path):
             # Centrar la imagen en el ancho A4 (210mm)
             pdf.image(grafica_path, x=20, y=pdf.get_y() + 5, w=160)
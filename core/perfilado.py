@@ -0,0 +1,195 @@
+"""
+Instrumentación ligera de tiempos para las rutas críticas.
+
+    from core.perfilado import medir
+
+    @medir("indices.generar")
+    def generar_indices(): ...
+
+    with medir("vault.guardar"):
+        ...
+
+Desactivada por defecto: tanto el decorador como el gestor de contexto solo
+comprueban un indicador global, así que sin perfilado el coste es una llamada.
+Se activa con la variable de entorno METROLOGIA_PERFILADO=1 o con activar().
+
+Cada operación acumula número de llamadas, total, mínimo, máximo y un
+histograma en potencias de 2 de microsegundos (cubeta k = [2^(k-1), 2^k) µs).
+El resumen se puede volcar a JSON o ver en la ventana de Auditoría.
+capturar_perfil(nombre) arma una traza cProfile para la siguiente ejecución
+de esa operación.
+"""
+
+import os
+import time
+import json
+import threading
+from functools import wraps
+
+VARIABLE_ENTORNO = "METROLOGIA_PERFILADO"
+DIRECTORIO_PERFILES = "perfiles"
+
+_activo = os.environ.get(VARIABLE_ENTORNO, "").strip().lower() in ("1", "true", "si", "sí")
+_lock = threading.Lock()
+_estadisticas = {}      # nombre -> [llamadas, total_ns, min_ns, max_ns, {cubeta: n}]
+_capturas = {}          # nombre -> ruta .prof pendiente de capturar
+_perfiles_guardados = []
+
+
+def activar(estado=True):
+    global _activo
+    _activo = bool(estado)
+
+
+def esta_activo():
+    return _activo
+
+
+def registrar(nombre, duracion_ns):
+    """Añade una medida (en nanosegundos) a la operación 'nombre'"""
+    cubeta = max(0, duracion_ns // 1000).bit_length()
+    with _lock:
+        est = _estadisticas.get(nombre)
+        if est is None:
+            _estadisticas[nombre] = [1, duracion_ns, duracion_ns, duracion_ns, {cubeta: 1}]
+            return
+        est[0] += 1
+        est[1] += duracion_ns
+        if duracion_ns < est[2]:
+            est[2] = duracion_ns
+        if duracion_ns > est[3]:
+            est[3] = duracion_ns
+        est[4][cubeta] = est[4].get(cubeta, 0) + 1
+
+
+class medir:
+    """
+    Gestor de contexto y decorador de tiempos para la operación 'nombre'.
+    Cada 'with medir(...)' crea su propio objeto, así que admite anidamiento e hilos.
+    """
+
+    __slots__ = ("nombre", "inicio", "perfil", "ruta_perfil")
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.inicio = None
+        self.perfil = None
+
+    def __enter__(self):
+        if not _activo:
+            return self
+        if _capturas:
+            with _lock:
+                ruta = _capturas.pop(self.nombre, None)
+            if ruta:
+                import cProfile
+                self.ruta_perfil = ruta
+                self.perfil = cProfile.Profile()
+                self.perfil.enable()
+        self.inicio = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        if self.inicio is None:
+            return False
+        registrar(self.nombre, time.perf_counter_ns() - self.inicio)
+        self.inicio = None
+        if self.perfil is not None:
+            self.perfil.disable()
+            _guardar_perfil(self.perfil, self.ruta_perfil)
+            self.perfil = None
+        return False
+
+    def __call__(self, funcion):
+        nombre = self.nombre
+
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not _activo:
+                return funcion(*args, **kwargs)
+            with medir(nombre):
+                return funcion(*args, **kwargs)
+        return envoltura
+
+
+def _percentil(histograma, llamadas, fraccion):
+    """Límite superior (µs) de la cubeta que contiene el percentil"""
+    objetivo = fraccion * llamadas
+    acumulado = 0
+    for cubeta in sorted(histograma):
+        acumulado += histograma[cubeta]
+        if acumulado >= objetivo:
+            return 1 << cubeta
+    return None
+
+
+def resumen():
+    """
+    Returns:
+        list: una fila por operación, ordenadas por tiempo total descendente
+    """
+    with _lock:
+        copia = {n: (e[0], e[1], e[2], e[3], dict(e[4])) for n, e in _estadisticas.items()}
+    filas = []
+    for nombre, (llamadas, total, minimo, maximo, histograma) in copia.items():
+        filas.append({
+            "operacion": nombre,
+            "llamadas": llamadas,
+            "total_ms": round(total / 1e6, 3),
+            "media_ms": round(total / llamadas / 1e6, 3),
+            "min_ms": round(minimo / 1e6, 3),
+            "max_ms": round(maximo / 1e6, 3),
+            "p50_us_max": _percentil(histograma, llamadas, 0.5),
+            "p95_us_max": _percentil(histograma, llamadas, 0.95),
+            "histograma_log2_us": {str(1 << c): n for c, n in sorted(histograma.items())},
+        })
+    filas.sort(key=lambda f: f["total_ms"], reverse=True)
+    return filas
+
+
+def reiniciar():
+    with _lock:
+        _estadisticas.clear()
+
+
+def volcar(ruta=None):
+    """Guarda el resumen en JSON y devuelve la ruta"""
+    if ruta is None:
+        os.makedirs(DIRECTORIO_PERFILES, exist_ok=True)
+        ruta = os.path.join(DIRECTORIO_PERFILES, f"tiempos_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump({"activo": _activo, "operaciones": resumen()}, f, indent=2, ensure_ascii=False)
+    return ruta
+
+
+def capturar_perfil(nombre, ruta=None):
+    """
+    Arma una captura cProfile para la siguiente ejecución de 'nombre'
+    (activa el perfilado si no lo estaba). Devuelve la ruta del .prof.
+    """
+    if ruta is None:
+        os.makedirs(DIRECTORIO_PERFILES, exist_ok=True)
+        seguro = "".join(c if c.isalnum() else "_" for c in nombre)
+        ruta = os.path.join(DIRECTORIO_PERFILES, f"perfil_{seguro}_{time.strftime('%Y%m%d_%H%M%S')}.prof")
+    activar(True)
+    with _lock:
+        _capturas[nombre] = ruta
+    return ruta
+
+
+def _guardar_perfil(perfil, ruta):
+    try:
+        import io
+        import pstats
+        perfil.dump_stats(ruta)
+        texto = io.StringIO()
+        pstats.Stats(perfil, stream=texto).sort_stats("cumulative").print_stats(40)
+        with open(os.path.splitext(ruta)[0] + ".txt", 'w', encoding='utf-8') as f:
+            f.write(texto.getvalue())
+        _perfiles_guardados.append(ruta)
+    except OSError:
+        pass
+
+
+def perfiles_guardados():
+    return list(_perfiles_guardados)
@@ -0,0 +1,260 @@
+"""
+Planificador de recalibraciones: lotes de trabajo semanales por juego de patrones.
+
+    from core import planificador
+
+    plan = planificador.planificar_inventario(semanas=8)
+    for semana in plan["semanas"]:
+        semana["lunes"], semana["lotes"]      # lotes: instrumentos que comparten patrones
+    planificador.planificar(filas_instrumentos, filas_patrones, desde=date(2026, 11, 2))
+    planificador.planificar_inventario(puntos=5)     # y los patrones de cada punto de cada instrumento
+
+Trabaja sobre los índices de vencimientos (data/index_instrumentos.json y
+data/index_patrones.json, ver core.indices): sus filas ya traen la próxima
+calibración, el rango del instrumento, la familia de patrones que necesita y
+el nominal e incertidumbre de cada patrón, así que no se abre ningún JSON de
+activo (salvo las filas de un índice anterior que no tengan esos campos).
+
+1. Cubetas: cada instrumento que vence antes del final del plan cae en la
+   semana (de lunes a domingo) de su vencimiento; los ya vencidos, en la
+   primera. Se agrupan en un dict por (semana, familia de patrones, rango),
+   en un solo recorrido y sin comparar instrumentos entre sí.
+2. Índice de intervalos: por familia de patrones, los nominales ordenados en
+   un array de numpy junto al vencimiento de cada patrón. Los patrones de una
+   cubeta son el tramo [rango_min, rango_max] (dos searchsorted) que sigue en
+   vigor al terminar su semana.
+3. Lotes: las cubetas de una semana con el mismo juego de patrones vigentes
+   forman un lote (p. ej. todos los pies de rey 0-150 de BLOQUES PATRON). Un
+   lote sin ningún patrón vigente queda bloqueado.
+
+Como en la ventana de calibración, solo cuentan los patrones con
+incertidumbre > 0 y fecha de calibración. Los del rango que ya no estén
+vigentes esa semana se indican en el lote (hay que recalibrarlos antes) y los
+que caducan dentro del plan, en el resumen. Con 'puntos' cada lote incluye
+además la asignación de patrones a los puntos de todos sus instrumentos a la
+vez (core.asignacion_patrones) y los patrones distintos que hay que preparar.
+
+Como en core.vencimientos, numpy se importa dentro de las funciones para no
+cargarlo al arrancar la aplicación.
+"""
+
+import os
+from datetime import date, timedelta
+
+from .perfilado import medir
+from .serializacion import cargar_archivo
+from .documentos import cargar_documento
+from .indices import _fila_indice
+from .vencimientos import _a_datetime64
+from .asignacion_patrones import asignar, patrones_distintos
+
+DATA_PATH = "data"
+SEMANAS_DEFECTO = 12
+SIN_FECHA = "9999-12-31"
+CAMPOS_INSTRUMENTO = ("rango_min", "rango_max", "patrones_sugeridos")
+CAMPOS_PATRON = ("valor_nominal", "incertidumbre")
+
+
+def _familia(nombre):
+    return str(nombre or "").strip().upper()
+
+
+def _vencimientos(filas):
+    """datetime64[D] de la columna vencimiento (NaT sin fecha)"""
+    return _a_datetime64([f.get("vencimiento") if f.get("vencimiento") != SIN_FECHA else None
+                          for f in filas])
+
+
+def completar_filas(filas, campos):
+    """Filas con los campos del planificador; las de un índice anterior se rehacen desde su JSON"""
+    completas = []
+    for fila in filas:
+        if all(c in fila for c in campos):
+            completas.append(fila)
+            continue
+        ruta = str(fila.get("path", "")).replace("\\", os.sep)
+        try:
+            nueva = _fila_indice(cargar_documento(ruta), ruta)
+        except (OSError, ValueError):
+            continue
+        if nueva is not None and all(c in nueva for c in campos):
+            completas.append(nueva)
+    return completas
+
+
+def indexar_patrones(filas_patrones):
+    """
+    Índice de intervalos de los patrones utilizables.
+
+    Returns:
+        dict: {familia en mayúsculas: (nominales, vencimientos, ids)}, ordenado
+              por nominal (float64, datetime64[D] y lista de IDs)
+    """
+    import numpy as np
+
+    por_familia = {}
+    for fila in completar_filas(filas_patrones, CAMPOS_PATRON):
+        if fila["incertidumbre"] > 0:
+            por_familia.setdefault(_familia(fila.get("familia")), []).append(fila)
+
+    indice = {}
+    for familia, grupo in por_familia.items():
+        grupo.sort(key=lambda f: (f["valor_nominal"], str(f.get("id"))))
+        vencen = _vencimientos(grupo)
+        con_fecha = ~np.isnat(vencen)
+        nominales = np.fromiter((f["valor_nominal"] for f in grupo), dtype=np.float64, count=len(grupo))
+        ids = [f.get("id") for f, ok in zip(grupo, con_fecha.tolist()) if ok]
+        if ids:
+            indice[familia] = (nominales[con_fecha], vencen[con_fecha], ids)
+    return indice
+
+
+def patrones_para(indice, familia, rango_min, rango_max, fecha):
+    """
+    Patrones de 'familia' con nominal en [rango_min, rango_max].
+
+    Returns:
+        tuple: (vigentes, no_vigentes), IDs de los que siguen en vigor después
+               de 'fecha' y de los que para entonces habrán caducado
+    """
+    import numpy as np
+
+    entrada = indice.get(familia)
+    if entrada is None:
+        return (), ()
+    nominales, vencen, ids = entrada
+    inicio = int(np.searchsorted(nominales, rango_min, side="left"))
+    final = int(np.searchsorted(nominales, rango_max, side="right"))
+    if final <= inicio:
+        return (), ()
+    vigente = (vencen[inicio:final] > np.datetime64(fecha, "D")).tolist()
+    tramo = ids[inicio:final]
+    return (tuple(i for i, ok in zip(tramo, vigente) if ok),
+            tuple(i for i, ok in zip(tramo, vigente) if not ok))
+
+
+def _etiqueta_semana(lunes):
+    anio, semana, _ = lunes.isocalendar()
+    return f"{anio}-W{semana:02d}"
+
+
+@medir("planificador.planificar")
+def planificar(filas_instrumentos, filas_patrones, desde=None, semanas=SEMANAS_DEFECTO, puntos=None):
+    """
+    Plan de recalibración de las próximas 'semanas' semanas.
+
+    Args:
+        filas_instrumentos, filas_patrones: filas de data/index_<rama>.json
+        desde: date de inicio (por defecto, hoy); el plan empieza el lunes de esa semana
+        semanas: número de semanas planificadas
+        puntos: puntos de calibración por instrumento para asignar patrones (None: sin asignación)
+
+    Returns:
+        dict: desde, hasta, semanas ([{semana, lunes, instrumentos, lotes}]),
+              total (instrumentos planificados), lotes, bloqueados,
+              sin_fecha (IDs sin calibración que planificar) y patrones_caducan
+              ([{id, familia, vencimiento}] de los patrones que caducan en el plan).
+              Cada lote: familia_patrones, patrones, patrones_no_vigentes,
+              instrumentos, rango_min, rango_max, vencidos, primer_vencimiento
+              y bloqueado; con 'puntos', también asignacion ({ID: [IDs de
+              patrón]}) y patrones_a_preparar.
+    """
+    import numpy as np
+
+    desde = desde or date.today()
+    lunes = desde - timedelta(days=desde.weekday())
+    fin = lunes + timedelta(weeks=semanas)
+    filas_patrones = completar_filas(filas_patrones, CAMPOS_PATRON)
+    patrones_por_id = {f.get("id"): f for f in filas_patrones}
+    indice = indexar_patrones(filas_patrones)
+
+    filas = completar_filas(filas_instrumentos, CAMPOS_INSTRUMENTO)
+    vencen = _vencimientos(filas)
+    sin_fecha = np.isnat(vencen)
+    en_plan = ~sin_fecha & (vencen < np.datetime64(fin, "D"))
+    dias = np.where(sin_fecha, 0, (vencen - np.datetime64(lunes, "D")).astype(np.int64))
+    semana_de = (np.maximum(dias, 0) // 7).tolist()
+    vencido = (en_plan & (vencen <= np.datetime64(desde, "D"))).tolist()
+
+    # 1. Cubetas (semana, familia de patrones, rango)
+    cubetas = {}
+    for i in np.flatnonzero(en_plan).tolist():
+        f = filas[i]
+        clave = (semana_de[i], _familia(f["patrones_sugeridos"]), f["rango_min"], f["rango_max"])
+        cubetas.setdefault(clave, []).append(i)
+
+    # 2 y 3. Patrones de cada cubeta y unión en lotes por juego de patrones
+    lotes = {}
+    for (semana, familia, rango_min, rango_max), miembros in cubetas.items():
+        fin_semana = lunes + timedelta(weeks=semana, days=6)
+        vigentes, no_vigentes = patrones_para(indice, familia, rango_min, rango_max, fin_semana)
+        lote = lotes.get((semana, familia, vigentes))
+        if lote is None:
+            lote = lotes[(semana, familia, vigentes)] = {
+                "familia_patrones": familia,
+                "patrones": list(vigentes),
+                "patrones_no_vigentes": {},
+                "instrumentos": [],
+                "rango_min": rango_min,
+                "rango_max": rango_max,
+                "bloqueado": not vigentes,
+            }
+        lote["patrones_no_vigentes"].update(dict.fromkeys(no_vigentes))
+        lote["instrumentos"].extend(miembros)
+        lote["rango_min"] = min(lote["rango_min"], rango_min)
+        lote["rango_max"] = max(lote["rango_max"], rango_max)
+
+    plan_semanas = [{"semana": _etiqueta_semana(lunes + timedelta(weeks=s)),
+                     "lunes": (lunes + timedelta(weeks=s)).isoformat(),
+                     "instrumentos": 0, "lotes": []} for s in range(semanas)]
+    for (semana, _, _), lote in lotes.items():
+        miembros = sorted(lote["instrumentos"], key=lambda i: (filas[i]["vencimiento"], str(filas[i].get("id"))))
+        lote["instrumentos"] = [filas[i].get("id") for i in miembros]
+        lote["vencidos"] = sum(vencido[i] for i in miembros)
+        lote["primer_vencimiento"] = filas[miembros[0]]["vencimiento"]
+        lote["patrones_no_vigentes"] = list(lote["patrones_no_vigentes"])
+        if puntos:
+            asignacion = asignar([(filas[i]["rango_min"], filas[i]["rango_max"]) for i in miembros],
+                                 [patrones_por_id[p] for p in lote["patrones"]], puntos)
+            lote["asignacion"] = {filas[i].get("id"): [p.get("id") for p in elegidos]
+                                  for i, elegidos in zip(miembros, asignacion)}
+            lote["patrones_a_preparar"] = patrones_distintos(asignacion)
+        plan_semanas[semana]["lotes"].append(lote)
+        plan_semanas[semana]["instrumentos"] += len(miembros)
+    for semana in plan_semanas:
+        semana["lotes"].sort(key=lambda l: (l["primer_vencimiento"], -len(l["instrumentos"]), l["familia_patrones"]))
+
+    caducan = []
+    inicio_plan, fin_plan = np.datetime64(lunes, "D"), np.datetime64(fin, "D")
+    for familia, (_, vencen_pat, ids) in indice.items():
+        for i in np.flatnonzero((vencen_pat >= inicio_plan) & (vencen_pat < fin_plan)).tolist():
+            caducan.append({"id": ids[i], "familia": familia, "vencimiento": str(vencen_pat[i])})
+    caducan.sort(key=lambda p: (p["vencimiento"], str(p["id"])))
+
+    return {
+        "desde": lunes.isoformat(),
+        "hasta": (fin - timedelta(days=1)).isoformat(),
+        "semanas": plan_semanas,
+        "total": int(en_plan.sum()),
+        "lotes": len(lotes),
+        "bloqueados": sum(1 for lote in lotes.values() if lote["bloqueado"]),
+        "sin_fecha": [f.get("id") for f, falta in zip(filas, sin_fecha.tolist()) if falta],
+        "patrones_caducan": caducan,
+    }
+
+
+def cargar_indices(base=DATA_PATH):
+    """(filas_instrumentos, filas_patrones) de data/index_<rama>.json ([] si falta alguno)"""
+    filas = []
+    for rama in ("instrumentos", "patrones"):
+        try:
+            filas.append(cargar_archivo(os.path.join(base, f"index_{rama}.json")))
+        except (OSError, ValueError):
+            filas.append([])
+    return tuple(filas)
+
+
+def planificar_inventario(base=DATA_PATH, desde=None, semanas=SEMANAS_DEFECTO, puntos=None):
+    """Plan (ver planificar) a partir de los índices de data/"""
+    filas_instrumentos, filas_patrones = cargar_indices(base)
+    return planificar(filas_instrumentos, filas_patrones, desde, semanas, puntos)
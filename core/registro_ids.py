@@ -0,0 +1,173 @@
+"""
+Registro global de IDs de activos.
+
+    from core import registro_ids
+
+    registro_ids.existe("ME-0001")                  # O(1), sin leer data/
+    registro_ids.proponer_siguiente("BP-")          # 'BP-0029'
+    registro_ids.proponer_para_familia("patrones", "BLOQUES PATRON")
+
+Se construye una vez listando las carpetas data/<rama>/<familia>/<ID>/ (sin
+abrir ningún JSON) y después lo mantienen al día core.guardado (altas), el
+borrado físico y la vigilancia de data/ (aplicar_cambio). Los IDs se comparan
+en mayúsculas, igual que los normaliza la ventana de alta.
+
+Para numerar, un ID 'PREFIJO + número' (BP-0012, PR-001, MI0007) se parte en
+prefijo y número; la propuesta es el mayor número del prefijo más uno, con el
+mismo ancho de ceros.
+"""
+
+import os
+import re
+import threading
+from collections import Counter
+
+from .vigilancia import describir_ruta, RAMAS
+
+DATA_PATH = "data"
+PATRON_NUMERADO = re.compile(r"^(.*?)(\d+)$")
+
+_lock = threading.RLock()
+_ubicaciones = None     # ID en mayúsculas -> {(rama, familia)}
+_por_familia = {}       # (rama, familia) -> {ID}
+_numeros = {}           # prefijo -> {número: ancho}
+
+
+def partir_codigo(codigo):
+    """'BP-0012' -> ('BP-', 12, 4); None si el código no termina en número"""
+    m = PATRON_NUMERADO.match(codigo.strip().upper())
+    if not m:
+        return None
+    return m.group(1), int(m.group(2)), len(m.group(2))
+
+
+def _anadir(codigo, rama, familia):
+    _ubicaciones.setdefault(codigo, set()).add((rama, familia))
+    _por_familia.setdefault((rama, familia), set()).add(codigo)
+    partes = partir_codigo(codigo)
+    if partes:
+        prefijo, numero, ancho = partes
+        numeros = _numeros.setdefault(prefijo, {})
+        numeros[numero] = max(ancho, numeros.get(numero, 0))
+
+
+def _quitar(codigo, rama, familia):
+    lugares = _ubicaciones.get(codigo)
+    if not lugares:
+        return
+    lugares.discard((rama, familia))
+    _por_familia.get((rama, familia), set()).discard(codigo)
+    if lugares:
+        return
+    del _ubicaciones[codigo]
+    partes = partir_codigo(codigo)
+    if partes:
+        prefijo, numero, _ = partes
+        numeros = _numeros.get(prefijo, {})
+        numeros.pop(numero, None)
+        if not numeros:
+            _numeros.pop(prefijo, None)
+
+
+def cargar_registro(base=DATA_PATH, forzar=False):
+    """Construye el registro (solo la primera vez, salvo forzar=True); devuelve el número de IDs"""
+    global _ubicaciones
+    with _lock:
+        if _ubicaciones is not None and not forzar:
+            return len(_ubicaciones)
+        _ubicaciones = {}
+        _por_familia.clear()
+        _numeros.clear()
+        for rama in RAMAS:
+            ruta_rama = os.path.join(base, rama)
+            if not os.path.isdir(ruta_rama):
+                continue
+            for familia in os.listdir(ruta_rama):
+                ruta_fam = os.path.join(ruta_rama, familia)
+                if not os.path.isdir(ruta_fam):
+                    continue
+                for id_activo in os.listdir(ruta_fam):
+                    if os.path.exists(os.path.join(ruta_fam, id_activo, f"{id_activo}.json")):
+                        _anadir(id_activo.upper(), rama, familia)
+        return len(_ubicaciones)
+
+
+def existe(codigo):
+    """True si algún activo de cualquier rama o familia usa ya 'codigo'"""
+    with _lock:
+        cargar_registro()
+        return codigo.strip().upper() in _ubicaciones
+
+
+def ubicaciones(codigo):
+    """[(rama, familia)] donde existe 'codigo'"""
+    with _lock:
+        cargar_registro()
+        return sorted(_ubicaciones.get(codigo.strip().upper(), ()))
+
+
+def registrar(codigo, rama, familia):
+    with _lock:
+        cargar_registro()
+        _anadir(codigo.strip().upper(), rama, familia)
+
+
+def eliminar(codigo, rama, familia):
+    with _lock:
+        cargar_registro()
+        _quitar(codigo.strip().upper(), rama, familia)
+
+
+def aplicar_cambio(ruta, base=DATA_PATH):
+    """
+    Sincroniza el activo que contiene 'ruta' (archivo o carpeta bajo
+    data/<rama>/<familia>/<ID>/) con lo que hay en disco.
+    """
+    info = describir_ruta(ruta, base)
+    if not info or not info["id"]:
+        return
+    rama, familia, id_activo = info["rama"], info["familia"], info["id"]
+    en_disco = os.path.exists(os.path.join(base, rama, familia, id_activo, f"{id_activo}.json"))
+    with _lock:
+        if _ubicaciones is None:
+            return      # se construirá con el estado actual en la primera consulta
+        if en_disco:
+            _anadir(id_activo.upper(), rama, familia)
+        else:
+            _quitar(id_activo.upper(), rama, familia)
+
+
+def proponer_siguiente(prefijo):
+    """Siguiente código libre del prefijo ('BP-' o 'BP'): mayor número + 1, mismo ancho"""
+    prefijo = prefijo.strip().upper()
+    with _lock:
+        cargar_registro()
+        if prefijo not in _numeros and f"{prefijo}-" in _numeros:
+            prefijo = f"{prefijo}-"
+        numeros = _numeros.get(prefijo)
+        if not numeros:
+            return f"{prefijo}{1:04d}" if prefijo.endswith("-") else f"{prefijo}-{1:04d}"
+        siguiente = max(numeros) + 1
+        ancho = max(numeros.values())
+        codigo = f"{prefijo}{siguiente:0{ancho}d}"
+        while codigo in _ubicaciones:
+            siguiente += 1
+            codigo = f"{prefijo}{siguiente:0{ancho}d}"
+        return codigo
+
+
+def prefijo_familia(rama, familia):
+    """Prefijo más usado por los IDs de una familia (None si no tiene IDs numerados)"""
+    with _lock:
+        cargar_registro()
+        prefijos = Counter(
+            partes[0]
+            for partes in map(partir_codigo, _por_familia.get((rama, familia), ())) if partes
+        )
+    return prefijos.most_common(1)[0][0] if prefijos else None
+
+
+def proponer_para_familia(rama, familia):
+    """Siguiente código libre con el prefijo de la familia, o None si no hay precedente"""
+    prefijo = prefijo_familia(rama, familia)
+    return proponer_siguiente(prefijo) if prefijo else None
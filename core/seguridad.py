@@ -2,14 +2,71 @@ import hashlib
 import os
 import json
 
+from .perfilado import medir
+from .serializacion import cargar, cargar_archivo, volcar_compacto, guardar_canonico
 
+
+SAL_SECRETA = b"METROLOGIA_2024_HASH_SALT_SECURE"
+
+
+def generar_hash_bytes(contenido):
+    """Hash con sal de un contenido ya en memoria (mismo valor que generar_hash_archivo)"""
+    return hashlib.sha256(contenido + SAL_SECRETA).hexdigest()
+
+
+@medir("vault.hash_archivo")
 def generar_hash_archivo(ruta_archivo):
-    SAL_SECRETA = b"METROLOGIA_2024_HASH_SALT_SECURE"
-    hash_sha256 = hashlib.sha256()
     with open(ruta_archivo, "rb") as f:
-        contenido = f.read()
-        hash_sha256.update(contenido + SAL_SECRETA)
-    return hash_sha256.hexdigest()
+        return generar_hash_bytes(f.read())
+
+
+# Caché de hashes por ruta: solo se reutiliza si la firma del archivo
+# (inodo, tamaño, mtime y ctime) no ha cambiado desde que se calculó
+_CACHE_HASHES = {}
+
+
+def _firma_archivo(ruta_archivo):
+    st = os.stat(ruta_archivo)
+    return (st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns)
+
+
+def generar_hash_archivo_cacheado(ruta_archivo):
+    """Como generar_hash_archivo, pero sin releer archivos que no han cambiado"""
+    clave = os.path.abspath(ruta_archivo)
+    firma = _firma_archivo(clave)
+    entrada = _CACHE_HASHES.get(clave)
+    if entrada is not None and entrada[0] == firma:
+        return entrada[1]
+    hash_valor = generar_hash_archivo(clave)
+    _CACHE_HASHES[clave] = (firma, hash_valor)
+    return hash_valor
+
+
+def hash_en_cache(ruta_archivo):
+    """Hash cacheado si el archivo no ha cambiado desde que se calculó (None si no)"""
+    clave = os.path.abspath(ruta_archivo)
+    entrada = _CACHE_HASHES.get(clave)
+    if entrada is not None and entrada[0] == _firma_archivo(clave):
+        return entrada[1]
+    return None
+
+
+def cachear_hash(ruta_archivo, hash_valor, firma=None):
+    """
+    Registra el hash de un archivo con su firma actual o, si se acaba de leer,
+    con la 'firma' tomada antes de leerlo (si cambió entretanto no coincidirá)
+    """
+    clave = os.path.abspath(ruta_archivo)
+    _CACHE_HASHES[clave] = (firma or _firma_archivo(clave), hash_valor)
+
+
+def invalidar_cache_hashes(rutas=None):
+    """Descarta las entradas de las rutas indicadas (o toda la caché)"""
+    if rutas is None:
+        _CACHE_HASHES.clear()
+        return
+    for ruta in rutas:
+        _CACHE_HASHES.pop(os.path.abspath(ruta), None)
 
 
 def generar_y_guardar_hash(ruta_json, id_elemento):
@@ -69,13 +126,97 @@ def obtener_ruta_vault():
     return "hashes_vault.json"
 
 
+# Registro de escritura anticipada (WAL) del vault: cada guardado anexa una
+# línea {"clave", "hash", "familia"} en lugar de reescribir el vault y el árbol.
+# Los lectores ven siempre instantánea + registro; compactar_vault() vuelca el
+# registro en las instantáneas (al cerrar o al superar el umbral) y lo vacía.
+UMBRAL_COMPACTACION_WAL = 256 * 1024  # bytes
+
+
+def obtener_ruta_wal_vault():
+    """Retorna la ruta del registro de cambios pendientes del vault"""
+    return "hashes_vault.wal"
+
+
+def leer_wal_vault():
+    """
+    Registros pendientes del WAL, en orden de escritura.
+    Una última línea incompleta (cierre a mitad de escritura) se descarta.
+    """
+    return leer_wal_vault_desde(0)[0]
+
+
+def leer_wal_vault_desde(posicion):
+    """
+    Registros del WAL escritos a partir del byte 'posicion'.
+
+    Returns:
+        tuple: (registros, posición tras la última línea completa); la línea
+               incompleta del final se leerá en la siguiente llamada
+    """
+    try:
+        with open(obtener_ruta_wal_vault(), 'rb') as f:
+            f.seek(posicion)
+            datos = f.read()
+    except OSError:
+        return [], posicion
+    fin = datos.rfind(b"\n") + 1
+    registros = []
+    for linea in datos[:fin].splitlines():
+        try:
+            registro = cargar(linea.decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            continue
+        if (isinstance(registro, dict) and isinstance(registro.get("clave"), str)
+                and isinstance(registro.get("hash"), str) and len(registro["hash"]) == 64):
+            registros.append(registro)
+    return registros, posicion + fin
+
+
+@medir("vault.anexar_wal")
+def anexar_wal_vault(id_elemento, hash_valor, familia):
+    """Anexa un cambio al WAL (coste constante) y compacta si supera el umbral"""
+    registro = volcar_compacto({"clave": id_elemento, "hash": hash_valor, "familia": familia})
+    with open(obtener_ruta_wal_vault(), 'ab') as f:
+        f.write(registro + b"\n")
+        f.flush()
+        os.fsync(f.fileno())
+        tamano = f.tell()
+    if tamano >= UMBRAL_COMPACTACION_WAL:
+        compactar_vault()
+    return True
+
+
+def vaciar_wal_vault():
+    ruta_wal = obtener_ruta_wal_vault()
+    if os.path.exists(ruta_wal):
+        os.remove(ruta_wal)
+
+
+@medir("vault.compactar")
+def compactar_vault():
+    """
+    Vuelca el WAL en hashes_vault.json y hashes_vault.merkle y lo vacía.
+    El árbol se guarda antes que el vault: si el proceso se interrumpe entre
+    ambos, el WAL sigue ahí y volver a aplicarlo no cambia el resultado.
+    """
+    from core.merkle import cargar_arbol, guardar_arbol
+
+    if not leer_wal_vault():
+        return True
+    arbol = cargar_arbol()
+    if arbol is not None and not guardar_arbol(arbol):
+        return False
+    return guardar_vault_hashes(cargar_vault_hashes())
+
+
+@medir("vault.cargar")
 def cargar_vault_hashes():
     """Carga el vault de hashes desde archivo con manejo robusto de errores"""
     ruta_vault = obtener_ruta_vault()
     if os.path.exists(ruta_vault):
         try:
-            with open(ruta_vault, 'r', encoding='utf-8') as f:
-                vault_data = json.load(f)
+            vault_data = cargar_archivo(ruta_vault)
                 
             # Verificar que sea un diccionario válido
             if not isinstance(vault_data, dict):
@@ -87,16 +228,20 @@ def cargar_vault_hashes():
                 if isinstance(value, str) and len(value) == 64:
                     vault_valido[key] = value
                     
-            return vault_valido
-            
         except json.JSONDecodeError:
-            return {}
+            vault_valido = {}
         except Exception as e:
-            return {}
+            vault_valido = {}
     else:
-        return {}
+        vault_valido = {}
+
+    # Cambios anexados desde la última compactación
+    for registro in leer_wal_vault():
+        vault_valido[registro["clave"]] = registro["hash"]
+    return vault_valido
 
 
+@medir("vault.guardar")
 def guardar_vault_hashes(vault_data):
     """Guarda el vault de hashes a archivo con orden consistente"""
     ruta_vault = obtener_ruta_vault()
@@ -117,8 +262,10 @@ def guardar_vault_hashes(vault_data):
                     continue  # Ignorar otros elementos que no sean hashes simples
             vault_data = vault_ordenado
         
-        with open(ruta_vault, 'w', encoding='utf-8') as f:
-            json.dump(vault_data, f, indent=2, ensure_ascii=False, sort_keys=True)
+        # Escritura atómica y formato canónico: un cierre inesperado no deja el vault a medias
+        guardar_canonico(ruta_vault, vault_data, indent=2, sort_keys=True)
+        # La instantánea ya incluye (o sustituye) los cambios pendientes
+        vaciar_wal_vault()
         return True
     except Exception:
         return False
@@ -128,39 +275,93 @@ def generar_y_guardar_hash_vault(ruta_json, id_elemento):
     """Genera hash y lo guarda en el vault centralizado"""
     # Esta función ahora solo se usa para archivos individuales, no para el vault principal
     try:
-        hash_valor = generar_hash_archivo(ruta_json)
-        vault = cargar_vault_hashes()
-        vault[id_elemento] = hash_valor
-        return guardar_vault_hashes(vault)
+        return registrar_hash_vault(id_elemento, generar_hash_archivo(ruta_json), ruta_json)
     except Exception:
         return False
 
 
-def generar_vault_completo():
-    """Genera el vault completo recorriendo todos los JSON y devuelve su hash"""
+@medir("vault.refirmar_lote")
+def refirmar_lote(rutas, hilos=8):
+    """
+    Vuelve a firmar varios archivos con una sola escritura del vault.
+
+    Los hashes se calculan en paralelo; después se aplican todos al vault
+    (incluido el WAL pendiente) y al árbol de Merkle, que se guardan de forma
+    atómica una única vez (primero el árbol, como en compactar_vault).
+
+    Args:
+        rutas: {clave del vault: ruta del archivo}
+
+    Returns:
+        tuple: ({clave: hash} firmados, {clave: error} fallidos)
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from core.merkle import cargar_arbol, guardar_arbol, actualizar_hoja, familia_de_ruta
+
+    def _hash(item):
+        clave, ruta = item
+        try:
+            return clave, generar_hash_archivo(ruta), None
+        except OSError as e:
+            return clave, None, str(e)
+
+    firmados, fallidos = {}, {}
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        for clave, hash_valor, error in pool.map(_hash, rutas.items()):
+            if error is None:
+                firmados[clave] = hash_valor
+            else:
+                fallidos[clave] = error
+    if not firmados:
+        return firmados, fallidos
+
+    vault = cargar_vault_hashes()
+    arbol = cargar_arbol()
+    for clave, hash_valor in firmados.items():
+        vault[clave] = hash_valor
+        if arbol is not None:
+            actualizar_hoja(arbol, clave, hash_valor, familia_de_ruta(rutas[clave]))
+
+    if (arbol is not None and not guardar_arbol(arbol)) or not guardar_vault_hashes(vault):
+        fallidos.update((clave, "No se pudo escribir el vault") for clave in firmados)
+        return {}, fallidos
+
+    for clave, hash_valor in firmados.items():
+        cachear_hash(rutas[clave], hash_valor)
+    return firmados, fallidos
+
+
+def registrar_hash_vault(id_elemento, hash_valor, ruta_archivo):
+    """
+    Guarda un hash ya calculado en el vault y en el árbol de Merkle.
+    Solo anexa un registro al WAL; cargar_vault_hashes y cargar_arbol lo aplican.
+    """
+    from core.merkle import familia_de_ruta
+
+    try:
+        return anexar_wal_vault(id_elemento, hash_valor, familia_de_ruta(ruta_archivo))
+    except Exception:
+        return False
+
+
+@medir("vault.generar_completo")
+def generar_vault_completo(escaneo=None):
+    """
+    Genera el vault completo recorriendo todos los JSON y devuelve la raíz de su árbol de Merkle.
+    'escaneo' (core.escaner.escanear) reutiliza un recorrido ya hecho de data/; sin él,
+    solo se vuelven a leer los archivos que cambiaron desde el último hash cacheado.
+    """
     import time
+    from core.merkle import construir_arbol, guardar_arbol
     
     try:
-        # 1. Recorrer todos los JSON actuales y generar hashes
-        vault = {}
-        carpetas_permitidas = ['data/patrones', 'data/instrumentos']
-        
-        for carpeta in carpetas_permitidas:
-            if not os.path.exists(carpeta):
-                continue
-                
-            for root, _, files in os.walk(carpeta):
-                for file in files:
-                    if file.endswith('.json'):
-                        ruta_json = os.path.join(root, file)
-                        id_elemento = file.replace('.json', '')
-                        
-                        try:
-                            hash_valor = generar_hash_archivo(ruta_json)
-                            vault[id_elemento] = hash_valor
-                        except Exception:
-                            continue
-        
+        # 1. Hashes de todos los JSON y manifiestos de adjuntos actuales
+        if escaneo is None:
+            from core.escaner import escanear
+            escaneo = escanear('data', indexar=False)
+        vault = dict(escaneo["vault"])
+        familias = escaneo["familias"]
+
         # 2. Guardar el vault completo con sincronización forzada
         if guardar_vault_hashes(vault):
             # Forzar sincronización de escritura
@@ -172,9 +373,11 @@ def generar_vault_completo():
             # Pequeña pausa para asegurar escritura completa
             time.sleep(0.1)
             
-            # 3. Generar hash del archivo vault y retornarlo
-            hash_vault = generar_hash_archivo(ruta_vault)
-            return hash_vault, len(vault)
+            # 3. Construir el árbol de Merkle y retornar su raíz (es lo que se registra en el log)
+            arbol = construir_arbol(cargar_vault_hashes(), familias)
+            if not guardar_arbol(arbol):
+                return None, 0
+            return arbol["raiz"], len(vault)
         else:
             return None, 0
             
@@ -183,7 +386,28 @@ def generar_vault_completo():
 
 
 def verificar_integridad_archivo_vault(ruta_json, id_elemento):
-    """Verifica integridad usando el vault de hashes"""
+    """
+    Verifica la integridad de un activo.
+
+    Con hashes_vault.merkle disponible se comprueba la prueba de inclusión
+    del activo contra la raíz del árbol (O(log N), sin leer el vault plano).
+    Si no hay árbol, o la clave no figura en él, se compara con el vault.
+    """
+    from core.merkle import cargar_arbol, prueba_inclusion, verificar_prueba, familia_de_ruta
+
+    arbol = cargar_arbol()
+    prueba = prueba_inclusion(arbol, id_elemento, familia_de_ruta(ruta_json)) if arbol else None
+    if prueba is not None:
+        try:
+            hash_actual = generar_hash_archivo_cacheado(ruta_json)
+        except Exception:
+            return False, "Error generando hash del archivo JSON"
+
+        if verificar_prueba(id_elemento, hash_actual, prueba["prueba"], arbol["raiz"]):
+            return True, "Integridad verificada (prueba de inclusión Merkle)"
+
+        return False, f"Discrepancia detectada: el archivo {id_elemento} ha sido modificado"
+
     vault = cargar_vault_hashes()
     
     if id_elemento not in vault:
@@ -192,7 +416,7 @@ def verificar_integridad_archivo_vault(ruta_json, id_elemento):
     hash_guardado = vault[id_elemento]
     
     try:
-        hash_actual = generar_hash_archivo(ruta_json)
+        hash_actual = generar_hash_archivo_cacheado(ruta_json)
     except Exception:
         return False, "Error generando hash del archivo JSON"
 
@@ -272,8 +496,7 @@ def obtener_ultimo_hash_vault_del_log():
         if not os.path.exists(ruta_log):
             return None
             
-        with open(ruta_log, 'r', encoding='utf-8') as f:
-            log_data = json.load(f)
+        log_data = cargar_archivo(ruta_log)
         
         # Buscar el último registro de hash del vault
         for sesion in reversed(log_data):
@@ -285,3 +508,45 @@ def obtener_ultimo_hash_vault_del_log():
         return None
     except Exception:
         return None
+
+
+def obtener_ultima_raiz_merkle_del_log():
+    """Extrae la última raíz de Merkle del vault registrada en el log (completa, 64 caracteres)"""
+    try:
+        ruta_log = 'metrologia_log.json'
+        if not os.path.exists(ruta_log):
+            return None
+            
+        log_data = cargar_archivo(ruta_log)
+        
+        for sesion in reversed(log_data):
+            for evento in reversed(sesion.get('events', [])):
+                action = evento.get('action', '')
+                if 'Raíz Merkle:' in action:
+                    return action.split('Raíz Merkle:')[1].split()[0]
+        return None
+    except Exception:
+        return None
+
+
+def verificar_raiz_vault():
+    """
+    Recalcula la raíz de Merkle desde el vault y la compara con la del log.
+
+    Returns:
+        tuple: (ok, raiz_actual, raiz_log); ok es None si el log aún no tiene raíz
+    """
+    from core.merkle import cargar_arbol, raiz_desde_vault
+
+    raiz_log = obtener_ultima_raiz_merkle_del_log()
+    if not raiz_log:
+        return None, None, None
+
+    arbol = cargar_arbol()
+    if arbol is None:
+        return False, None, raiz_log
+
+    # El árbol guardado debe coincidir con el vault plano y con el log
+    raiz_actual = raiz_desde_vault(cargar_vault_hashes(), arbol)
+    return raiz_actual == raiz_log and arbol.get("raiz") == raiz_log, raiz_actual, raiz_log
+
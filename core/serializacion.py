@@ -0,0 +1,74 @@
+"""
+Serialización JSON con motor intercambiable.
+
+    from core.serializacion import cargar_archivo, guardar_compacto, volcar_canonico
+
+Si orjson está instalado se usa para leer y para los volcados compactos; si
+no, todo pasa por el módulo json de la biblioteca estándar.
+
+- volcar_compacto / guardar_compacto: archivos que solo lee la aplicación
+  (índices, árbol de Merkle, WAL del vault). Sin sangría ni espacios.
+- volcar_canonico / guardar_canonico: archivos cuyo hash se registra (JSON de
+  activos, vault, log de auditoría). Siempre json estándar con
+  ensure_ascii=False, de modo que los bytes son idénticos con o sin orjson
+  y entre versiones de la aplicación.
+"""
+
+import os
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+MOTOR = "orjson" if orjson is not None else "json"
+
+
+def cargar(contenido):
+    """Parsea JSON desde bytes o str"""
+    if orjson is not None:
+        try:
+            return orjson.loads(contenido)
+        except orjson.JSONDecodeError:
+            # NaN/Infinity o enteros de más de 64 bits: solo los admite json
+            pass
+    return json.loads(contenido)
+
+
+def cargar_archivo(ruta):
+    with open(ruta, 'rb') as f:
+        return cargar(f.read())
+
+
+def volcar_compacto(datos, sort_keys=False):
+    """Bytes UTF-8 sin sangría, para archivos internos"""
+    if orjson is not None:
+        opciones = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        try:
+            return orjson.dumps(datos, option=opciones)
+        except TypeError:
+            pass
+    return json.dumps(datos, ensure_ascii=False, separators=(',', ':'), sort_keys=sort_keys).encode('utf-8')
+
+
+def volcar_canonico(datos, indent=4, sort_keys=False):
+    """Bytes UTF-8 con el formato de json.dump(indent=..., ensure_ascii=False) de siempre"""
+    return json.dumps(datos, indent=indent, ensure_ascii=False, sort_keys=sort_keys).encode('utf-8')
+
+
+def _escribir(ruta, contenido):
+    temporal = f"{ruta}.tmp"
+    with open(temporal, 'wb') as f:
+        f.write(contenido)
+    os.replace(temporal, ruta)
+
+
+def guardar_compacto(ruta, datos, sort_keys=False):
+    """Escribe un archivo interno de forma atómica (temporal + os.replace)"""
+    _escribir(ruta, volcar_compacto(datos, sort_keys))
+
+
+def guardar_canonico(ruta, datos, indent=4, sort_keys=False):
+    """Escribe un archivo con formato canónico de forma atómica (temporal + os.replace)"""
+    _escribir(ruta, volcar_canonico(datos, indent, sort_keys))
@@ -0,0 +1,148 @@
+"""
+Informe de tiempos de importación al arrancar.
+
+Lanza un intérprete nuevo con '-X importtime', importa el módulo de entrada
+(main por defecto) y resume el coste por módulo. También comprueba que las
+dependencias pesadas que solo se usan bajo demanda (gráficas, PDF, iconos,
+diálogos de administración) no se carguen al arrancar.
+
+Uso:
+    python -m core.tiempos_arranque [modulo] [--top N] [--json]
+"""
+
+import os
+import sys
+import json
+import subprocess
+
+MODULO_ENTRADA = "main"
+
+# Se cargan en el primer uso; si aparecen al importar main es una regresión
+MODULOS_DIFERIDOS = (
+    "matplotlib",
+    "numpy",
+    "fpdf",
+    "qtawesome",
+    "core.pdf_generator",
+    "core.grafica_generator",
+    "gui.auditoria",
+    "gui.gestion_usuarios",
+    "gui.calibration_window",
+    "gui.grafica_detail_window",
+)
+
+
+def medir_importacion(modulo=MODULO_ENTRADA, python=None, cwd=None):
+    """
+    Importa 'modulo' en un proceso limpio con -X importtime.
+
+    Returns:
+        list: [{'modulo', 'propio_us', 'acumulado_us', 'nivel'}, ...] en orden de importación
+    """
+    entorno = dict(os.environ)
+    entorno.setdefault("QT_QPA_PLATFORM", "offscreen")
+    resultado = subprocess.run(
+        [python or sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=cwd, env=entorno, capture_output=True, text=True
+    )
+    if resultado.returncode != 0:
+        raise RuntimeError(f"No se pudo importar {modulo}: {resultado.stderr.strip().splitlines()[-1:]}")
+    return analizar_salida(resultado.stderr)
+
+
+def analizar_salida(texto):
+    """Convierte las líneas 'import time: propio | acumulado | nombre' en filas"""
+    filas = []
+    for linea in texto.splitlines():
+        if not linea.startswith("import time:"):
+            continue
+        partes = linea[len("import time:"):].split("|")
+        if len(partes) != 3 or not partes[0].strip().isdigit():
+            continue  # cabecera
+        nombre = partes[2].rstrip()
+        filas.append({
+            "modulo": nombre.strip(),
+            "propio_us": int(partes[0]),
+            "acumulado_us": int(partes[1]),
+            "nivel": (len(nombre) - len(nombre.lstrip())) // 2,
+        })
+    return filas
+
+
+def tiempo_total_us(filas):
+    """Suma de los acumulados de primer nivel"""
+    return sum(f["acumulado_us"] for f in filas if f["nivel"] == 0)
+
+
+def modulos_diferidos_cargados(filas, diferidos=MODULOS_DIFERIDOS):
+    """Módulos de 'diferidos' (o submódulos suyos) presentes en la importación"""
+    cargados = []
+    for fila in filas:
+        nombre = fila["modulo"]
+        for diferido in diferidos:
+            if (nombre == diferido or nombre.startswith(diferido + ".")) and diferido not in cargados:
+                cargados.append(diferido)
+    return cargados
+
+
+def generar_informe(filas, modulo=MODULO_ENTRADA, top=15):
+    """
+    Returns:
+        dict: total, módulos más costosos (por tiempo acumulado) y diferidos cargados
+    """
+    fila_entrada = next((f for f in filas if f["modulo"] == modulo), None)
+    mas_costosos = sorted(filas, key=lambda f: f["acumulado_us"], reverse=True)
+    return {
+        "modulo": modulo,
+        "total_ms": round(tiempo_total_us(filas) / 1000, 1),
+        "modulo_ms": round(fila_entrada["acumulado_us"] / 1000, 1) if fila_entrada else None,
+        "num_modulos": len(filas),
+        "mas_costosos": [
+            {"modulo": f["modulo"], "acumulado_ms": round(f["acumulado_us"] / 1000, 1),
+             "propio_ms": round(f["propio_us"] / 1000, 1)}
+            for f in mas_costosos[:top]
+        ],
+        "diferidos_cargados": modulos_diferidos_cargados(filas),
+    }
+
+
+def formatear_informe(informe):
+    lineas = [
+        f"Importación de '{informe['modulo']}': {informe['modulo_ms']} ms "
+        f"({informe['total_ms']} ms en total, {informe['num_modulos']} módulos)",
+        "",
+        f"{'acumulado ms':>13} {'propio ms':>10}  módulo",
+    ]
+    for f in informe["mas_costosos"]:
+        lineas.append(f"{f['acumulado_ms']:>13} {f['propio_ms']:>10}  {f['modulo']}")
+    lineas.append("")
+    if informe["diferidos_cargados"]:
+        lineas.append("[REGRESIÓN] Módulos diferidos cargados al arrancar: " + ", ".join(informe["diferidos_cargados"]))
+    else:
+        lineas.append("[OK] Ningún módulo diferido se carga al arrancar")
+    return "\n".join(lineas)
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Tiempos de importación al arrancar")
+    parser.add_argument("modulo", nargs="?", default=MODULO_ENTRADA)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", action="store_true", help="Salida en JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        filas = medir_importacion(args.modulo)
+    except RuntimeError as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        return 2
+    informe = generar_informe(filas, args.modulo, args.top)
+    if args.json:
+        print(json.dumps(informe, indent=2, ensure_ascii=False))
+    else:
+        print(formatear_informe(informe))
+    return 1 if informe["diferidos_cargados"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+Directorio de usuarios indexado por nombre de usuario.
+
+Carga config/users.json una vez, indexa los usuarios de todos los grupos y
+guarda para cada uno el verificador HMAC de su contraseña (ver
+core.credenciales). Un intento de login es una búsqueda en diccionario y una
+comparación en tiempo constante. Antes de cada consulta se comprueba la firma
+del archivo (stat) y se recarga solo si ha cambiado.
+"""
+
+import os
+import json
+
+from . import credenciales
+from .credenciales import GRUPOS_USUARIOS
+
+
+class DirectorioUsuarios:
+    def __init__(self, ruta=None):
+        self.ruta = ruta or credenciales.ruta_usuarios()
+        self._firma = None
+        self._usuarios = {}        # username -> datos (con 'user_type')
+        self._minusculas = {}      # username en minúsculas -> username
+        self._verificadores = {}   # username -> verificador HMAC
+
+    def _firma_actual(self):
+        try:
+            st = os.stat(self.ruta)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _actualizar(self):
+        """Recarga el índice si users.json ha cambiado desde la última lectura"""
+        firma = self._firma_actual()
+        if firma == self._firma:
+            return
+        with open(self.ruta, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        # Los verificadores de contraseñas que ya no existen se descartan
+        credenciales.olvidar_verificadores()
+        usuarios, minusculas, verificadores = {}, {}, {}
+        for grupo in GRUPOS_USUARIOS:
+            for u in data.get(grupo, []):
+                username = u.get('username')
+                # Igual que el recorrido anterior: prevalece el primero (técnicos antes que visores)
+                if not username or username in usuarios:
+                    continue
+                usuarios[username] = dict(u, user_type=grupo)
+                minusculas.setdefault(username.lower(), username)
+                verificador = credenciales.verificador_de(u.get('password', ''))
+                if verificador is not None:
+                    verificadores[username] = verificador
+
+        self._usuarios, self._minusculas, self._verificadores = usuarios, minusculas, verificadores
+        self._firma = firma
+
+    def buscar(self, username, ignorar_mayusculas=False):
+        """
+        Returns:
+            dict: copia de los datos del usuario (con 'user_type') o None
+        """
+        self._actualizar()
+        if ignorar_mayusculas and username is not None:
+            username = self._minusculas.get(username.lower())
+        usuario = self._usuarios.get(username)
+        return dict(usuario) if usuario else None
+
+    def autenticar(self, username, password):
+        """
+        Returns:
+            dict: copia de los datos del usuario si la contraseña es correcta, None si no
+        """
+        self._actualizar()
+        verificador = self._verificadores.get(username)
+        if verificador is None or password is None:
+            return None
+        if not credenciales.coincide_verificador(verificador, password):
+            return None
+        return dict(self._usuarios[username])
+
+    def nombre_completo(self, username):
+        """Nombre completo del usuario o el propio username si no existe"""
+        usuario = self.buscar(username)
+        if not usuario:
+            return username
+        return usuario.get('nombre_completo', username)
+
+    def __len__(self):
+        self._actualizar()
+        return len(self._usuarios)
+
+
+# Instancia global del directorio
+_directorio = None
+
+
+def get_directorio(ruta=None):
+    """Obtiene el directorio de usuarios global (uno por ruta de users.json)"""
+    global _directorio
+    ruta = ruta or credenciales.ruta_usuarios()
+    if _directorio is None or _directorio.ruta != ruta:
+        _directorio = DirectorioUsuarios(ruta)
+    return _directorio
@@ -0,0 +1,262 @@
+"""
+Motor de vencimientos de calibración para todo el inventario.
+
+    from core import vencimientos
+
+    proxima, ultima, dias, estado = vencimientos.evaluar(data)
+    vencimientos.evaluar_lote(documentos, dias_urgente=15)
+    vencimientos.inventario()        # {ID: (proxima, ultima, dias, estado)} de data/
+    vencimientos.clasificar_fechas(["2026-03-01", ...])   # columna vencimiento de los índices
+
+La fecha de referencia es la de la última entrada del historial (o, si no
+hay, fecha_ultima_calibracion de la raíz) y la próxima calibración se obtiene
+sumando periodicidad_meses con aritmética de meses de numpy.datetime64, para
+todo el lote a la vez. Si el día no existe en el mes de destino se toma el
+último día del mes (31-ene + 1 mes = 28/29-feb), igual que relativedelta.
+
+Estados: OBSOLETO (estado 'obsoleto'), SIN CALIBRAR (sin fecha válida),
+CADUCADO (vence hoy o ya venció), URGENTE (vence en dias_urgente días o
+menos) y APTO.
+
+Los documentos de core.documentos son vistas de solo lectura que no cambian
+mientras el archivo no cambie, así que su resultado se recuerda por vista:
+cuando el activo se guarda o cambia en disco la caché devuelve otra vista y
+se recalcula. Al cambiar el día se descarta todo. Los dicts modificables
+(fichas en edición) se calculan siempre.
+
+numpy se importa en el primer cálculo y no al importar el módulo, que forma
+parte del arranque (core.indices); ver core.tiempos_arranque.
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+
+from .perfilado import medir
+from .documentos import VistaDocumento, cargar_documento
+
+DATA_PATH = "data"
+RAMAS = ("patrones", "instrumentos")
+
+APTO = "APTO"
+URGENTE = "URGENTE"
+CADUCADO = "CADUCADO"
+SIN_CALIBRAR = "SIN CALIBRAR"
+OBSOLETO = "OBSOLETO"
+
+DIAS_URGENTE = 30
+PERIODICIDAD_DEFECTO = 12
+LIMITE_MEMO = 8192
+PATRON_ISO = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+_lock = threading.Lock()
+_memo = OrderedDict()     # (id(vista), dias_urgente) -> (vista, resultado)
+_dia_memo = None
+
+
+def fecha_referencia(data):
+    """Texto de la última calibración (historial o raíz), o None"""
+    historial = data.get('historial') or ()
+    fecha = None
+    if historial:
+        fecha = historial[-1].get('fecha_calibracion') or historial[-1].get('fecha_ultima_calibracion')
+    if not fecha:
+        fecha = data.get('FECHA_ULTIMA_CALIBRACION') or data.get('fecha_ultima_calibracion')
+    if not fecha or fecha in ('N/A', 'None'):
+        return None
+    return str(fecha)
+
+
+def periodicidad(data):
+    try:
+        return int(data.get('periodicidad_meses', PERIODICIDAD_DEFECTO) or PERIODICIDAD_DEFECTO)
+    except (TypeError, ValueError):
+        return PERIODICIDAD_DEFECTO
+
+
+def _fecha_iso(texto):
+    """'YYYY-MM-DD' de una fecha con o sin hora ('2025-1-5 10:00' incluido), o None"""
+    if not texto:
+        return None
+    texto = texto.strip()
+    if PATRON_ISO.match(texto[:10]):
+        return texto[:10]
+    try:
+        return datetime.strptime(texto.split()[0], '%Y-%m-%d').date().isoformat()
+    except (ValueError, IndexError):
+        return None
+
+
+def _a_datetime64(fechas_iso):
+    import numpy as np
+
+    try:
+        return np.array([f or 'NaT' for f in fechas_iso], dtype='datetime64[D]')
+    except ValueError:
+        # Alguna fecha imposible (2025-02-30): se descarta solo esa
+        valores = []
+        for f in fechas_iso:
+            try:
+                valores.append(np.datetime64(f or 'NaT', 'D'))
+            except ValueError:
+                valores.append(np.datetime64('NaT', 'D'))
+        return np.array(valores, dtype='datetime64[D]')
+
+
+def sumar_meses(fechas, meses):
+    """fechas (datetime64[D]) + meses, ajustando al último día del mes de destino; NaT se conserva"""
+    import numpy as np
+
+    mes_origen = fechas.astype('datetime64[M]')
+    dia = fechas - mes_origen.astype('datetime64[D]')
+    mes_destino = mes_origen + meses
+    ultimo_dia = (mes_destino + 1).astype('datetime64[D]') - np.timedelta64(1, 'D')
+    return np.minimum(mes_destino.astype('datetime64[D]') + dia, ultimo_dia)
+
+
+def _clasificar(proximas, obsoletos, hoy, dias_urgente):
+    """(sin_fecha, dias, estados) de un array de próximas calibraciones"""
+    import numpy as np
+
+    sin_fecha = np.isnat(proximas)
+    dias = np.where(sin_fecha, 0, (proximas - np.datetime64(hoy, 'D')).astype(np.int64))
+    estados = np.select(
+        [obsoletos, sin_fecha, dias <= 0, dias <= dias_urgente],
+        [OBSOLETO, SIN_CALIBRAR, CADUCADO, URGENTE],
+        APTO,
+    )
+    return sin_fecha, dias, estados
+
+
+def _calcular(documentos, hoy, dias_urgente):
+    import numpy as np
+
+    n = len(documentos)
+    ultimas = [fecha_referencia(d) for d in documentos]
+    fechas = _a_datetime64([_fecha_iso(u) for u in ultimas])
+    meses = np.fromiter((periodicidad(d) for d in documentos), dtype=np.int64, count=n)
+    obsoletos = np.fromiter((d.get('estado') == 'obsoleto' for d in documentos), dtype=bool, count=n)
+
+    proximas = sumar_meses(fechas, meses)
+    sin_fecha, dias, estados = _clasificar(proximas, obsoletos, hoy, dias_urgente)
+    return [
+        (proxima, ultima if proxima else None, None if falta else dia, estado)
+        for proxima, ultima, dia, falta, estado
+        in zip(proximas.tolist(), ultimas, dias.tolist(), sin_fecha.tolist(), estados.tolist())
+    ]
+
+
+@medir("vencimientos.evaluar_lote")
+def evaluar_lote(documentos, hoy=None, dias_urgente=DIAS_URGENTE):
+    """
+    Vencimiento de cada documento de activo.
+
+    Args:
+        documentos: lista de dicts de activo (vistas de core.documentos o dicts)
+        hoy: date de referencia (por defecto, hoy; solo entonces se usa la memoria)
+        dias_urgente: días hasta el vencimiento que se consideran URGENTE
+
+    Returns:
+        list: (proxima, ultima, dias, estado) por documento; proxima es un date
+              (None sin fecha válida), ultima el texto de la última calibración
+              y dias los días que faltan (<= 0 si ya venció)
+    """
+    global _dia_memo
+    memorizar = hoy is None
+    hoy = hoy or date.today()
+    resultados = [None] * len(documentos)
+    pendientes = []
+
+    with _lock:
+        if memorizar and _dia_memo != hoy:
+            _memo.clear()
+            _dia_memo = hoy
+        for i, doc in enumerate(documentos):
+            if memorizar and isinstance(doc, VistaDocumento):
+                entrada = _memo.get((id(doc), dias_urgente))
+                if entrada is not None and entrada[0] is doc:
+                    _memo.move_to_end((id(doc), dias_urgente))
+                    resultados[i] = entrada[1]
+                    continue
+            pendientes.append(i)
+
+    if pendientes:
+        calculados = _calcular([documentos[i] for i in pendientes], hoy, dias_urgente)
+        with _lock:
+            for i, resultado in zip(pendientes, calculados):
+                resultados[i] = resultado
+                doc = documentos[i]
+                if memorizar and _dia_memo == hoy and isinstance(doc, VistaDocumento):
+                    # Se guarda la vista con el resultado: su id no se reutiliza mientras viva aquí
+                    _memo[(id(doc), dias_urgente)] = (doc, resultado)
+            while len(_memo) > LIMITE_MEMO:
+                _memo.popitem(last=False)
+    return resultados
+
+
+def evaluar(data, hoy=None, dias_urgente=DIAS_URGENTE):
+    """(proxima, ultima, dias, estado) de un activo (ver evaluar_lote)"""
+    return evaluar_lote([data], hoy, dias_urgente)[0]
+
+
+def vencimiento_iso(data):
+    """Próxima calibración 'YYYY-MM-DD' ('9999-12-31' sin fecha, para que ordene al final)"""
+    proxima = evaluar(data)[0]
+    return proxima.isoformat() if proxima else "9999-12-31"
+
+
+def clasificar_fechas(fechas_iso, hoy=None, dias_urgente=DIAS_URGENTE):
+    """
+    Estado de una lista de próximas calibraciones ya calculadas ('YYYY-MM-DD',
+    p. ej. la columna vencimiento de los índices); '9999-12-31', 'N/A' o
+    vacío cuentan como SIN CALIBRAR.
+
+    Returns:
+        list: (dias, estado) por fecha (dias None sin fecha)
+    """
+    import numpy as np
+
+    fechas = _a_datetime64([f if f and f != "9999-12-31" and PATRON_ISO.match(f) else None
+                            for f in fechas_iso])
+    sin_fecha, dias, estados = _clasificar(fechas, np.zeros(len(fechas), dtype=bool),
+                                           hoy or date.today(), dias_urgente)
+    return [(None if falta else dia, estado)
+            for dia, falta, estado in zip(dias.tolist(), sin_fecha.tolist(), estados.tolist())]
+
+
+@medir("vencimientos.inventario")
+def inventario(base=DATA_PATH, ramas=RAMAS, hoy=None, dias_urgente=DIAS_URGENTE):
+    """
+    Vencimientos de todos los activos de data/ (leídos con la caché de documentos).
+
+    Returns:
+        dict: {ID: (proxima, ultima, dias, estado)}; ante IDs repetidos prevalece
+              la última rama de 'ramas'
+    """
+    ids, documentos = [], []
+    for rama in ramas:
+        carpeta = os.path.join(base, rama)
+        if not os.path.isdir(carpeta):
+            continue
+        for familia in sorted(os.listdir(carpeta)):
+            ruta_fam = os.path.join(carpeta, familia)
+            if not os.path.isdir(ruta_fam):
+                continue
+            for id_activo in sorted(os.listdir(ruta_fam)):
+                ruta = os.path.join(ruta_fam, id_activo, f"{id_activo}.json")
+                try:
+                    documentos.append(cargar_documento(ruta))
+                except (OSError, ValueError):
+                    continue
+                ids.append(id_activo)
+    return dict(zip(ids, evaluar_lote(documentos, hoy, dias_urgente)))
+
+
+def invalidar():
+    """Olvida todos los resultados recordados"""
+    global _dia_memo
+    with _lock:
+        _memo.clear()
+        _dia_memo = None
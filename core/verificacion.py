@@ -0,0 +1,90 @@
+"""
+Verificación de integridad de los activos registrados en el vault.
+
+Separada de la interfaz para poder ejecutarse en un hilo de fondo durante el
+arranque: localiza cada activo con un único recorrido de data/ y produce el
+resultado activo a activo.
+"""
+
+import os
+
+from .seguridad import cargar_vault_hashes, generar_hash_archivo_cacheado
+from .adjuntos import verificar_adjuntos, SUFIJO_VAULT as SUFIJO_ADJUNTOS
+
+DATA_PATH = "data"
+RAMAS_BUSQUEDA = ("instrumentos", "patrones")
+
+
+def id_activo_de_clave(clave):
+    """'ME-0001@adjuntos' -> 'ME-0001'"""
+    return clave[:-len(SUFIJO_ADJUNTOS)] if clave.endswith(SUFIJO_ADJUNTOS) else clave
+
+
+def mapa_rutas_activos(base=DATA_PATH):
+    """
+    ID -> ruta de su JSON, con un solo recorrido rama/familia/activo.
+    Si un ID aparece en varias familias prevalece el primero (instrumentos antes
+    que patrones), igual que la búsqueda anterior por cada entrada del vault.
+    """
+    rutas = {}
+    for rama in RAMAS_BUSQUEDA:
+        ruta_rama = os.path.join(base, rama)
+        if not os.path.isdir(ruta_rama):
+            continue
+        for familia in os.listdir(ruta_rama):
+            ruta_fam = os.path.join(ruta_rama, familia)
+            if not os.path.isdir(ruta_fam):
+                continue
+            for id_activo in os.listdir(ruta_fam):
+                ruta_json = os.path.join(ruta_fam, id_activo, f"{id_activo}.json")
+                if id_activo not in rutas and os.path.exists(ruta_json):
+                    rutas[id_activo] = ruta_json
+    return rutas
+
+
+def verificar_clave(clave, hash_guardado, rutas, vault, blobs_verificados, hashes=None):
+    """
+    Verifica una entrada del vault.
+    'hashes' ({ID: hash} de core.escaner) evita recalcular los JSON ya leídos.
+
+    Returns:
+        True si es íntegra, False si está comprometida y None si el activo no existe en disco
+    """
+    id_activo = id_activo_de_clave(clave)
+    ruta_json = rutas.get(id_activo)
+    if ruta_json is None:
+        return None
+    if clave != id_activo:
+        # Manifiesto + documentos (cada blob compartido se verifica una vez)
+        integro, _, _ = verificar_adjuntos(os.path.dirname(ruta_json), id_activo, vault, blobs_verificados)
+        return integro
+    if hashes is not None and id_activo in hashes:
+        return hashes[id_activo] == hash_guardado
+    try:
+        return generar_hash_archivo_cacheado(ruta_json) == hash_guardado
+    except OSError:
+        return False
+
+
+def iterar_verificacion(base=DATA_PATH, vault=None, rutas=None, hashes=None):
+    """
+    Recorre el vault verificando cada entrada.
+    Con 'rutas' y 'hashes' de un escaneo (core.escaner) no se vuelve a recorrer ni leer data/.
+    Las claves de un mismo activo ('<ID>' y '<ID>@adjuntos') salen seguidas,
+    sea cual sea su posición en el vault (el WAL anexa claves al final).
+
+    Yields:
+        tuple: (clave, estado, total) con estado como en verificar_clave
+    """
+    if vault is None:
+        vault = cargar_vault_hashes()
+    if rutas is None:
+        rutas = mapa_rutas_activos(base)
+    blobs_verificados = {}
+    total = len(vault)
+    por_activo = {}
+    for clave in vault:
+        por_activo.setdefault(id_activo_de_clave(clave), []).append(clave)
+    for claves in por_activo.values():
+        for clave in claves:
+            yield clave, verificar_clave(clave, vault[clave], rutas, vault, blobs_verificados, hashes), total
@@ -0,0 +1,158 @@
+"""
+Detección de cambios en data/ sin recorridos completos.
+
+InstantaneaDatos guarda la firma (inodo, tamaño, mtime, ctime) de los
+archivos de activos (<ID>/<ID>.json y manifiestos de adjuntos) agrupada por
+carpeta. Dado un conjunto de carpetas notificadas por el sistema de archivos
+(o la carpeta raíz, en modo sondeo), compara solo esa parte del árbol y
+devuelve las altas, modificaciones y bajas.
+"""
+
+import os
+from bisect import bisect_left, insort
+
+DATA_PATH = "data"
+RAMAS = ("patrones", "instrumentos")
+NOMBRE_MANIFIESTO = ".manifiesto_adjuntos"
+
+ALTA = "alta"
+MODIFICACION = "modificacion"
+BAJA = "baja"
+
+
+def firma_archivo(ruta):
+    """
+    Firma de estado de un archivo (None si no existe). Incluye ctime, que el
+    usuario no puede fijar a mano, para que restaurar mtime no oculte un cambio.
+    """
+    try:
+        st = os.stat(ruta)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns)
+
+
+def es_archivo_de_activo(ruta):
+    """True para data/<rama>/<familia>/<ID>/<ID>.json y para manifiestos de adjuntos"""
+    nombre = os.path.basename(ruta)
+    if nombre == NOMBRE_MANIFIESTO:
+        return True
+    return nombre.endswith(".json") and nombre[:-5] == os.path.basename(os.path.dirname(ruta))
+
+
+def describir_ruta(ruta, base=DATA_PATH):
+    """
+    Sitúa una ruta dentro de data/.
+
+    Returns:
+        dict con 'rama', 'familia' e 'id' (los que apliquen) o None si está fuera
+        de las ramas de activos (índices, almacén de adjuntos...)
+    """
+    try:
+        relativa = os.path.relpath(os.path.abspath(ruta), os.path.abspath(base))
+    except ValueError:
+        return None
+    partes = relativa.split(os.sep)
+    if not partes or partes[0] not in RAMAS:
+        return None
+    info = {"rama": partes[0], "familia": None, "id": None}
+    if len(partes) > 1:
+        info["familia"] = partes[1]
+    if len(partes) > 2:
+        info["id"] = partes[2]
+    return info
+
+
+class InstantaneaDatos:
+    """Firmas de los archivos de activos, indexadas por carpeta contenedora"""
+
+    def __init__(self, base=DATA_PATH):
+        self.base = os.path.abspath(base)
+        self._firmas = {}        # carpeta -> {ruta: firma}
+        self._carpetas = []      # carpetas ordenadas, para localizar subárboles con bisect
+
+    def _recorrer(self, directorio):
+        """Firmas actuales de los archivos de activos bajo 'directorio'"""
+        actuales = {}
+        for rama in RAMAS:
+            raiz_rama = os.path.join(self.base, rama)
+            if directorio != self.base and not (directorio == raiz_rama or directorio.startswith(raiz_rama + os.sep)):
+                continue
+            inicio = raiz_rama if directorio == self.base else directorio
+            for root, _, files in os.walk(inicio):
+                for file in files:
+                    ruta = os.path.join(root, file)
+                    if es_archivo_de_activo(ruta):
+                        firma = firma_archivo(ruta)
+                        if firma is not None:
+                            actuales.setdefault(root, {})[ruta] = firma
+        return actuales
+
+    def _carpetas_bajo(self, directorio):
+        i = bisect_left(self._carpetas, directorio)
+        resultado = []
+        while i < len(self._carpetas) and self._carpetas[i].startswith(directorio):
+            carpeta = self._carpetas[i]
+            if carpeta == directorio or carpeta.startswith(directorio + os.sep):
+                resultado.append(carpeta)
+            i += 1
+        return resultado
+
+    def capturar(self):
+        """Toma la instantánea completa (una vez, al arrancar)"""
+        self._firmas = self._recorrer(self.base)
+        self._carpetas = sorted(self._firmas)
+        return sum(len(f) for f in self._firmas.values())
+
+    def rutas(self):
+        """Todas las rutas de archivos de activos conocidas"""
+        return [ruta for firmas in self._firmas.values() for ruta in firmas]
+
+    def carpetas(self):
+        """Carpetas que contienen archivos de activos"""
+        return list(self._carpetas)
+
+    def comparar_directorios(self, directorios):
+        """
+        Compara solo los subárboles indicados y actualiza la instantánea.
+
+        Returns:
+            list: [(tipo, ruta), ...] con tipo ALTA, MODIFICACION o BAJA
+        """
+        cambios = []
+        # Un directorio contenido en otro ya pendiente no necesita recorrerse aparte
+        pendientes = sorted({os.path.abspath(d) for d in directorios})
+        raices = []
+        for d in pendientes:
+            if not raices or not (d == raices[-1] or d.startswith(raices[-1] + os.sep)):
+                raices.append(d)
+
+        for directorio in raices:
+            actuales = self._recorrer(directorio)
+            anteriores = {c: self._firmas[c] for c in self._carpetas_bajo(directorio)}
+
+            for carpeta, firmas in actuales.items():
+                previas = anteriores.get(carpeta, {})
+                for ruta, firma in firmas.items():
+                    if ruta not in previas:
+                        cambios.append((ALTA, ruta))
+                    elif previas[ruta] != firma:
+                        cambios.append((MODIFICACION, ruta))
+            for carpeta, previas in anteriores.items():
+                firmas = actuales.get(carpeta, {})
+                cambios.extend((BAJA, ruta) for ruta in previas if ruta not in firmas)
+
+            for carpeta in anteriores:
+                if carpeta not in actuales:
+                    del self._firmas[carpeta]
+                    self._carpetas.pop(bisect_left(self._carpetas, carpeta))
+            for carpeta, firmas in actuales.items():
+                if carpeta not in self._firmas:
+                    insort(self._carpetas, carpeta)
+                self._firmas[carpeta] = firmas
+
+        return cambios
+
+    def sondear(self):
+        """Modo sondeo: compara todo data/ (solo stat, sin leer contenidos)"""
+        return self.comparar_directorios([self.base])
@@ -5,17 +5,23 @@ Contiene la interfaz gráfica para herramientas de auditoría
 """
 
 import os
-import json
 from PyQt6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QFrame, QLabel, QTreeWidgetItem,
     QPushButton, QTreeWidget, QHeaderView, QMessageBox,
-    QInputDialog, QApplication, QTreeWidgetItem, QLineEdit
+    QInputDialog, QTreeWidgetItem, QLineEdit, QComboBox,
+    QListWidget, QListWidgetItem
 )
 from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QColor
-from core.seguridad import verificar_integridad_archivo_vault, generar_y_guardar_hash_vault
+from core.seguridad import refirmar_lote
+from core.adjuntos import clave_vault_de_ruta
 from datetime import datetime
-from gui.login_dialog import LoginDialog, get_data_path
+from gui.login_dialog import get_data_path
+from core.usuarios import get_directorio
+from core.serializacion import cargar_archivo
+from core.indice_eventos import consultar, valores
+from gui.modelo_log_auditoria import ModeloLogAuditoria
+from gui.escaneo_integridad import EscaneoIntegridadWorker
 
 
 class VentanaAuditoria(QDialog):
@@ -29,9 +35,24 @@ class VentanaAuditoria(QDialog):
         main_layout = QVBoxLayout(self)
         
         # Panel superior con Health Check
+        self.worker_escaneo = None
+        self._archivos_corruptos = []
+        self._familias_afectadas = {}
+        self._escaneo_completado = False   # _archivos_corruptos solo vale tras un escaneo completo
         health_panel = self.create_health_panel()
         main_layout.addWidget(health_panel)
         
+        # Hallazgos del escaneo según llegan
+        self.lista_hallazgos = QListWidget()
+        self.lista_hallazgos.setMaximumHeight(140)
+        self.lista_hallazgos.setStyleSheet("""
+            QListWidget { background-color: #252526; color: #ff8585; border: 1px solid #3e3e42; }
+        """)
+        main_layout.addWidget(self.lista_hallazgos)
+        
+        # Barra de búsqueda sobre el índice de eventos
+        main_layout.addWidget(self.create_filtros_panel())
+        
         # Tabla de logs con scroll
         self.create_logs_table()
         main_layout.addWidget(self.logs_table)
@@ -79,6 +100,11 @@ class VentanaAuditoria(QDialog):
         """)
         self.btn_escanear.clicked.connect(self.escanear_sistema)
         layout.addWidget(self.btn_escanear)
+
+        self.btn_cancelar_escaneo = QPushButton("⏹️ Cancelar")
+        self.btn_cancelar_escaneo.setEnabled(False)
+        self.btn_cancelar_escaneo.clicked.connect(lambda: self.cancelar_escaneo())
+        layout.addWidget(self.btn_cancelar_escaneo)
         
         # Etiqueta de estado
         self.health_status = QLabel("⚪ Esperando validación...")
@@ -109,23 +135,110 @@ class VentanaAuditoria(QDialog):
         layout.addStretch()
         return panel
     
+    def create_filtros_panel(self):
+        """Filtros de eventos (tipo, usuario, sesión, fechas, activo y texto) sobre core.indice_eventos"""
+        panel = QFrame()
+        panel.setStyleSheet("""
+            QFrame { background-color: #2d2d30; border: 1px solid #3e3e42; border-radius: 6px; margin: 5px; }
+            QLineEdit, QComboBox { background-color: #1e1e1e; color: #ffffff; border: 1px solid #3e3e42; padding: 4px; }
+            QLabel { color: #cccccc; border: none; }
+        """)
+        layout = QHBoxLayout(panel)
+
+        self.filtro_tipo = QComboBox()
+        self.filtro_tipo.setEditable(True)
+        self.filtro_usuario = QComboBox()
+        self.filtro_usuario.setEditable(True)
+        self.filtro_sesion = QLineEdit()
+        self.filtro_sesion.setPlaceholderText("Sesión")
+        self.filtro_desde = QLineEdit()
+        self.filtro_desde.setPlaceholderText("Desde AAAA-MM-DD")
+        self.filtro_hasta = QLineEdit()
+        self.filtro_hasta.setPlaceholderText("Hasta AAAA-MM-DD")
+        self.filtro_activo = QLineEdit()
+        self.filtro_activo.setPlaceholderText("ID activo")
+        self.filtro_texto = QLineEdit()
+        self.filtro_texto.setPlaceholderText("Texto del evento")
+
+        for etiqueta, widget in (("Tipo:", self.filtro_tipo), ("Usuario:", self.filtro_usuario)):
+            layout.addWidget(QLabel(etiqueta))
+            layout.addWidget(widget)
+        for widget in (self.filtro_sesion, self.filtro_desde, self.filtro_hasta,
+                       self.filtro_activo, self.filtro_texto):
+            widget.returnPressed.connect(self.buscar_eventos)
+            layout.addWidget(widget)
+        self.filtro_texto.setMinimumWidth(220)
+
+        btn_buscar = QPushButton("🔎 Buscar")
+        btn_buscar.clicked.connect(self.buscar_eventos)
+        btn_limpiar = QPushButton("✖ Limpiar")
+        btn_limpiar.clicked.connect(self.limpiar_filtros)
+        layout.addWidget(btn_buscar)
+        layout.addWidget(btn_limpiar)
+
+        self.lbl_resultados = QLabel("")
+        layout.addWidget(self.lbl_resultados)
+        layout.addStretch()
+        return panel
+
+    def _cargar_opciones_filtros(self):
+        """Rellena los desplegables de tipo y usuario con los valores del índice"""
+        opciones = valores()
+        for combo, lista in ((self.filtro_tipo, opciones["tipos"]), (self.filtro_usuario, opciones["usuarios"])):
+            actual = combo.currentText()
+            combo.clear()
+            combo.addItems([""] + lista)
+            combo.setCurrentText(actual)
+
+    def buscar_eventos(self):
+        """Muestra como lista plana los eventos que cumplen los filtros"""
+        filtros = {
+            "tipo": self.filtro_tipo.currentText().strip(),
+            "usuario": self.filtro_usuario.currentText().strip(),
+            "sesion": self.filtro_sesion.text().strip(),
+            "desde": self.filtro_desde.text().strip(),
+            "hasta": self.filtro_hasta.text().strip(),
+            "activo": self.filtro_activo.text().strip(),
+            "texto": self.filtro_texto.text().strip(),
+        }
+        if not any(filtros.values()):
+            self.limpiar_filtros()
+            return
+        try:
+            eventos = consultar(**{k: v or None for k, v in filtros.items()})
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Búsqueda", f"No se pudo consultar el índice de eventos: {e}")
+            return
+        self.modelo_logs.mostrar_resultados(eventos)
+        self.lbl_resultados.setText(f"{len(eventos)} eventos")
+
+    def limpiar_filtros(self):
+        for widget in (self.filtro_sesion, self.filtro_desde, self.filtro_hasta,
+                       self.filtro_activo, self.filtro_texto):
+            widget.clear()
+        self.filtro_tipo.setCurrentText("")
+        self.filtro_usuario.setCurrentText("")
+        self.lbl_resultados.setText("")
+        self.cargar_logs()
+
     def create_logs_table(self):
-        """Configura el widget de logs como un árbol jerárquico estilo oscuro"""
-        from PyQt6.QtWidgets import QTreeWidget, QHeaderView
+        """Configura el árbol de logs (modelo perezoso) con estilo oscuro"""
+        from PyQt6.QtWidgets import QTreeView, QHeaderView
         
-        self.logs_table = QTreeWidget()
-        self.logs_table.setColumnCount(4)
-        self.logs_table.setHeaderLabels(["Tiempo / Evento", "Tipo", "Usuario", "Descripción"])
+        self.modelo_logs = ModeloLogAuditoria(self)
+        self.logs_table = QTreeView()
+        self.logs_table.setModel(self.modelo_logs)
+        self.logs_table.setUniformRowHeights(True)
         
         # Estilo visual coherente con tu app
         self.logs_table.setStyleSheet("""
-            QTreeWidget {
+            QTreeView {
                 background-color: #252526;
                 alternate-background-color: #2d2d2d;
                 border: 1px solid #3e3e42;
                 color: #ffffff;
             }
-            QTreeWidget::item {
+            QTreeView::item {
                 padding: 4px;
                 color: #ffffff;
             }
@@ -185,89 +298,52 @@ class VentanaAuditoria(QDialog):
         layout.addWidget(self.btn_regenerar)
         
         layout.addStretch()
+
+        # Tiempos de las operaciones críticas (core.perfilado)
+        self.btn_rendimiento = QPushButton("⏱️ Rendimiento")
+        self.btn_rendimiento.setStyleSheet("""
+            QPushButton {
+                background-color: #3e3e42;
+                color: white;
+                border: none;
+                padding: 10px 20px;
+                border-radius: 4px;
+                font-weight: bold;
+                font-size: 14px;
+            }
+            QPushButton:hover {
+                background-color: #505057;
+            }
+        """)
+        self.btn_rendimiento.clicked.connect(self.mostrar_rendimiento)
+        layout.addWidget(self.btn_rendimiento)
         return panel
+
+    def mostrar_rendimiento(self):
+        """Abre el resumen de tiempos por operación"""
+        VentanaRendimiento(self).exec()
     
     def cargar_logs(self):
-        """Carga logs: Colores neutros para evitar fatiga visual"""
-        from PyQt6.QtWidgets import QTreeWidgetItem
-        from PyQt6.QtGui import QColor, QBrush
-        import json
-        import os
-        
+        """Carga las cabeceras de sesión; los eventos se leen al desplegar cada sesión"""
         try:
             ruta_log = "metrologia_log.json"
             if not os.path.exists(ruta_log): return
 
-            with open(ruta_log, 'r', encoding='utf-8') as f:
-                sesiones = json.load(f)
-
-            sesiones_ordenadas = list(reversed(sesiones))
-            self.logs_table.clear()
-            
-            for s in sesiones_ordenadas:
-                usuario = s.get("user", "Sistema")
-                inicio = s.get("start_time", "").replace("T", " ")
-                num_sesion = s.get("session_number", "?")
-                
-                parent = QTreeWidgetItem(self.logs_table)
-                parent.setText(0, f"📦 Sesión #{num_sesion} - {inicio}")
-                parent.setText(1, "SESIÓN")
-                parent.setText(2, usuario)
-                
-                eventos = s.get("events", [])
-                tiene_seguridad = False
-                
-                for ev in eventos:
-                    child = QTreeWidgetItem(parent)
-                    hora = ev.get("time", "") 
-                    full_action = ev.get("action", "")
-                    
-                    if ":" in full_action:
-                        tipo_ev, desc_ev = full_action.split(":", 1)
-                    else:
-                        tipo_ev, desc_ev = "INFO", full_action
-                    
-                    child.setText(0, f"  └─ {hora}")
-                    child.setText(1, tipo_ev.strip())
-                    child.setText(3, desc_ev.strip())
-                    
-                    # Colores de texto para los eventos (suaves)
-                    desc_lower = desc_ev.lower()
-                    if (ev.get("level") == "error" or tipo_ev.strip() == "SECURITY" or 
-                        "corrupto" in desc_lower or "incorrecta" in desc_lower):
-                        child.setForeground(0, QColor("#ff8585")) # Rojo pastel
-                        child.setText(0, "⚠️ " + child.text(0))
-                        tiene_seguridad = True
-                    elif "re-firmado" in desc_lower:
-                        child.setForeground(3, QColor("#a2ffaf")) # Verde pastel
-                    elif "hash vault" in desc_lower or "cerrando" in desc_lower:
-                        child.setForeground(3, QColor("#4ec9b0")) # Cyan pastel para vault
-                        if "cerrando app" in desc_lower:
-                            child.setText(0, "🔐 " + child.text(0)) # Icono de cierre de app
-                        elif "cerrando sesión" in desc_lower:
-                            child.setText(0, "🔒 " + child.text(0)) # Icono de cierre de sesión
-                
-                # --- PALETA DE COLORES NEUTROS (Descanso visual) ---
-                if tiene_seguridad:
-                    # Rojo granate muy oscuro y apagado
-                    bg_color = QColor("#5a1d1d") 
-                else:
-                    # Gris azulado neutro (tipo Visual Studio)
-                    bg_color = QColor("#37373d") 
-
-                for i in range(4):
-                    parent.setBackground(i, bg_color)
-                    # Forzamos texto blanco puro para que resalte sin sombras
-                    parent.setForeground(i, QColor("#b0b0b0")) 
-
-                parent.setExpanded(False) 
+            self.modelo_logs.cargar(cargar_archivo(ruta_log))
+            self._cargar_opciones_filtros()
 
         except Exception as e:
-            self.log(f"Error en cargar_logs: {e}")
+            QMessageBox.warning(self, "Logs", f"No se pudo cargar el log de auditoría: {e}")
 
     def escanear_sistema(self):
-        """Escanea todos los JSON y sus hashes para verificar integridad"""
+        """Lanza en segundo plano la verificación de todos los JSON y manifiestos contra el vault"""
+        if self.worker_escaneo is not None and self.worker_escaneo.isRunning():
+            return
         self.btn_escanear.setEnabled(False)
+        self.btn_cancelar_escaneo.setEnabled(True)
+        self.lista_hallazgos.clear()
+        self._archivos_corruptos = []
+        self._escaneo_completado = False
         self.health_status.setText("🔍 Escaneando sistema...")
         self.health_status.setStyleSheet("""
             QLabel {
@@ -279,96 +355,126 @@ class VentanaAuditoria(QDialog):
                 border-radius: 4px;
             }
         """)
-        
-        QApplication.processEvents()  # Actualizar UI
-        
-        try:
-        # Buscar archivos JSON solo en las subcarpetas de activos reales
-            search_roots = []
-            for sub_dir in ['patrones', 'instrumentos']:
-                ruta = os.path.join('data', sub_dir)
-                if os.path.isdir(ruta):
-                    search_roots.append(ruta)
-
-            json_files = []
-            for root_path in search_roots:
-                for root, _, files in os.walk(root_path):
-                    for file in files:
-                        # Excluimos logs por seguridad, aunque no deberían estar aquí
-                        if file.endswith('.json') and not file.endswith('_log.json'):
-                            json_files.append(os.path.join(root, file))
-            
-            corrupt_files = []
-            total_files = len(json_files)
-            
-            self._archivos_corruptos = []
-            for i, json_file in enumerate(json_files):
-                # Actualizar progreso
-                self.health_status.setText(f"🔍 Escaneando {i+1}/{total_files}: {os.path.basename(json_file)}")
-                QApplication.processEvents()
-
-                id_elemento = os.path.basename(json_file).replace('.json', '')
-                integridad_ok, _ = verificar_integridad_archivo_vault(json_file, id_elemento)
-                if not integridad_ok:
-                    corrupt_files.append(json_file)
-                    self._archivos_corruptos.append(json_file)
-            
-            # Resultado del escaneo
-            if corrupt_files:
-                self.health_status.setText(f"⚠️ Se encontraron {len(corrupt_files)} archivos con problemas")
-                self.health_status.setStyleSheet("""
-                    QLabel {
-                        color: #e74c3c;
-                        font-weight: bold;
-                        font-size: 14px;
-                        padding: 10px;
-                        background-color: #1e1e1e;
-                        border-radius: 4px;
-                    }
-                """)
-                
-                # Mostrar detalles
-                details = "\n".join([f"• {os.path.basename(f)}" for f in corrupt_files[:10]])
-                if len(corrupt_files) > 10:
-                    details += f"\n... y {len(corrupt_files)-10} más"
-                
-                QMessageBox.warning(self, "Archivos corruptos detectados", 
-                               f"Se detectaron {len(corrupt_files)} archivos con problemas de integridad:\n\n{details}")
-            else:
-                self.health_status.setText("✅ Todos los archivos son íntegros")
-                self.health_status.setStyleSheet("""
-                    QLabel {
-                        color: #27ae60;
-                        font-weight: bold;
-                        font-size: 14px;
-                        padding: 10px;
-                        background-color: #1e1e1e;
-                        border-radius: 4px;
-                    }
-                """)
-                
-        except Exception as e:
-            self.health_status.setText(f"❌ Error en escaneo: {str(e)}")
+
+        self.worker_escaneo = EscaneoIntegridadWorker("data", parent=self)
+        self.worker_escaneo.progreso.connect(self.on_progreso_escaneo)
+        self.worker_escaneo.hallazgos.connect(self.on_hallazgos_escaneo)
+        self.worker_escaneo.terminado.connect(self.on_escaneo_terminado)
+        self.worker_escaneo.fallo.connect(self.on_escaneo_fallido)
+        self.worker_escaneo.start()
+
+    def cancelar_escaneo(self, esperar=False):
+        if self.worker_escaneo is not None and self.worker_escaneo.isRunning():
+            self.btn_cancelar_escaneo.setEnabled(False)
+            self.worker_escaneo.requestInterruption()
+            if esperar:
+                self.worker_escaneo.wait()
+
+    def done(self, resultado):
+        # Cerrar la ventana no debe dejar el hilo de escaneo vivo
+        self.cancelar_escaneo(esperar=True)
+        super().done(resultado)
+
+    def on_progreso_escaneo(self, hechos, total):
+        self.health_status.setText(f"🔍 Escaneando {hechos}/{total}...")
+
+    def on_hallazgos_escaneo(self, hallazgos):
+        """Añade a la lista los archivos con problemas según llegan"""
+        for clave, ruta, motivo in hallazgos:
+            item = QListWidgetItem(f"⚠️ {clave} — {motivo}")
+            item.setToolTip(ruta)
+            self.lista_hallazgos.addItem(item)
+
+    def _fin_escaneo(self):
+        self.btn_escanear.setEnabled(True)
+        self.btn_cancelar_escaneo.setEnabled(False)
+        ahora = datetime.now().strftime("%H:%M:%S")
+        self.lbl_timestamp.setText(f"Última validación: {ahora}")
+
+    def on_escaneo_fallido(self, error):
+        self._fin_escaneo()
+        self.health_status.setText(f"❌ Error en escaneo: {error}")
+        self.health_status.setStyleSheet("""
+            QLabel {
+                color: #e74c3c;
+                font-weight: bold;
+                font-size: 14px;
+                padding: 10px;
+                background-color: #1e1e1e;
+                border-radius: 4px;
+            }
+        """)
+
+    def on_escaneo_terminado(self, resultado):
+        self._fin_escaneo()
+        if resultado["cancelado"]:
+            self.health_status.setText(f"⏹️ Escaneo cancelado ({resultado['verificados']}/{resultado['total']})")
             self.health_status.setStyleSheet("""
-                QLabel {
-                    color: #e74c3c;
-                    font-weight: bold;
-                    font-size: 14px;
-                    padding: 10px;
-                    background-color: #1e1e1e;
-                    border-radius: 4px;
-                }
-            """)
-        
-        finally:
-            self.btn_escanear.setEnabled(True)
-            ahora = datetime.now().strftime("%H:%M:%S")
-            self.lbl_timestamp.setText(f"Última validación: {ahora}")
-    
+            QLabel {
+                color: #808080;
+                font-weight: bold;
+                font-size: 14px;
+                padding: 10px;
+                background-color: #1e1e1e;
+                border-radius: 4px;
+            }
+        """)
+            return
+
+        corrupt_files = resultado["corruptos"]
+        self._archivos_corruptos = list(corrupt_files)
+        self._escaneo_completado = True
+        self._familias_afectadas = resultado["familias"]
+
+        # Resultado del escaneo
+        if corrupt_files:
+            self.health_status.setText(f"⚠️ Se encontraron {len(corrupt_files)} archivos con problemas")
+            self.health_status.setStyleSheet("""
+            QLabel {
+                color: #e74c3c;
+                font-weight: bold;
+                font-size: 14px;
+                padding: 10px;
+                background-color: #1e1e1e;
+                border-radius: 4px;
+            }
+        """)
+
+            # Mostrar detalles
+            details = "\n".join([f"• {clave_vault_de_ruta(f)}" for f in corrupt_files[:10]])
+            if len(corrupt_files) > 10:
+                details += f"\n... y {len(corrupt_files)-10} más"
+            if self._familias_afectadas:
+                details += "\n\nFamilias afectadas:\n" + "\n".join(
+                    f"• {familia} ({len(claves)})" for familia, claves in sorted(self._familias_afectadas.items()))
+
+            QMessageBox.warning(self, "Archivos corruptos detectados",
+                           f"Se detectaron {len(corrupt_files)} archivos con problemas de integridad:\n\n{details}")
+        else:
+            self.health_status.setText("✅ Todos los archivos son íntegros")
+            self.health_status.setStyleSheet("""
+            QLabel {
+                color: #27ae60;
+                font-weight: bold;
+                font-size: 14px;
+                padding: 10px;
+                background-color: #1e1e1e;
+                border-radius: 4px;
+            }
+        """)
+
     def regenerar_hashes_corruptos(self):
         """Regenera hashes y registra exactamente qué archivos han sido firmados"""
         from datetime import datetime
         from core.logger import get_logger
+
+        if self.worker_escaneo is not None and self.worker_escaneo.isRunning():
+            QMessageBox.information(self, "Escaneo en curso", "Espere a que termine el escaneo de integridad.")
+            return
+        if not self._escaneo_completado:
+            QMessageBox.information(self, "Sin escaneo",
+                                    "Ejecute primero el escaneo del sistema para saber qué archivos re-firmar.")
+            return
             
         logger = get_logger()
         
@@ -382,13 +488,11 @@ class VentanaAuditoria(QDialog):
         
         try:
             # 2. Validar Admin
-            with open(get_data_path('config/users.json'), 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            admin_data = next((u for u in data['tecnicos'] if u['username'].lower() == 'admin'), None)
-            login_tool = LoginDialog()
-            
-            if not admin_data or password_input != login_tool.desencriptar_password(admin_data['password']):
+            directorio = get_directorio(get_data_path('config/users.json'))
+            admin_data = directorio.buscar('admin', ignorar_mayusculas=True)
+            if admin_data and admin_data.get('user_type') != 'tecnicos':
+                admin_data = None
+            if not admin_data or not directorio.autenticar(admin_data['username'], password_input):
                 logger.log_event("SECURITY", "Intento fallido de regeneración: Credenciales inválidas", level="warning")
                 QMessageBox.critical(self, "Error", "Acceso denegado.")
                 return
@@ -401,44 +505,131 @@ class VentanaAuditoria(QDialog):
 
         # 3. Regeneración con captura de IDs
         try:
-            if not hasattr(self, '_archivos_corruptos'):
-                self.escanear_sistema()
-
-            archivos_objetivo = list(getattr(self, '_archivos_corruptos', []))
+            archivos_objetivo = list(self._archivos_corruptos)
             if not archivos_objetivo:
                 QMessageBox.information(self, "Sin cambios", "No hay archivos corruptos.")
                 return
 
-            regenerated = 0
-            nombres_reparados = [] # <--- Lista para guardar los nombres
-
-            for json_file in archivos_objetivo:
-                # Extraer el ID (ej: ME-0001)
-                id_elemento = os.path.basename(json_file).replace('.json', '')
-                
-                if generar_y_guardar_hash_vault(json_file, id_elemento):
-                    regenerated += 1
-                    nombres_reparados.append(id_elemento) # <--- Guardamos el ID
+            # Hashes en paralelo y una sola escritura del vault y del árbol de Merkle
+            firmados, fallidos = refirmar_lote({clave_vault_de_ruta(f): f for f in archivos_objetivo})
+            regenerated = len(firmados)
+            nombres_reparados = sorted(firmados)
             
-            # 4. Registro detallado en el Log
+            # 4. Un único evento en el Log con todos los IDs
             if regenerated > 0:
                 lista_str = ", ".join(nombres_reparados) # Unimos los nombres por comas
                 detalle_accion = f"Re-firmados {regenerated} archivos: [{lista_str}]"
-                
-                # Usamos el método de registro administrativo
-                if hasattr(logger, 'registrar_accion_administrativa'):
-                    logger.registrar_accion_administrativa(nombre_admin, "REGENERACIÓN_HASHES", detalle_accion)
-                else:
-                    logger.log_event("DATA", f"ADMIN[{nombre_admin}]: {detalle_accion}", level="success")
+                logger.registrar_accion_administrativa(nombre_admin, f"REGENERACIÓN_HASHES - {detalle_accion}")
+            if fallidos:
+                QMessageBox.warning(self, "Re-firmado incompleto", "No se pudieron re-firmar:\n" +
+                                    "\n".join(f"• {clave}: {error}" for clave, error in sorted(fallidos.items())))
 
             # 5. UI
             ahora = datetime.now().strftime("%H:%M:%S")
             self.lbl_timestamp.setText(f"Última validación: {ahora} (Firma: {nombre_admin})")
             
-            QMessageBox.information(self, "Éxito", f"Se han re-firmado: {', '.join(nombres_reparados)}")
+            if nombres_reparados:
+                QMessageBox.information(self, "Éxito", f"Se han re-firmado: {', '.join(nombres_reparados)}")
             
             self.cargar_logs()
-            self._archivos_corruptos = [] 
+            self._archivos_corruptos = [f for f in archivos_objetivo if clave_vault_de_ruta(f) in fallidos]
             
         except Exception as e:
-            QMessageBox.critical(self, "Error", f"Fallo en proceso: {str(e)}")
\ No newline at end of file
+            QMessageBox.critical(self, "Error", f"Fallo en proceso: {str(e)}")
+
+class VentanaRendimiento(QDialog):
+    """Resumen de core.perfilado: llamadas, tiempos e histograma por operación"""
+
+    COLUMNAS = ["Operación", "Llamadas", "Total (ms)", "Media (ms)", "Máx (ms)", "p95 ≤ (µs)", "Histograma log2 (µs: n)"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        from PyQt6.QtWidgets import QTableWidget
+        self.setWindowTitle("⏱️ Rendimiento de operaciones")
+        self.resize(1100, 500)
+
+        layout = QVBoxLayout(self)
+        self.lbl_estado = QLabel()
+        self.lbl_estado.setStyleSheet("color: #cccccc; font-size: 13px; padding: 6px;")
+        layout.addWidget(self.lbl_estado)
+
+        self.tabla = QTableWidget(0, len(self.COLUMNAS))
+        self.tabla.setHorizontalHeaderLabels(self.COLUMNAS)
+        self.tabla.horizontalHeader().setSectionResizeMode(len(self.COLUMNAS) - 1, QHeaderView.ResizeMode.Stretch)
+        self.tabla.setColumnWidth(0, 220)
+        self.tabla.setStyleSheet("""
+            QTableWidget { background-color: #252526; color: #ffffff; border: 1px solid #3e3e42; }
+            QHeaderView::section { background-color: #333333; color: #ffffff; padding: 5px; font-weight: bold; }
+        """)
+        layout.addWidget(self.tabla)
+
+        botones = QHBoxLayout()
+        self.btn_activar = QPushButton()
+        self.btn_activar.clicked.connect(self.alternar_medicion)
+        btn_actualizar = QPushButton("🔄 Actualizar")
+        btn_actualizar.clicked.connect(self.actualizar)
+        btn_reiniciar = QPushButton("🧹 Reiniciar")
+        btn_reiniciar.clicked.connect(self.reiniciar)
+        btn_volcar = QPushButton("💾 Volcar a archivo")
+        btn_volcar.clicked.connect(self.volcar)
+        btn_perfil = QPushButton("🔬 Capturar perfil...")
+        btn_perfil.clicked.connect(self.capturar_perfil)
+        for boton in (self.btn_activar, btn_actualizar, btn_reiniciar, btn_volcar, btn_perfil):
+            botones.addWidget(boton)
+        botones.addStretch()
+        layout.addLayout(botones)
+
+        self.actualizar()
+
+    def actualizar(self):
+        from PyQt6.QtWidgets import QTableWidgetItem
+        from core import perfilado
+
+        activo = perfilado.esta_activo()
+        self.btn_activar.setText("⏸️ Desactivar medición" if activo else "▶️ Activar medición")
+        filas = perfilado.resumen()
+        estado = "activa" if activo else f"desactivada (active con {perfilado.VARIABLE_ENTORNO}=1 o con el botón)"
+        self.lbl_estado.setText(f"Medición {estado} · {len(filas)} operaciones registradas")
+
+        self.tabla.setRowCount(len(filas))
+        for i, fila in enumerate(filas):
+            histograma = "  ".join(f"{cota}: {n}" for cota, n in fila["histograma_log2_us"].items())
+            valores = [fila["operacion"], fila["llamadas"], fila["total_ms"], fila["media_ms"],
+                       fila["max_ms"], fila["p95_us_max"], histograma]
+            for j, valor in enumerate(valores):
+                item = QTableWidgetItem(str(valor))
+                if 0 < j < len(valores) - 1:
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.tabla.setItem(i, j, item)
+
+    def alternar_medicion(self):
+        from core import perfilado
+        perfilado.activar(not perfilado.esta_activo())
+        self.actualizar()
+
+    def reiniciar(self):
+        from core import perfilado
+        perfilado.reiniciar()
+        self.actualizar()
+
+    def volcar(self):
+        from core import perfilado
+        try:
+            ruta = perfilado.volcar()
+            QMessageBox.information(self, "Rendimiento", f"Tiempos guardados en:\n{os.path.abspath(ruta)}")
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"No se pudo guardar el resumen: {e}")
+
+    def capturar_perfil(self):
+        """Arma una traza cProfile para la próxima ejecución de la operación elegida"""
+        from core import perfilado
+        operaciones = [f["operacion"] for f in perfilado.resumen()] or [
+            "indices.generar", "vault.generar_completo", "pdf.exportar", "grafica.interfaz", "log.anexar_evento"
+        ]
+        nombre, ok = QInputDialog.getItem(self, "Capturar perfil", "Operación:", operaciones, 0, True)
+        if not ok or not nombre:
+            return
+        ruta = perfilado.capturar_perfil(nombre)
+        self.actualizar()
+        QMessageBox.information(self, "Rendimiento",
+                                f"La próxima ejecución de '{nombre}' se perfilará en:\n{os.path.abspath(ruta)}")
@@ -2,10 +2,12 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QScrollArea,
                              QLineEdit, QPushButton, QLabel, QSpinBox, QFrame, QComboBox)
 from PyQt6.QtCore import Qt, QLocale
 from PyQt6 import QtCore
-import os, json, datetime
+import os, datetime
 import statistics
-import hashlib
-from core.pdf_generator import exportar_a_pdf
+from core.perfilado import medir
+from core.guardado import guardar_activo
+from core.documentos import cargar_documento, copia_documento
+from core import vencimientos, modelo, asignacion_patrones, montecarlo
 
 class CalibrationWindow(QWidget):
     def __init__(self, id_elemento, familia, logger, current_user=None):
@@ -27,10 +29,8 @@ class CalibrationWindow(QWidget):
         """Carga los limites del equipo para validacion dinamica"""
         try:
             ruta_json = os.path.join("data/instrumentos", self.familia, self.id_el, f"{self.id_el}.json")
-            with open(ruta_json, 'r', encoding='utf-8', errors='ignore') as f:
-                data = json.load(f)
-                self.r_min = float(data.get('rango_min', 0))
-                self.r_max = float(data.get('rango_max', 1000))
+            instrumento = modelo.cargar_instrumento(ruta_json)
+            self.r_min, self.r_max = instrumento.limites(0, 1000)
         except:
             self.r_min, self.r_max = 0, 1000
 
@@ -97,10 +97,9 @@ class CalibrationWindow(QWidget):
         
         try:
             ruta_json = os.path.join("data/instrumentos", self.familia, self.id_el, f"{self.id_el}.json")
-            with open(ruta_json, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                descripcion = data.get('descripcion', 'Sin descripción')
-                rango = f"{data.get('rango_min', 0)} - {data.get('rango_max', 0)} mm"
+            instrumento = modelo.cargar_instrumento(ruta_json)
+            descripcion = instrumento.descripcion
+            rango = f"{modelo.formato(instrumento.rango_min)} - {modelo.formato(instrumento.rango_max)} mm"
         except:
             descripcion = 'Sin descripción'
             rango = '0 - 1000 mm'
@@ -241,32 +240,11 @@ class CalibrationWindow(QWidget):
             pass
 
     def calcular_proxima_calibracion(self, data):
-        
-        from dateutil.relativedelta import relativedelta
-        try:
-            periodicidad = int(data.get('periodicidad_meses', 12))
-            historial = data.get('historial', [])
-            ultima_calib_str = None
-
-            if historial and len(historial) > 0:
-                # Ojo: usamos el split para limpiar posibles horas
-                ultima_calib_str = historial[-1].get('fecha_calibracion')
-            
-            if not ultima_calib_str:
-                ultima_calib_str = data.get('fecha_ultima_calibracion') or data.get('FECHA_ULTIMA_CALIBRACION')
-
-            if ultima_calib_str and ultima_calib_str != 'N/A':
-                try:
-                    fecha_limpia = str(ultima_calib_str).split(' ')[0]
-                    fecha_ultima = datetime.strptime(fecha_limpia, '%Y-%m-%d')
-                    proxima = fecha_ultima + relativedelta(months=periodicidad)
-                    return proxima, str(ultima_calib_str)
-                except:
-                    return None, None
-            
-            return None, None
-        except:
+        """(datetime próxima, texto última) según core.vencimientos, o (None, None)"""
+        proxima, ultima, _, _ = vencimientos.evaluar(data)
+        if proxima is None:
             return None, None
+        return datetime.datetime.combine(proxima, datetime.time()), ultima
 
 
 
@@ -276,7 +254,6 @@ class CalibrationWindow(QWidget):
         try:
             patrones = []
             base_patrones = os.path.join("data", "patrones")
-            fecha_hoy = datetime.datetime.datetime.now() # Para comparar vigencia
             
             if os.path.exists(base_patrones):
                 for familia in os.listdir(base_patrones):
@@ -286,31 +263,31 @@ class CalibrationWindow(QWidget):
                             json_path = os.path.join(familia_path, patron_id, f"{patron_id}.json")
                             
                             if os.path.exists(json_path):
-                                with open(json_path, 'r', encoding='utf-8') as f:
-                                    data = json.load(f)
+                                data = cargar_documento(json_path)
+                                patron = modelo.como_patron(data)
                                     
-                                    # 1. Validar Incertidumbre (Debe existir y ser > 0)
-                                    incert = float(data.get('incertidumbre', 0))
-                                    if incert <= 0:
-                                        continue # Salta este patrón si no tiene incertidumbre válida
-
-                                    # 2. Validar Vigencia (Usa tu función de cálculo)
-                                    proxima_dt, _ = self.calcular_proxima_calibracion(data)
-                                    if not proxima_dt or proxima_dt < fecha_hoy:
-                                        # Opcional: Loguear qué patrón está caducado
-                                        # self.log(f"[SISTEMA] Patrón {patron_id} ignorado por caducidad.")
-                                        continue
-
-                                    # 3. Validar Rango Nominal
-                                    valor_nominal = float(data.get('valor_nominal', 0))
-                                    if self.r_min <= valor_nominal <= self.r_max:
-                                        patrones.append({
-                                            'id': patron_id,
-                                            'valor_nominal': valor_nominal,
-                                            'incertidumbre': incert,
-                                            'descripcion': data.get('descripcion', ''),
-                                            'proxima_calib': proxima_dt.strftime('%Y-%m-%d') # Útil para la nota del PDF
-                                        })
+                                # 1. Validar Incertidumbre (Debe existir y ser > 0)
+                                incert = patron.incertidumbre
+                                if incert <= 0:
+                                    continue # Salta este patrón si no tiene incertidumbre válida
+
+                                # 2. Validar Vigencia (Usa tu función de cálculo)
+                                proxima_dt, _ = self.calcular_proxima_calibracion(data)
+                                if not proxima_dt or vencimientos.evaluar(data)[2] <= 0:
+                                    # Opcional: Loguear qué patrón está caducado
+                                    # self.log(f"[SISTEMA] Patrón {patron_id} ignorado por caducidad.")
+                                    continue
+
+                                # 3. Validar Rango Nominal
+                                valor_nominal = patron.valor_nominal
+                                if self.r_min <= valor_nominal <= self.r_max:
+                                    patrones.append({
+                                        'id': patron_id,
+                                        'valor_nominal': valor_nominal,
+                                        'incertidumbre': incert,
+                                        'descripcion': patron.descripcion,
+                                        'proxima_calib': proxima_dt.strftime('%Y-%m-%d') # Útil para la nota del PDF
+                                    })
             
             patrones.sort(key=lambda x: x['valor_nominal'])
             return patrones
@@ -321,28 +298,10 @@ class CalibrationWindow(QWidget):
 
     def calcular_puntos_sugeridos(self, num_puntos):
         """Selecciona patrones de forma ascendente y repartida"""
-        puntos_sugeridos = []
-        
-        # 1. Aseguramos que los patrones estén ordenados de menor a mayor nominal
-        patrones_ordenados = sorted(self.patrones_disponibles, key=lambda x: x['valor_nominal'])
-        total_disponibles = len(patrones_ordenados)
-
-        if total_disponibles == 0:
-            return []
-
-        # 2. Si pedimos más puntos de los que hay, los damos todos en orden
-        if num_puntos >= total_disponibles:
-            return patrones_ordenados
-
-        # 3. Si hay suficientes, seleccionamos N patrones repartidos proporcionalmente
-        # Esto asegura que si tienes 20 patrones y pides 5 puntos, elija 
-        # el primero, el último y 3 intermedios de forma equilibrada.
-        for i in range(num_puntos):
-            # Calculamos el índice proporcional
-            idx = int(i * (total_disponibles - 1) / (num_puntos - 1)) if num_puntos > 1 else 0
-            puntos_sugeridos.append(patrones_ordenados[idx])
-            
-        return puntos_sugeridos
+        # Repartidos por valor nominal entre el primero y el último, prefiriendo
+        # los de menor incertidumbre (ver core.asignacion_patrones).
+        # Si pedimos más puntos de los que hay, se devuelven todos en orden.
+        return asignacion_patrones.sugerir(self.patrones_disponibles, num_puntos, self.r_min, self.r_max)
 
     def dibujar_puntos(self):
         # 1. Cargar patrones y resolución del equipo
@@ -350,18 +309,16 @@ class CalibrationWindow(QWidget):
         
         try:
             ruta_json = os.path.join("data/instrumentos", self.familia, self.id_el, f"{self.id_el}.json")
-            with open(ruta_json, 'r', encoding='utf-8') as f:
-                data_res = json.load(f)
+            instrumento = modelo.cargar_instrumento(ruta_json)
             
             # Forzamos formato string para contar decimales correctamente (evita el error de los 2 decimales)
-            res_val_raw = data_res.get('resolucion', 0.001)
-            res_str = "{:.10f}".format(float(res_val_raw)).rstrip('0')
+            res_str = "{:.10f}".format(instrumento.resolucion).rstrip('0')
             if '.' in res_str:
                 decimales_max = len(res_str.split('.')[-1])
             else:
                 decimales_max = 2
             
-            incert_historica = float(data_res.get('incertidumbre_elemento', 0.005))
+            incert_historica = instrumento.incertidumbre_elemento
         except:
             decimales_max = 3
             incert_historica = 0.005
@@ -496,14 +453,14 @@ class CalibrationWindow(QWidget):
         try:
             datos_puntos = []
             errores = []
+            entradas_mc = []
 
             # --- PASO 1: Cargar el JSON primero para obtener la resolución ---
             ruta_json = os.path.join("data/instrumentos", self.familia, self.id_el, f"{self.id_el}.json")
-            with open(ruta_json, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = copia_documento(ruta_json)
             
             # Extraer resolución del JSON y calcular su componente (u_res)
-            res_val = float(data.get('resolucion', 0.001))
+            res_val = modelo.numero(data.get('resolucion'), modelo.RESOLUCION_DEFECTO)
             u_res = res_val / (12**0.5)
             
             for p in self.puntos_widgets:
@@ -548,6 +505,21 @@ class CalibrationWindow(QWidget):
                     "incertidumbre_k2": round(U_expandida, 4),
                     "lecturas": [round(l, 4) for l in lecturas]
                 })
+                entradas_mc.append({"valor_nominal": val_nom, "lecturas": lecturas,
+                                    "incertidumbre_patron": u_patron, "incertidumbre_k2": U_expandida})
+
+            # --- MONTE CARLO (opcional, JCGM 101): intervalo de cobertura junto a incertidumbre_k2 ---
+            if montecarlo.esta_activo():
+                for punto, mc in zip(datos_puntos, montecarlo.propagar(entradas_mc, res_val)):
+                    punto["montecarlo"] = {
+                        "intervalo": [round(v, 4) for v in mc["intervalo"]],
+                        "incertidumbre": round(mc["incertidumbre_mc"], 4),
+                        "gum_valido": mc["gum_valido"],
+                        "muestras": mc["muestras"],
+                    }
+                    if not mc["gum_valido"]:
+                        self.log(f"[MC] Punto {punto['valor_nominal']}: U Monte Carlo {mc['incertidumbre_mc']:.4f} "
+                                 f"frente a U GUM {punto['incertidumbre_k2']:.4f}")
 
             # --- CORRECCIÓN DEL ERROR 'STR' OBJECT HAS NO ATTRIBUTE 'GET' ---
             if isinstance(self.current_user, dict):
@@ -555,12 +527,9 @@ class CalibrationWindow(QWidget):
             else:
                 responsable = str(self.current_user) if self.current_user else 'Admin'
 
-            # Volvemos a abrir para actualizar historial
-            with open(ruta_json, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                
+            # El historial se actualiza sobre la copia ya cargada en el paso 1
             nueva_entrada = {
-                "fecha_calibracion": datetime.datetime.datetime.now().strftime("%Y-%m-%d %H:%M"),
+                "fecha_calibracion": datetime.datetime.now().strftime("%Y-%m-%d %H:%M"),
                 "responsable": responsable,
                 "puntos": datos_puntos,
                 "error_maximo": round(max([abs(e) for e in errores]), 4),
@@ -568,30 +537,22 @@ class CalibrationWindow(QWidget):
             }
             data['historial'].append(nueva_entrada)
             data['fecha_ultima_calibracion'] = nueva_entrada['fecha_calibracion']
-            data['incertidumbre'] = nueva_entrada['incertidumbre_k2']
-
-            with open(ruta_json, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=4, ensure_ascii=False)
-
-            # --- GENERAR NUEVO HASH ---
-            try:
-                SAL_SECRETA = b"METROLOGIA_2024_HASH_SALT_SECURE"  # Palabra secreta para mayor seguridad
-                hash_sha256 = hashlib.sha256()
-                with open(ruta_json, "rb") as f:
-                    contenido = f.read()
-                    hash_sha256.update(contenido + SAL_SECRETA)
-                hash_valor = hash_sha256.hexdigest()
-                
-                ruta_hash = ruta_json.replace('.json', '.hash')
-                with open(ruta_hash, 'w', encoding='utf-8') as f:
-                    f.write(hash_valor)
-                    
+            data['incertidumbre'] = max(p['incertidumbre_k2'] for p in datos_puntos)
+
+            # --- GUARDAR Y FIRMAR (JSON, vault, índice y auditoría) ---
+            with medir("json.guardar_calibracion"):
+                ok, detalle = guardar_activo(
+                    ruta_json, data, self.id_el, sort_keys=False,
+                    evento=("DATA", f"Calibración de {self.id_el} registrada por {responsable}")
+                )
+            if ok:
                 self.log(f"[HASH] Hash actualizado para {self.id_el} tras calibración")
-            except Exception as e:
-                self.log(f"[ERROR] No se pudo actualizar hash para {self.id_el}: {e}")
+            else:
+                self.log(f"[ERROR] No se pudo actualizar hash para {self.id_el}: {detalle}")
 
             # --- EXPORTACIÓN PDF ---
             self.log("[DEBUG] Iniciando exportación PDF...")
+            from core.pdf_generator import exportar_a_pdf
             exportar_a_pdf(data, ruta_json) 
             self.log(f"[EXITO] Calibración guardada y PDF generado.")
             
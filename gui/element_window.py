@@ -2,10 +2,12 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QFormLayout, QLineEdit,
                              QSpinBox, QComboBox, QPushButton, QFileDialog, QLabel,
                              QMessageBox, QHBoxLayout, QListWidget, QListWidgetItem, QDateEdit)
 from PyQt6.QtCore import Qt, QDate
-import json
 import os
 import shutil
 import hashlib
+from core.adjuntos import registrar_adjunto
+from core.guardado import guardar_activo
+from core import registro_ids
 
 class ElementWindow(QWidget):
     # Ahora aceptamos familia Y logger
@@ -114,6 +116,11 @@ class ElementWindow(QWidget):
         self.form = QFormLayout()
 
         self.codigo = QLineEdit()
+        # Siguiente código libre con el prefijo de la familia (BP-0029, ME-0009...)
+        propuesta = registro_ids.proponer_para_familia(self.tipo_modulo, self.familia)
+        if propuesta:
+            self.codigo.setText(propuesta)
+            self.codigo.selectAll()
         self.descripcion = QLineEdit()
         self.form.addRow("Código/ID:", self.codigo)
         self.form.addRow("Descripción:", self.descripcion)
@@ -229,23 +236,11 @@ class ElementWindow(QWidget):
         return familias_encontradas
 
     def verificar_codigo_global(self, codigo):
-        """Verifica si el código existe en TODA la base de datos"""
+        """Verifica si el código existe en TODA la base de datos (registro de IDs, sin leer disco)"""
         try:
-            for root, dirs, files in os.walk("data"):
-                for file in files:
-                    if file.endswith(".json"):
-                        ruta_json = os.path.join(root, file)
-                        try:
-                            with open(ruta_json, 'r', encoding='utf-8') as f:
-                                data = json.load(f)
-                                if isinstance(data, dict) and data.get("id") == codigo:
-                                    return True
-                        except (json.JSONDecodeError, KeyError, IOError):
-                            # Ignorar archivos corruptos o sin formato válido
-                            continue
-        except Exception:
-            pass
-        return False
+            return registro_ids.existe(codigo)
+        except OSError:
+            return False
 
     def save_element(self):
         codigo = self.codigo.text().strip().upper()  # Homogeneizar a MAYÚSCULAS
@@ -299,14 +294,19 @@ class ElementWindow(QWidget):
         
         ruta_json = os.path.join(ruta, f"{codigo}.json")
         
-        # Importar la función unificada desde main
-        import sys
-        sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        from main import guardar_json_con_hash
-        
-        if guardar_json_con_hash(ruta_json, data, codigo):
+        ok, detalle = guardar_activo(ruta_json, data, codigo,
+                                     evento=('DATA', f'Alta de {codigo} en {self.familia}'))
+        if ok:
             self.logger(f'[HASH] Hash generado para nuevo elemento {codigo}')
         else:
-            self.logger(f'[ERROR] No se pudo generar hash para {codigo}')
+            self.logger(f'[ERROR] No se pudo generar hash para {codigo}: {detalle}')
+
+        # Documentos seleccionados: se guardan en el almacén de adjuntos
+        for archivo in self.uploaded_files:
+            try:
+                nombre, _ = registrar_adjunto(ruta, codigo, archivo)
+                self.logger(f'[DOCS] {nombre} añadido a {codigo}')
+            except OSError as e:
+                self.logger(f'[ERROR] No se pudo adjuntar {os.path.basename(archivo)}: {e}')
             
         self.close()
\ No newline at end of file
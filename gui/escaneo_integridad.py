@@ -0,0 +1,156 @@
+"""
+Escaneo de integridad de la ventana de Auditoría en segundo plano.
+
+El hilo lista los JSON de activos y los manifiestos de adjuntos de data/ y
+los verifica en paralelo (un ThreadPoolExecutor: la lectura y el SHA-256
+liberan el GIL). Cada archivo se compara con su entrada del vault en cuanto se
+calcula su hash, y los hallazgos se envían a la ventana agrupados junto con el
+avance cada ~100 ms. Al terminar, los hashes se comparan con el árbol de
+Merkle para obtener las familias afectadas (y las claves del vault sin archivo).
+El escaneo se cancela con requestInterruption().
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from core.seguridad import cargar_vault_hashes, generar_hash_archivo
+from core.merkle import cargar_arbol, localizar_discrepancias, familia_de_ruta
+from core.adjuntos import verificar_adjuntos, clave_vault_de_ruta, NOMBRE_MANIFIESTO
+from gui.verificacion_elementos import INTERVALO_AVISO_S
+
+RAMAS = ("patrones", "instrumentos")
+HILOS_MAXIMOS = 8
+
+
+def listar_archivos_integridad(base="data"):
+    """JSON de activos y manifiestos de adjuntos bajo data/<rama>/"""
+    archivos = []
+    for rama in RAMAS:
+        carpeta = os.path.join(base, rama)
+        if not os.path.isdir(carpeta):
+            continue
+        for root, _, files in os.walk(carpeta):
+            for file in files:
+                # Excluimos logs por seguridad, aunque no deberían estar aquí
+                if (file.endswith('.json') and not file.endswith('_log.json')) or file == NOMBRE_MANIFIESTO:
+                    archivos.append(os.path.join(root, file))
+    return archivos
+
+
+def verificar_archivo(ruta, vault, blobs_verificados):
+    """
+    Returns:
+        tuple: (clave, hash, motivo) con motivo None si el archivo es íntegro
+    """
+    clave = clave_vault_de_ruta(ruta)
+    hash_valor = generar_hash_archivo(ruta)
+    guardado = vault.get(clave)
+    if guardado is None:
+        return clave, hash_valor, "Sin registro en el vault"
+    if guardado != hash_valor:
+        return clave, hash_valor, "Hash distinto al del vault"
+
+    if os.path.basename(ruta) == NOMBRE_MANIFIESTO:
+        # Manifiesto de documentos: se verifican también los adjuntos que referencia
+        carpeta_activo = os.path.dirname(os.path.dirname(ruta))
+        ok, mensaje, problemas = verificar_adjuntos(carpeta_activo, os.path.basename(carpeta_activo),
+                                                    vault, blobs_verificados)
+        if not ok:
+            return clave, hash_valor, f"{mensaje}: {', '.join(problemas)}" if problemas else mensaje
+    return clave, hash_valor, None
+
+
+class EscaneoIntegridadWorker(QThread):
+    progreso = pyqtSignal(int, int)       # verificados, total
+    hallazgos = pyqtSignal(list)          # [(clave, ruta, motivo)] nuevos desde el último aviso
+    terminado = pyqtSignal(dict)          # resumen (ver run)
+    fallo = pyqtSignal(str)
+
+    def __init__(self, base_data="data", parent=None):
+        super().__init__(parent)
+        self.base_data = base_data
+
+    def run(self):
+        try:
+            self.terminado.emit(self._escanear())
+        except Exception as e:
+            self.fallo.emit(str(e))
+
+    def _escanear(self):
+        """
+        Returns:
+            dict: corruptos (rutas), familias ({familia: [claves]}), total,
+                  verificados y cancelado
+        """
+        archivos = listar_archivos_integridad(self.base_data)
+        total = len(archivos)
+        vault = cargar_vault_hashes()
+        blobs_verificados = {}
+
+        hashes_por_familia = {}
+        ruta_por_clave = {}
+        alteradas = {}          # clave -> motivo
+        lote = []
+        hechos = 0
+        ultimo_aviso = time.monotonic()
+        self.progreso.emit(0, total)
+
+        hilos = min(HILOS_MAXIMOS, (os.cpu_count() or 1) + 4)
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            futuros = {pool.submit(verificar_archivo, ruta, vault, blobs_verificados): ruta for ruta in archivos}
+            for futuro in as_completed(futuros):
+                if self.isInterruptionRequested():
+                    pool.shutdown(wait=True, cancel_futures=True)
+                    return {"corruptos": [], "familias": {}, "total": total,
+                            "verificados": hechos, "cancelado": True}
+                ruta = futuros[futuro]
+                hechos += 1
+                try:
+                    clave, hash_valor, motivo = futuro.result()
+                except OSError as e:
+                    clave, hash_valor, motivo = clave_vault_de_ruta(ruta), None, f"No se pudo leer: {e}"
+                ruta_por_clave[clave] = ruta
+                if hash_valor is not None:
+                    hashes_por_familia.setdefault(familia_de_ruta(ruta), {})[clave] = hash_valor
+                if motivo:
+                    alteradas[clave] = motivo
+                    lote.append((clave, ruta, motivo))
+
+                ahora = time.monotonic()
+                if ahora - ultimo_aviso >= INTERVALO_AVISO_S:
+                    if lote:
+                        self.hallazgos.emit(lote)
+                        lote = []
+                    self.progreso.emit(hechos, total)
+                    ultimo_aviso = ahora
+
+        arbol = cargar_arbol()
+        if arbol is not None:
+            # Solo se desciende por las familias cuya raíz no coincide
+            discrepancias = localizar_discrepancias(arbol, hashes_por_familia)
+        else:
+            discrepancias = {}
+            for familia, hashes in hashes_por_familia.items():
+                claves = [c for c, h in hashes.items() if vault.get(c) != h]
+                if claves:
+                    discrepancias[familia] = claves
+
+        # Claves que solo delata el árbol (p. ej. hoja distinta del vault)
+        for claves in discrepancias.values():
+            for clave in claves:
+                if clave in ruta_por_clave and clave not in alteradas:
+                    alteradas[clave] = "Discrepancia en el árbol de Merkle"
+                    lote.append((clave, ruta_por_clave[clave], alteradas[clave]))
+        if lote:
+            self.hallazgos.emit(lote)
+        self.progreso.emit(hechos, total)
+
+        return {
+            "corruptos": [ruta_por_clave[c] for c in sorted(alteradas)],
+            "familias": discrepancias,
+            "total": total,
+            "verificados": hechos,
+            "cancelado": False,
+        }
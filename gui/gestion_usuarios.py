@@ -1,45 +1,24 @@
 import json
 import hashlib
-from base64 import b64encode, b64decode
 from PyQt6.QtWidgets import QDialog, QVBoxLayout, QTableWidget, QTableWidgetItem, QPushButton, QHBoxLayout, QMessageBox
 from PyQt6.QtCore import Qt
 import os
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from core import credenciales
 
 class GestionUsuariosDialog(QDialog):
 
     def __init__(self, parent=None):
-        # Clave de encriptación derivada de una contraseña maestra
-        self.CLAVE_MAESTRA = "METROLOGIA_2024_SECURE_KEY_MASTER"
-        self.salt = b"metrologia_salt_2024"
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=self.salt,
-            iterations=100000,
-        )
-        key = b64encode(kdf.derive(self.CLAVE_MAESTRA.encode()))
-        self.cipher_suite = Fernet(key)
         super().__init__(parent)
         self.init_ui()
 
     def encriptar_password(self, password):
         """Encripta una contraseña usando Fernet (AES)"""
-        if not password or password.startswith("encrypted:"):
-            return password
-        encrypted_password = self.cipher_suite.encrypt(password.encode())
-        return "encrypted:" + b64encode(encrypted_password).decode()
+        return credenciales.encriptar_password(password)
 
     def desencriptar_password(self, encrypted_password):
         """Desencripta una contraseña"""
-        if not encrypted_password or not encrypted_password.startswith("encrypted:"):
-            return encrypted_password
         try:
-            encrypted_data = b64decode(encrypted_password[10:])  # Quita "encrypted:"
-            decrypted_password = self.cipher_suite.decrypt(encrypted_data)
-            return decrypted_password.decode()
+            return credenciales.desencriptar_password(encrypted_password)
         except Exception:
             return encrypted_password  # Si falla, devuelve el original
 
@@ -219,6 +198,8 @@ class GestionUsuariosDialog(QDialog):
             
             with open(self.ruta_json, 'w', encoding='utf-8') as f:
                 json.dump(nuevo_json, f, indent=4)
+            # Las contraseñas se han vuelto a cifrar: los verificadores anteriores ya no sirven
+            credenciales.olvidar_verificadores()
             
             QMessageBox.information(self, "Éxito", "Cambios guardados.\n\nLas contraseñas han sido encriptadas.")
             self.accept()
@@ -7,14 +7,15 @@ import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import os
-import json
 import numpy as np
 import traceback
+from core import modelo
 
 
 
 class GraficaDetailWindow(QMainWindow):
     def __init__(self, id_elemento, familia, historial_data, indice_seleccionado=-1, parent=None):
+        """'historial_data': historial del Instrumento de core.modelo (Calibracion)"""
         super().__init__(parent)
         self.id_elemento = id_elemento
         self.familia = familia
@@ -181,16 +182,15 @@ class GraficaDetailWindow(QMainWindow):
         """Carga los datos del instrumento desde el JSON"""
         try:
             ruta_json = os.path.join("data/instrumentos", self.familia, self.id_elemento, f"{self.id_elemento}.json")
-            with open(ruta_json, 'r', encoding='utf-8') as f:
-                self.instrument_data = json.load(f)
-                
-            descripcion = self.instrument_data.get('descripcion', 'Sin descripción')
-            rango_min = self.instrument_data.get('rango_min', 0)
-            rango_max = self.instrument_data.get('rango_max', 0)
+            self.instrumento = modelo.cargar_instrumento(ruta_json)
             
-            self.lbl_info.setText(f"{self.id_elemento} - {descripcion} ({rango_min}-{rango_max}mm)")
+            descripcion = self.instrumento.descripcion or 'Sin descripción'
+            self.lbl_info.setText(f"{self.id_elemento} - {descripcion} "
+                                  f"({modelo.formato(self.instrumento.rango_min)}-{modelo.formato(self.instrumento.rango_max)}mm)")
             
         except Exception as e:
+            # Rango por defecto del modelo para poder dibujar el historial recibido
+            self.instrumento = modelo.Instrumento.desde_dict({'id': self.id_elemento})
             # Mostramos un mensaje genérico al usuario; el detalle queda en el log JSON
             self.lbl_info.setText("Error cargando datos del instrumento.")
             from core.logger import get_logger
@@ -275,8 +275,7 @@ class GraficaDetailWindow(QMainWindow):
         
         # Configurar rango del eje X
         try:
-            r_min = float(self.instrument_data.get('rango_min', 0))
-            r_max = float(self.instrument_data.get('rango_max', 100))
+            r_min, r_max = self.instrumento.limites()
             margen = (r_max - r_min) * 0.05 if r_max > r_min else 1
             ax.set_xlim(r_min - margen, r_max + margen)
         except:
@@ -295,27 +294,17 @@ class GraficaDetailWindow(QMainWindow):
             self.indice_seleccionado = len(self.historial_data) - 1
         
         # Preparar datos para esta calibración específica
-        temp_data = {'historial': [calibracion]}
-        x, y_med, y_min, y_max = preparar_datos_velas(temp_data, 0)
+        x, y_med, y_min, y_max = preparar_datos_velas(self.instrumento.con_historial([calibracion]), 0)
         
         if x:
-            fecha = calibracion.get('fecha_calibracion', '')[:10]
-            apto = calibracion.get('apto', True)
+            fecha = calibracion.fecha_dia
+            apto = calibracion.apto
             
             # Preparar datos de incertidumbre para cada punto
             incertidumbres = []
-            for punto in calibracion.get('puntos', []):
-                try:
-                    valor_nom = float(punto.get('valor_nominal', 0))
-                    # Buscar el valor nominal correspondiente en x
-                    if valor_nom in x:
-                        idx = x.index(valor_nom)
-                        incert = float(punto.get('incertidumbre_k2', 0))
-                        incertidumbres.append(incert)
-                    else:
-                        incertidumbres.append(0)
-                except (ValueError, TypeError):
-                    incertidumbres.append(0)
+            for valor_nom, incert in zip(calibracion.nominales, calibracion.incertidumbres):
+                # Buscar el valor nominal correspondiente en x
+                incertidumbres.append(incert if valor_nom in x else 0)
             
             # ORDENAR PUNTOS POR VALOR NOMINAL para evitar problemas con el spline
             if len(x) > 1:
@@ -340,8 +329,7 @@ class GraficaDetailWindow(QMainWindow):
                     import numpy as np
                     
                     # Expandir a todo el rango del instrumento
-                    r_min = float(self.instrument_data.get('rango_min', 0))
-                    r_max = float(self.instrument_data.get('rango_max', 100))
+                    r_min, r_max = self.instrumento.limites()
                     x_expandido = np.linspace(r_min, r_max, 200)
                     
                     # Calcular valores expandidos usando spline manual
@@ -397,20 +385,16 @@ class GraficaDetailWindow(QMainWindow):
         # Estadísticas de la calibración seleccionada
         if self.historial_data and self.indice_seleccionado >= 0:
             calibracion = self.historial_data[self.indice_seleccionado]
-            puntos = calibracion.get('puntos', [])
-            if puntos:
-                errores = [abs(float(p.get('error', 0))) for p in puntos]
-                max_error = max(errores) if errores else 0
+            if len(calibracion):
+                max_error = max(abs(e) for e in calibracion.errores)
                 
                 # Calcular incertidumbre máxima
-                incerts = [float(p.get('incertidumbre_k2', 0)) for p in puntos]
-                max_incert = max(incerts) if incerts else 0
+                max_incert = max(calibracion.incertidumbres)
                 
-                fecha = calibracion.get('fecha_calibracion', '')[:10]
-                apto = calibracion.get('apto', True)
-                estado = "APTO" if apto else "NO APTO"
+                fecha = calibracion.fecha_dia
+                estado = "APTO" if calibracion.apto else "NO APTO"
                 
-                self.lbl_stats.setText(f"Error máx: {max_error:.4f}mm | Incert. máx: {max_incert:.4f}mm | {len(puntos)} puntos | {fecha} | {estado}")
+                self.lbl_stats.setText(f"Error máx: {max_error:.4f}mm | Incert. máx: {max_incert:.4f}mm | {len(calibracion)} puntos | {fecha} | {estado}")
         
         self.canvas.draw()
         
@@ -428,15 +412,12 @@ class GraficaDetailWindow(QMainWindow):
         if not calibracion:
             return
         
-        puntos = calibracion.get('puntos', [])
-        fecha_calibracion = calibracion.get('fecha_calibracion', '')[:10]
+        puntos = calibracion.puntos()
+        fecha_calibracion = calibracion.fecha_dia
         
         # Configurar columnas para mostrar todas las lecturas
         # Primero, determinar el máximo número de lecturas para saber cuántas columnas necesitamos
-        max_lecturas = 0
-        for punto in puntos:
-            lecturas = punto.get('lecturas', [])
-            max_lecturas = max(max_lecturas, len(lecturas))
+        max_lecturas = calibracion.max_lecturas()
         
         # Configurar columnas: Fecha, Nominal, Incertidumbre, + columnas de lecturas
         num_columnas = 3 + max_lecturas
@@ -457,18 +438,17 @@ class GraficaDetailWindow(QMainWindow):
             self.tabla_puntos.setItem(row, 0, QTableWidgetItem(fecha_calibracion))
             
             # Valor Nominal
-            valor_nom = float(punto.get('valor_nominal', 0))
+            valor_nom = punto.valor_nominal
             self.tabla_puntos.setItem(row, 1, QTableWidgetItem(f"{valor_nom:.4f}"))
             
             # Incertidumbre
-            incert = float(punto.get('incertidumbre_k2', 0))
+            incert = punto.incertidumbre_k2
             incert_item = QTableWidgetItem(f"{incert:.4f}")
             self.tabla_puntos.setItem(row, 2, incert_item)
             
             # Todas las lecturas
-            lecturas = punto.get('lecturas', [])
-            for col, lectura in enumerate(lecturas):
-                lectura_val = float(lectura)
+            lecturas = punto.lecturas
+            for col, lectura_val in enumerate(lecturas):
                 lectura_item = QTableWidgetItem(f"{lectura_val:.4f}")
                 
                 # Colorear según desviación del nominal
@@ -1,12 +1,8 @@
-import json
 import sys
 import os
-from base64 import b64encode, b64decode
 from PyQt6.QtWidgets import QDialog, QVBoxLayout, QLineEdit, QPushButton, QLabel, QMessageBox
 from PyQt6.QtCore import Qt
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from core import credenciales
 
 def get_data_path(relative_path):
     """Obtiene la ruta a los datos de la aplicación"""
@@ -19,18 +15,6 @@ def get_data_path(relative_path):
 
 class LoginDialog(QDialog):
     def __init__(self, parent=None):
-        # Configuración de encriptación
-        self.CLAVE_MAESTRA = "METROLOGIA_2024_SECURE_KEY_MASTER"
-        self.salt = b"metrologia_salt_2024"
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=self.salt,
-            iterations=100000,
-        )
-        key = b64encode(kdf.derive(self.CLAVE_MAESTRA.encode()))
-        self.cipher_suite = Fernet(key)
-        
         super().__init__(parent)
         self.setWindowTitle("Acceso Técnico - Metrology Core 2026")
         
@@ -113,68 +97,23 @@ class LoginDialog(QDialog):
 
     def encriptar_password(self, password):
         """Encripta una contraseña usando Fernet (AES)"""
-        if not password or password.startswith("encrypted:"):
-            return password
-        encrypted_password = self.cipher_suite.encrypt(password.encode())
-        return "encrypted:" + b64encode(encrypted_password).decode()
+        return credenciales.encriptar_password(password)
 
     def desencriptar_password(self, password):
         """Desencripta una contraseña usando Fernet (AES)"""
-        if not password or not password.startswith("encrypted:"):
-            return password
-        encrypted_password = password[10:]
-        encrypted_password = b64decode(encrypted_password)
-        decrypted_password = self.cipher_suite.decrypt(encrypted_password)
-        return decrypted_password.decode()
+        return credenciales.desencriptar_password(password)
 
     def validate(self):
         try:
-            with open(get_data_path('config/users.json'), 'r') as f:
-                data = json.load(f)
-                
-                password_ingresada = self.password.text()
-                
-                for u in data['tecnicos']:
-                    if u['username'] == self.username.text():
-                        # Comparar con la contraseña almacenada (puede estar encriptada o no)
-                        password_almacenada = u['password']
-                        if password_almacenada.startswith('encrypted:'):
-                            # Desencriptar la contraseña almacenada y comparar
-                            password_desencriptada = self.desencriptar_password(password_almacenada)
-                            if password_ingresada == password_desencriptada:
-                                u['user_type'] = 'tecnicos'
-                                self.user_data = u
-                                self.accept()
-                                return
-                        else:
-                            # Comparar contraseñas en texto plano (compatibilidad hacia atrás)
-                            if password_ingresada == password_almacenada:
-                                u['user_type'] = 'tecnicos'
-                                self.user_data = u
-                                self.accept()
-                                return
-                
-                for u in data['visor']:
-                    if u['username'] == self.username.text():
-                        # Comparar con la contraseña almacenada (puede estar encriptada o no)
-                        password_almacenada = u['password']
-                        if password_almacenada.startswith('encrypted:'):
-                            # Desencriptar la contraseña almacenada y comparar
-                            password_desencriptada = self.desencriptar_password(password_almacenada)
-                            if password_ingresada == password_desencriptada:
-                                u['user_type'] = 'visor'
-                                self.user_data = u
-                                self.accept()
-                                return
-                        else:
-                            # Comparar contraseñas en texto plano (compatibilidad hacia atrás)
-                            if password_ingresada == password_almacenada:
-                                u['user_type'] = 'visor'
-                                self.user_data = u
-                                self.accept()
-                                return
-                
-                QMessageBox.warning(self, "Error", "Credenciales incorrectas")
+            # Admite contraseñas cifradas y en texto plano (compatibilidad hacia atrás)
+            usuario = credenciales.verificar(self.username.text(), self.password.text(),
+                                             ruta=get_data_path('config/users.json'))
+            if usuario:
+                self.user_data = usuario
+                self.accept()
+                return
+
+            QMessageBox.warning(self, "Error", "Credenciales incorrectas")
         except Exception as e:
             QMessageBox.critical(self, "Error Fatal", f"No se pudo leer users.json: {e}")
     
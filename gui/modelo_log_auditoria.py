@@ -0,0 +1,229 @@
+"""
+Modelo perezoso del log de auditoría para la ventana de Auditoría.
+
+    modelo = ModeloLogAuditoria()
+    vista.setModel(modelo)
+    modelo.cargar(sesiones)        # lista de metrologia_log.json
+
+No crea un item por evento: el nivel superior son las cabeceras de sesión
+(las más recientes primero, en lotes de LOTE_SESIONES al desplazarse) y los
+eventos de una sesión se piden con canFetchMore/fetchMore solo cuando el
+usuario la despliega, en lotes de LOTE_EVENTOS. Textos, iconos y colores se
+calculan en data() para las filas que la vista llega a pintar; lo único que se
+recuerda es si una sesión contiene eventos de seguridad (para su fondo).
+
+mostrar_resultados(registros) cambia a una lista plana con el resultado de
+una búsqueda en core.indice_eventos; cargar() vuelve a la vista por sesiones.
+"""
+
+from PyQt6.QtCore import Qt, QAbstractItemModel, QModelIndex
+from PyQt6.QtGui import QColor
+
+LOTE_SESIONES = 200
+LOTE_EVENTOS = 500
+
+# internalId de las filas de sesión; las de evento guardan fila_sesion + 1
+_RAIZ = 0
+
+COLOR_SEGURIDAD = QColor("#ff8585")      # Rojo pastel
+COLOR_REFIRMADO = QColor("#a2ffaf")      # Verde pastel
+COLOR_VAULT = QColor("#4ec9b0")          # Cyan pastel para vault
+FONDO_SESION_SEGURIDAD = QColor("#5a1d1d")   # Rojo granate muy oscuro y apagado
+FONDO_SESION = QColor("#37373d")             # Gris azulado neutro (tipo Visual Studio)
+TEXTO_SESION = QColor("#b0b0b0")
+
+
+def partir_accion(evento):
+    """(tipo, descripción) de un evento 'TIPO: mensaje'"""
+    accion = evento.get("action", "")
+    if ":" in accion:
+        tipo, desc = accion.split(":", 1)
+    else:
+        tipo, desc = "INFO", accion
+    return tipo.strip(), desc.strip()
+
+
+def es_evento_seguridad(evento):
+    tipo, desc = partir_accion(evento)
+    desc = desc.lower()
+    return (evento.get("level") == "error" or tipo == "SECURITY" or
+            "corrupto" in desc or "incorrecta" in desc)
+
+
+class ModeloLogAuditoria(QAbstractItemModel):
+    COLUMNAS = ["Tiempo / Evento", "Tipo", "Usuario", "Descripción"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._sesiones = []
+        self._visibles = 0          # cabeceras de sesión ya expuestas a la vista
+        self._cargados = []         # eventos expuestos por sesión
+        self._seguridad = {}        # fila de sesión -> contiene eventos de seguridad
+        self._resultados = None     # registros de búsqueda (lista plana) o None
+
+    def cargar(self, sesiones):
+        """Sustituye el contenido por 'sesiones' (en el orden del archivo)"""
+        self.beginResetModel()
+        self._sesiones = list(reversed(sesiones))
+        self._visibles = min(LOTE_SESIONES, len(self._sesiones))
+        self._cargados = [0] * len(self._sesiones)
+        self._seguridad = {}
+        self._resultados = None
+        self.endResetModel()
+
+    def mostrar_resultados(self, registros):
+        """Lista plana de eventos encontrados por core.indice_eventos.consultar"""
+        self.beginResetModel()
+        self._resultados = [({"time": f"{r['fecha']} {r['hora']}", "action": f"{r['tipo']}: {r['mensaje']}"},
+                             r['usuario']) for r in registros]
+        self._visibles = min(LOTE_SESIONES, len(self._resultados))
+        self.endResetModel()
+
+    def filtrado(self):
+        return self._resultados is not None
+
+    def _filas_superiores(self):
+        return self._sesiones if self._resultados is None else self._resultados
+
+    def sesion(self, fila):
+        return self._sesiones[fila]
+
+    def _eventos(self, fila):
+        return self._sesiones[fila].get("events", [])
+
+    def _sesion_con_seguridad(self, fila):
+        marca = self._seguridad.get(fila)
+        if marca is None:
+            marca = any(es_evento_seguridad(ev) for ev in self._eventos(fila))
+            self._seguridad[fila] = marca
+        return marca
+
+    # --- Estructura ---
+
+    def index(self, row, column, parent=QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        if not parent.isValid():
+            return self.createIndex(row, column, _RAIZ)
+        return self.createIndex(row, column, parent.row() + 1)
+
+    def parent(self, index):
+        if not index.isValid() or index.internalId() == _RAIZ:
+            return QModelIndex()
+        return self.createIndex(index.internalId() - 1, 0, _RAIZ)
+
+    def rowCount(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return self._visibles
+        if self._resultados is None and parent.internalId() == _RAIZ and parent.column() == 0:
+            return self._cargados[parent.row()]
+        return 0
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.COLUMNAS)
+
+    def hasChildren(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return bool(self._filas_superiores())
+        if self._resultados is None and parent.internalId() == _RAIZ and parent.column() == 0:
+            return bool(self._eventos(parent.row()))
+        return False
+
+    def canFetchMore(self, parent):
+        if not parent.isValid():
+            return self._visibles < len(self._filas_superiores())
+        if self._resultados is None and parent.internalId() == _RAIZ:
+            return self._cargados[parent.row()] < len(self._eventos(parent.row()))
+        return False
+
+    def fetchMore(self, parent):
+        if not parent.isValid():
+            inicio = self._visibles
+            fin = min(inicio + LOTE_SESIONES, len(self._filas_superiores()))
+            if fin > inicio:
+                self.beginInsertRows(QModelIndex(), inicio, fin - 1)
+                self._visibles = fin
+                self.endInsertRows()
+            return
+        if self._resultados is not None or parent.internalId() != _RAIZ:
+            return
+        fila = parent.row()
+        inicio = self._cargados[fila]
+        fin = min(inicio + LOTE_EVENTOS, len(self._eventos(fila)))
+        if fin > inicio:
+            self.beginInsertRows(parent.siblingAtColumn(0), inicio, fin - 1)
+            self._cargados[fila] = fin
+            self.endInsertRows()
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.COLUMNAS[section]
+        return None
+
+    # --- Datos (calculados al pintar) ---
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if self._resultados is not None:
+            evento, usuario = self._resultados[index.row()]
+            if index.column() == 2:
+                return usuario if role == Qt.ItemDataRole.DisplayRole else None
+            return self._datos_evento(evento, index.column(), role)
+        if index.internalId() == _RAIZ:
+            return self._datos_sesion(index.row(), index.column(), role)
+        fila_sesion = index.internalId() - 1
+        evento = self._eventos(fila_sesion)[index.row()]
+        return self._datos_evento(evento, index.column(), role)
+
+    def _datos_sesion(self, fila, columna, role):
+        if role == Qt.ItemDataRole.DisplayRole:
+            s = self._sesiones[fila]
+            if columna == 0:
+                inicio = s.get("start_time", "").replace("T", " ")
+                return f"📦 Sesión #{s.get('session_number', '?')} - {inicio}"
+            if columna == 1:
+                return "SESIÓN"
+            if columna == 2:
+                return s.get("user", "Sistema")
+            return None
+        if role == Qt.ItemDataRole.BackgroundRole:
+            return FONDO_SESION_SEGURIDAD if self._sesion_con_seguridad(fila) else FONDO_SESION
+        if role == Qt.ItemDataRole.ForegroundRole:
+            # Texto gris claro para que resalte sin sombras
+            return TEXTO_SESION
+        return None
+
+    def _datos_evento(self, evento, columna, role):
+        if role not in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ForegroundRole):
+            return None
+        tipo, desc = partir_accion(evento)
+        desc_lower = desc.lower()
+        seguridad = es_evento_seguridad(evento)
+
+        if role == Qt.ItemDataRole.ForegroundRole:
+            if seguridad:
+                return COLOR_SEGURIDAD if columna == 0 else None
+            if columna != 3:
+                return None
+            if "re-firmado" in desc_lower:
+                return COLOR_REFIRMADO
+            if "hash vault" in desc_lower or "cerrando" in desc_lower:
+                return COLOR_VAULT
+            return None
+
+        if columna == 0:
+            hora = f"  └─ {evento.get('time', '')}"
+            if seguridad:
+                return "⚠️ " + hora
+            if "re-firmado" not in desc_lower and ("hash vault" in desc_lower or "cerrando" in desc_lower):
+                if "cerrando app" in desc_lower:
+                    return "🔐 " + hora      # Cierre de app
+                if "cerrando sesión" in desc_lower:
+                    return "🔒 " + hora      # Cierre de sesión
+            return hora
+        if columna == 1:
+            return tipo
+        if columna == 3:
+            return desc
+        return None
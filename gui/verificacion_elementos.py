@@ -0,0 +1,89 @@
+"""
+Verificación de integridad de elementos en segundo plano durante el arranque.
+
+El hilo recorre data/ una sola vez (core.escaner): con esa lectura regenera
+los índices y después verifica el vault sin volver a abrir los JSON; la ventana principal
+recibe el avance por señales (agrupadas cada ~100 ms para no saturar el bucle
+de eventos) y solo retiene las escrituras sobre activos aún no verificados.
+"""
+
+import time
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from core.indices import generar_indices
+from core.escaner import escanear
+from core.seguridad import cargar_vault_hashes
+from core.verificacion import iterar_verificacion, id_activo_de_clave
+
+INTERVALO_AVISO_S = 0.1
+
+
+class VerificacionElementosWorker(QThread):
+    indices_listos = pyqtSignal(bool)
+    progreso = pyqtSignal(int, int)           # verificados, total
+    lote_verificado = pyqtSignal(list)        # IDs de activo ya verificados
+    terminado = pyqtSignal(list)              # IDs comprometidos
+    error = pyqtSignal(str)                   # la verificación no pudo completarse
+
+    def __init__(self, base_data, regenerar_indices=True, parent=None):
+        super().__init__(parent)
+        self.base_data = base_data
+        self.regenerar_indices = regenerar_indices
+
+    def run(self):
+        comprometidos = []
+        indices_avisados = not self.regenerar_indices
+        try:
+            escaneo = escanear(self.base_data, indexar=self.regenerar_indices)
+            if self.regenerar_indices:
+                try:
+                    generar_indices(escaneo, self.base_data)
+                    self.indices_listos.emit(True)
+                except Exception:
+                    self.indices_listos.emit(False)
+                indices_avisados = True
+            self._verificar(escaneo, comprometidos)
+        except Exception as e:
+            if not indices_avisados:
+                self.indices_listos.emit(False)
+            self.error.emit(str(e))
+        finally:
+            # Sin 'terminado' la ventana principal seguiría reteniendo escrituras
+            self.terminado.emit(comprometidos)
+
+    def _verificar(self, escaneo, comprometidos):
+        vault = cargar_vault_hashes()
+        # Claves que faltan por verificar de cada activo: un activo entra en el
+        # lote solo cuando se han verificado todas ('<ID>' y '<ID>@adjuntos')
+        # y ninguna ha fallado
+        pendientes = {}
+        for clave in vault:
+            id_activo = id_activo_de_clave(clave)
+            pendientes[id_activo] = pendientes.get(id_activo, 0) + 1
+        fallidos = set()
+        lote = []
+        hechos = 0
+        ultimo_aviso = time.monotonic()
+        for clave, estado, total in iterar_verificacion(self.base_data, vault=vault, rutas=escaneo["rutas"],
+                                                        hashes=escaneo["hashes"]):
+            if self.isInterruptionRequested():
+                return
+            hechos += 1
+            id_activo = id_activo_de_clave(clave)
+            if estado is False and id_activo not in fallidos:
+                fallidos.add(id_activo)
+                comprometidos.append(id_activo)
+            pendientes[id_activo] -= 1
+            if pendientes[id_activo] == 0 and id_activo not in fallidos:
+                lote.append(id_activo)
+
+            ahora = time.monotonic()
+            if ahora - ultimo_aviso >= INTERVALO_AVISO_S:
+                self.lote_verificado.emit(lote)
+                self.progreso.emit(hechos, total)
+                lote = []
+                ultimo_aviso = ahora
+
+        if lote:
+            self.lote_verificado.emit(lote)
+        self.progreso.emit(hechos, hechos)
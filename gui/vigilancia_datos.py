@@ -0,0 +1,128 @@
+"""
+Vigilancia de la carpeta data/ para mantener índices, caché de hashes y
+vistas al día tras cambios externos.
+
+Usa QFileSystemWatcher (inotify en Linux) sobre las carpetas y archivos de
+activos y agrupa las notificaciones con un temporizador antes de comparar
+solo las carpetas afectadas. Si el número de rutas supera el límite de
+vigilancia del sistema, pasa a sondeo periódico con la misma comparación.
+"""
+
+import os
+from PyQt6.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+
+from core.vigilancia import InstantaneaDatos, RAMAS
+
+# inotify admite por defecto 8192 vigilancias por usuario; se deja margen
+LIMITE_RUTAS_VIGILADAS = 6000
+RETARDO_AGRUPACION_MS = 400
+INTERVALO_SONDEO_MS = 5000
+
+
+class VigilanciaDatos(QObject):
+    """Emite 'cambios' con la lista [(tipo, ruta), ...] ya agrupada y filtrada"""
+
+    cambios = pyqtSignal(list)
+
+    def __init__(self, ruta_data, parent=None, limite_rutas=LIMITE_RUTAS_VIGILADAS):
+        super().__init__(parent)
+        self.ruta_data = os.path.abspath(ruta_data)
+        self.limite_rutas = limite_rutas
+        self.instantanea = InstantaneaDatos(self.ruta_data)
+        self.instantanea.capturar()
+        self._pendientes = set()
+
+        self._temporizador = QTimer(self)
+        self._temporizador.setSingleShot(True)
+        self._temporizador.setInterval(RETARDO_AGRUPACION_MS)
+        self._temporizador.timeout.connect(self._procesar)
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self._on_directorio)
+        self.watcher.fileChanged.connect(self._on_archivo)
+
+        rutas = self._rutas_a_vigilar()
+        if len(rutas) <= self.limite_rutas:
+            self.modo = 'eventos'
+            self.watcher.addPaths(rutas)
+        else:
+            # Demasiadas rutas: se vigila solo la estructura de familias y se sondea el resto
+            self.modo = 'sondeo'
+            self.watcher.addPaths(self._carpetas_estructura())
+            self._sondeo = QTimer(self)
+            self._sondeo.setInterval(INTERVALO_SONDEO_MS)
+            self._sondeo.timeout.connect(self._on_sondeo)
+            self._sondeo.start()
+
+    def _carpetas_estructura(self):
+        """data/, cada rama y cada familia"""
+        carpetas = [self.ruta_data]
+        for rama in RAMAS:
+            ruta_rama = os.path.join(self.ruta_data, rama)
+            if not os.path.isdir(ruta_rama):
+                continue
+            carpetas.append(ruta_rama)
+            for familia in os.listdir(ruta_rama):
+                ruta_familia = os.path.join(ruta_rama, familia)
+                if os.path.isdir(ruta_familia):
+                    carpetas.append(ruta_familia)
+        return carpetas
+
+    def _rutas_a_vigilar(self):
+        """Estructura + carpetas de cada activo + sus archivos JSON y manifiestos"""
+        rutas = set(self._carpetas_estructura())
+        for carpeta in self.instantanea.carpetas():
+            rutas.add(carpeta)
+        rutas.update(self.instantanea.rutas())
+        return sorted(rutas)
+
+    def _programar(self, carpeta):
+        self._pendientes.add(carpeta)
+        self._temporizador.start()
+
+    def _on_directorio(self, ruta):
+        self._programar(ruta)
+
+    def _on_archivo(self, ruta):
+        self._programar(os.path.dirname(ruta))
+
+    def _on_sondeo(self):
+        self._programar(self.ruta_data)
+
+    def _procesar(self):
+        pendientes, self._pendientes = self._pendientes, set()
+        cambios = self.instantanea.comparar_directorios(pendientes)
+
+        # Reponer vigilancias: las escrituras atómicas (os.replace) cambian el
+        # inodo y el watcher deja de seguir el archivo antiguo
+        vigiladas = set(self.watcher.files()) | set(self.watcher.directories())
+        nuevas = []
+        for carpeta in pendientes:
+            if os.path.isdir(carpeta) and carpeta not in vigiladas:
+                nuevas.append(carpeta)
+            if os.path.isdir(carpeta):
+                for nombre in os.listdir(carpeta):
+                    sub = os.path.join(carpeta, nombre)
+                    if os.path.isdir(sub) and sub not in vigiladas and self.modo == 'eventos':
+                        nuevas.append(sub)
+        if self.modo == 'eventos':
+            for _, ruta in cambios:
+                if os.path.exists(ruta) and ruta not in vigiladas:
+                    nuevas.append(ruta)
+                if os.path.dirname(ruta) not in vigiladas and os.path.isdir(os.path.dirname(ruta)):
+                    nuevas.append(os.path.dirname(ruta))
+        nuevas = [r for r in dict.fromkeys(nuevas) if r not in vigiladas]
+        if nuevas and len(vigiladas) + len(nuevas) <= self.limite_rutas:
+            self.watcher.addPaths(nuevas)
+
+        if cambios:
+            self.cambios.emit(cambios)
+
+    def detener(self):
+        """Deja de vigilar (al cerrar la aplicación)"""
+        self._temporizador.stop()
+        if hasattr(self, '_sondeo'):
+            self._sondeo.stop()
+        rutas = self.watcher.files() + self.watcher.directories()
+        if rutas:
+            self.watcher.removePaths(rutas)
@@ -2,21 +2,27 @@ import sys
 import os
 import json
 import hashlib
-from PyQt6.QtWidgets import QMainWindow, QApplication, QVBoxLayout, QWidget, QDockWidget, QTreeView, QInputDialog, QFileDialog, QPushButton, QScrollArea, QFrame, QGridLayout, QLabel, QTextEdit, QMessageBox, QDialog, QHeaderView, QHBoxLayout, QStackedWidget, QGraphicsBlurEffect, QTableWidget, QTableWidgetItem, QComboBox, QTabWidget, QButtonGroup
+from PyQt6.QtWidgets import QMainWindow, QApplication, QVBoxLayout, QWidget, QDockWidget, QTreeView, QInputDialog, QFileDialog, QPushButton, QScrollArea, QFrame, QGridLayout, QLabel, QTextEdit, QMessageBox, QDialog, QHeaderView, QHBoxLayout, QStackedWidget, QGraphicsBlurEffect, QTableWidget, QTableWidgetItem, QComboBox, QTabWidget, QButtonGroup, QProgressBar, QTreeWidget, QTreeWidgetItem
 from PyQt6.QtGui import QFileSystemModel, QColor
-from PyQt6.QtCore import Qt, QSortFilterProxyModel
-from datetime import datetime, timedelta
-from dateutil.relativedelta import relativedelta
+from PyQt6.QtCore import Qt, QSortFilterProxyModel, QTimer
+from datetime import datetime
 from gui.styles import STYLE_SHEET
 from gui.login_dialog import LoginDialog
-from gui.gestion_usuarios import GestionUsuariosDialog
 from gui.element_window import ElementWindow
-from fpdf import FPDF
-from core.pdf_generator import exportar_a_pdf
 from core.logger import init_logger, get_logger
-from core.seguridad import generar_hash_archivo, generar_y_guardar_hash_vault, verificar_integridad_archivo_vault, cargar_vault_hashes, obtener_ruta_vault, verificar_session_counter, generar_vault_completo
-from gui.auditoria import VentanaAuditoria
-import qtawesome as qta
+from core.seguridad import generar_hash_archivo, generar_y_guardar_hash_vault, verificar_integridad_archivo_vault, cargar_vault_hashes, obtener_ruta_vault, verificar_session_counter, generar_vault_completo, verificar_raiz_vault, generar_hash_archivo_cacheado, invalidar_cache_hashes, compactar_vault
+from core.indices import actualizar_indices
+from core.guardado import guardar_activo
+from core.documentos import cargar_documento, copia_documento, copia_mutable
+from core.serializacion import cargar_archivo
+from core.vigilancia import describir_ruta, BAJA, MODIFICACION
+from core import registro_ids, vencimientos, modelo
+from gui.vigilancia_datos import VigilanciaDatos
+from gui.verificacion_elementos import VerificacionElementosWorker
+from core.verificacion import iterar_verificacion, id_activo_de_clave
+from core.adjuntos import registrar_adjunto, NOMBRE_MANIFIESTO
+from core.usuarios import get_directorio
+from core.perfilado import medir
 from PyQt6.QtWidgets import QFileIconProvider
 import statistics
 import shutil
@@ -25,8 +31,7 @@ def actualizar_hash_vault_en_log(hash_vault_actual, logger=None):
     """Actualiza el último registro de hash del vault en el log"""
     try:
         ruta_log = 'metrologia_log.json'
-        with open(ruta_log, 'r', encoding='utf-8') as f:
-            log_data = json.load(f)
+        log_data = cargar_archivo(ruta_log)
         
         # Buscar la última sesión y actualizar su hash del vault
         if log_data:
@@ -104,8 +109,7 @@ def obtener_ultimo_hash_vault_del_log():
         if not os.path.exists(ruta_log):
             return None
             
-        with open(ruta_log, 'r', encoding='utf-8') as f:
-            log_data = json.load(f)
+        log_data = cargar_archivo(ruta_log)
         
         # Buscar el último registro de hash del vault
         for sesion in reversed(log_data):
@@ -140,43 +144,36 @@ def get_data_path(relative_path):
         # Modo desarrollo
         return os.path.join(os.path.abspath("."), relative_path)
 
-def guardar_json_con_hash(ruta, datos, id_elemento=None):
+def guardar_json_con_hash(ruta, datos, id_elemento=None, evento=None):
     """
     Guarda un archivo JSON con parámetros estandarizados y genera su hash automáticamente
+    (escritura atómica, vault, índice y evento de auditoría: ver core.guardado)
     
     Args:
         ruta: Ruta del archivo JSON a guardar
         datos: Datos a guardar
         id_elemento: ID del elemento (opcional, se extrae del nombre si no se proporciona)
+        evento: (tipo, mensaje[, nivel]) para el log de auditoría (opcional)
     
     Returns:
         bool: True si se guardó y generó hash correctamente, False si hubo error
     """
-    try:
-        # Guardar JSON con parámetros estandarizados
-        with open(ruta, 'w', encoding='utf-8') as f:
-            json.dump(datos, f, indent=4, ensure_ascii=False, sort_keys=True)
-        
-        # Extraer ID si no se proporcionó
-        if id_elemento is None:
-            id_elemento = os.path.basename(ruta).replace('.json', '')
-        
-        # Generar y guardar hash
-        return generar_y_guardar_hash_vault(ruta, id_elemento)
-        
-    except Exception as e:
-        self.log(f"Error guardando JSON con hash: {e}")
-        return False
+    with medir("json.guardar_activo"):
+        ok, detalle = guardar_activo(ruta, datos, id_elemento, evento=evento)
+    if not ok:
+        get_logger().log_error('GUARDADO', f"Error guardando JSON con hash: {detalle}")
+    return ok
 sys.path.append(get_resource_path('core'))
 try:
-    from indices import generar_indices
+    from core.indices import generar_indices
 except ImportError:
     generar_indices = None
 
 class VentanaPuntos(QDialog):
     # ***<module>.VentanaPuntos: Failure: Different bytecode
-    def __init__(self, puntos, calibracion_info=None, parent=None):
+    def __init__(self, calibracion, parent=None):
         # ***<module>.VentanaPuntos.__init__: Failure: Compilation Error
+        """'calibracion': Calibracion de core.modelo"""
         super().__init__(parent)
         
         # Configurar tamaño inicial y título
@@ -187,15 +184,15 @@ class VentanaPuntos(QDialog):
         layout.setContentsMargins(20, 20, 20, 20) # Espaciado pro
         
         # Determinar si es APTO para el estilo
-        es_apto = calibracion_info.get('apto', True)
+        es_apto = calibracion.apto
         color_borde = "#569cd6" if es_apto else "#f44336" # Azul o Rojo
         status_text = "CONFORME" if es_apto else "NO CONFORME"
         info_text = f"""
             <div style="background-color: #2d2d30; padding: 15px; border: 2px solid {color_borde}; border-radius: 6px; margin-bottom: 10px;">
                 <table width="100%">
                     <tr>
-                        <td><span style="color: #569cd6; font-weight: bold;">FECHA:</span> <span style="color: #d4d4d4;">{calibracion_info.get('fecha_calibracion', 'N/A')}</span></td>
-                        <td><span style="color: #569cd6; font-weight: bold;">RESPONSABLE:</span> <span style="color: #d4d4d4;">{calibracion_info.get('responsable', 'N/A')}</span></td>
+                        <td><span style="color: #569cd6; font-weight: bold;">FECHA:</span> <span style="color: #d4d4d4;">{calibracion.fecha or 'N/A'}</span></td>
+                        <td><span style="color: #569cd6; font-weight: bold;">RESPONSABLE:</span> <span style="color: #d4d4d4;">{calibracion.responsable}</span></td>
                         <td align="right"><span style="color: {color_borde}; font-weight: bold; font-size: 14px;">ESTADO: {status_text}</span></td>
                     </tr>
                 </table>
@@ -207,15 +204,7 @@ class VentanaPuntos(QDialog):
         layout.addWidget(info_label)
         self.tabla = QTableWidget()
         # Determinar el número máximo de lecturas para configurar columnas
-        max_lecturas = 0
-        for p in puntos:
-            lecturas_raw = p.get('lecturas', [])
-            if isinstance(lecturas_raw, str):
-                limpio = lecturas_raw.replace('[', '').replace(']', '').strip()
-                lecturas_lista = [x.strip() for x in limpio.split(',') if x.strip()]
-                max_lecturas = max(max_lecturas, len(lecturas_lista))
-            else:
-                max_lecturas = max(max_lecturas, len(lecturas_raw))
+        max_lecturas = calibracion.max_lecturas()
         
         # Configurar columnas: fijas + dinámicas para lecturas
         total_columnas = 5 + max_lecturas  # 5 fijas + N lecturas
@@ -236,42 +225,23 @@ class VentanaPuntos(QDialog):
             header.setSectionResizeMode(i, QHeaderView.ResizeMode.Stretch)
         self.tabla.setStyleSheet('\n            QTableWidget { \n                background-color: #252526; \n                gridline-color: #3e3e42; \n                border: 1px solid #3e3e42; \n            }\n            QHeaderView::section {\n                background-color: #333333;\n                color: #d4d4d4;\n                border: 1px solid #3e3e42;\n                padding: 4px;\n            }\n        ')
         # Establecer el número de filas
-        self.tabla.setRowCount(len(puntos))
+        self.tabla.setRowCount(len(calibracion))
         
-        for i, p in enumerate(puntos):
-            lecturas_raw = p.get('lecturas', [])
-            media = 0.0
-            error = 0.0
-            lecturas_lista = []
-            
-            try:
-                if isinstance(lecturas_raw, str):
-                    limpio = lecturas_raw.replace('[', '').replace(']', '').strip()
-                    lista_nums = [float(x) for x in limpio.split(',') if x.strip()]
-                    lecturas_lista = [x.strip() for x in limpio.split(',') if x.strip()]
-                else:
-                    lista_nums = [float(x) for x in lecturas_raw]
-                    lecturas_lista = [str(x) for x in lecturas_raw]
-                    
-                nominal = float(p.get('valor_nominal', 0))
-                media = statistics.mean(lista_nums) if lista_nums else nominal
-                error = media - nominal
-            except (ValueError, TypeError):
-                media = p.get('media', 0.0)
-                error = p.get('error', 0.0)
-                lecturas_lista = []
+        for i, p in enumerate(calibracion.puntos()):
+            # Media y error recalculados desde las lecturas
+            media = statistics.fmean(p.lecturas) if p.lecturas else p.valor_nominal
+            error = media - p.valor_nominal
             
             # Llenar columnas fijas
-            self.tabla.setItem(i, 0, QTableWidgetItem(str(p.get('id_patron', ''))))
-            self.tabla.setItem(i, 1, QTableWidgetItem(str(p.get('valor_nominal', ''))))
+            self.tabla.setItem(i, 0, QTableWidgetItem(p.id_patron))
+            self.tabla.setItem(i, 1, QTableWidgetItem(f'{p.valor_nominal:g}'))
             self.tabla.setItem(i, 2, QTableWidgetItem(f'{media:.4f}'))
             self.tabla.setItem(i, 3, QTableWidgetItem(f'{error:.4f}'))
-            self.tabla.setItem(i, 4, QTableWidgetItem(str(p.get('incertidumbre_k2', ''))))
+            self.tabla.setItem(i, 4, QTableWidgetItem(f'{p.incertidumbre_k2:g}'))
             
             # Llenar columnas de lecturas individuales
-            for j, lectura in enumerate(lecturas_lista):
-                if j < max_lecturas:  # No exceder el número de columnas configuradas
-                    self.tabla.setItem(i, 5 + j, QTableWidgetItem(str(lectura)))
+            for j, lectura in enumerate(p.lecturas):
+                self.tabla.setItem(i, 5 + j, QTableWidgetItem(f'{lectura:g}'))
         
         layout.addWidget(self.tabla)
         
@@ -283,6 +253,9 @@ class VentanaPuntos(QDialog):
 
 class VSCIconProvider(QFileIconProvider):
     def icon(self, info):
+        # qtawesome se carga con el primer icono pintado, no al importar main
+        import qtawesome as qta
+
         # 1. CARPETAS
         if info.isDir():
             # Usamos un azul estilo VS Code para las carpetas
@@ -351,33 +324,20 @@ class MetrologiaApp(QMainWindow):
     def __init__(self):
         super().__init__()
         
-        # 1. Inicialización de datos y Logger
-        if generar_indices:
-            try:
-                generar_indices()
-            except Exception as e:
-                self.log(f'Error al refrescar índices: {e}')
-        
+        # 1. Logger y estado de sesión (las verificaciones pesadas se difieren
+        #    hasta después del primer pintado, ver arranque_diferido)
         self.logger = init_logger()
         
-        # Verificar integridad del log al iniciar
-        if not self.verificar_integridad_log():
-            # Si el usuario eligió "No" en el modal, cerrar la aplicación
-            self._salida_por_error_verificacion = True
-            self.close()
-            sys.exit()
-        
-        # Verificar integridad del número de sesión
-        if not self.verificar_numero_sesion():
-            # Si el usuario eligió "No" en el modal, cerrar la aplicación
-            self._salida_por_error_verificacion = True
-            self.close()
-            sys.exit()
-        
         self.current_user = None
         self.current_user_data = None
         self.user_type = None
         self.current_familia = None
+        self.vigilancia_datos = None
+        self.worker_verificacion = None
+        self._verificacion_en_curso = False
+        self._activos_verificados = set()
+        self._indices_listos = False
+        self._rutas_indice_pendientes = []
         
         # 2. Configuración Visual
         self.setWindowTitle('METROLOGY CORE 2026')
@@ -430,13 +390,42 @@ class MetrologiaApp(QMainWindow):
         
         self.refresh_bento_view()
         
+        # 4.2. Barra de progreso de la verificación en segundo plano
+        self.barra_verificacion = QProgressBar()
+        self.barra_verificacion.setMaximumWidth(320)
+        self.barra_verificacion.setFormat('Verificando integridad %v/%m')
+        self.barra_verificacion.hide()
+        self.statusBar().addPermanentWidget(self.barra_verificacion)
+        
         self.tab_widget.currentChanged.connect(self.actualizar_menu_contextual)
         self.showMaximized()
 
-        # 5. LÓGICA DE LOGIN (Aquí estaba el fallo de 'is None')
+        # 5. Efecto borroso hasta el login; el resto del arranque se ejecuta
+        #    con la ventana ya pintada
         self.efecto_borroso = QGraphicsBlurEffect()
         self.efecto_borroso.setBlurRadius(15)
         self.setGraphicsEffect(self.efecto_borroso)
+        
+        QTimer.singleShot(0, self.arranque_diferido)
+
+    def arranque_diferido(self):
+        """
+        Segunda fase del arranque, con la interfaz ya visible:
+        verificación del log y la sesión, login y verificación de elementos en segundo plano.
+        """
+        # Verificar integridad del log al iniciar
+        if not self.verificar_integridad_log():
+            # Si el usuario eligió "No" en el modal, cerrar la aplicación
+            self._salida_por_error_verificacion = True
+            self.salir_aplicacion()
+            return
+        
+        # Verificar integridad del número de sesión
+        if not self.verificar_numero_sesion():
+            # Si el usuario eligió "No" en el modal, cerrar la aplicación
+            self._salida_por_error_verificacion = True
+            self.salir_aplicacion()
+            return
 
         login_dialog = LoginDialog(self)
         # CORRECCIÓN: exec() devuelve 1 (True) si el login fue exitoso
@@ -456,17 +445,15 @@ class MetrologiaApp(QMainWindow):
             else:
                 self.log('[ERROR] No se pudo incrementar la sesión')
             
-            # 6. Verificar integridad individual de elementos DESPUÉS del login
-            self.log('[INFO] Verificando integridad de elementos individuales...')
-            elementos_comprometidos = self.verificar_integridad_elementos_al_inicio()
-            
-            if elementos_comprometidos:
-                self.mostrar_ventana_elementos_comprometidos(elementos_comprometidos)
-            
             # Quitar efecto borroso al entrar
             self.setGraphicsEffect(None)
             if hasattr(self, 'console') and self.console is not None:
                 self.console.clear()
+            
+            # 6. Índices y verificación de elementos en segundo plano; la
+            #    vigilancia de data/ arranca a la vez
+            self.iniciar_verificacion_elementos()
+            self.iniciar_vigilancia_datos()
 
             if self.current_user == 'admin':
                 self.log('[ADMIN] Detectado acceso de administrador.')
@@ -483,13 +470,110 @@ class MetrologiaApp(QMainWindow):
             self.logger.log_navigation('Login', 'Panel Principal', self.current_user)
         else:
             # Si cancela el login, cerramos la app
-            self.close()
-            sys.exit()   
+            self.salir_aplicacion()
+
+    def salir_aplicacion(self):
+        """Cierra la ventana y termina el bucle de eventos (sin sys.exit dentro de un slot)"""
+        self.close()
+        QApplication.instance().exit(0)
+
+    def iniciar_verificacion_elementos(self):
+        """Lanza la regeneración de índices y la verificación de elementos en un hilo"""
+        self.log('[INFO] Verificando integridad de elementos individuales en segundo plano...')
+        self._verificacion_en_curso = True
+        self._activos_verificados = set()
+        self._comprometidos_inicio = []
+        # Sin generar_indices disponible no hay regeneración que esperar
+        self._indices_listos = not generar_indices
+        
+        self.worker_verificacion = VerificacionElementosWorker(get_data_path('data'), regenerar_indices=bool(generar_indices), parent=self)
+        self.worker_verificacion.indices_listos.connect(self.on_indices_listos)
+        self.worker_verificacion.progreso.connect(self.on_progreso_verificacion)
+        self.worker_verificacion.lote_verificado.connect(self._activos_verificados.update)
+        self.worker_verificacion.error.connect(self.on_error_verificacion)
+        self.worker_verificacion.terminado.connect(self.on_verificacion_terminada)
+        self.barra_verificacion.setRange(0, 0)
+        self.barra_verificacion.show()
+        self.worker_verificacion.start()
+
+    def on_indices_listos(self, ok):
+        if not ok:
+            self.log('[ERROR] Error al refrescar índices')
+        self._indices_listos = True
+        # Cambios llegados mientras se regeneraban los índices
+        if self._rutas_indice_pendientes:
+            try:
+                actualizar_indices(self._rutas_indice_pendientes, base=get_data_path('data'))
+            except Exception as e:
+                self.log(f'[ERROR] No se pudieron actualizar los índices: {e}')
+            self._rutas_indice_pendientes = []
+        if hasattr(self, 'tabla_proximos'):
+            self.actualizar_tabla_proximos()
+
+    def on_progreso_verificacion(self, hechos, total):
+        self.barra_verificacion.setRange(0, max(total, 1))
+        self.barra_verificacion.setValue(hechos)
+
+    def on_error_verificacion(self, detalle):
+        self.log(f'[ERROR] No se pudo completar la verificación de elementos: {detalle}')
+
+    def on_verificacion_terminada(self, elementos_comprometidos):
+        self._verificacion_en_curso = False
+        self.barra_verificacion.hide()
+        
+        # Los comprometidos detectados antes por una escritura ya se gestionaron en su momento
+        pendientes = [e for e in elementos_comprometidos if e not in self._comprometidos_inicio]
+        if pendientes:
+            for id_elemento in pendientes[:5]:
+                self.log(f'[SECURITY] ⚠️ Elemento comprometido: {id_elemento}')
+            if len(pendientes) > 5:
+                # Limitar a 5 elementos para no saturar
+                self.log('[WARNING] Demasiados elementos comprometidos, mostrando solo los primeros 5')
+            self.log(f'[SECURITY] 🚨 Se detectaron {len(pendientes)} elementos comprometidos')
+            self.mostrar_ventana_elementos_comprometidos(pendientes[:5])
+        else:
+            self.log('[INFO] Todos los elementos tienen integridad verificada')
+
+    def detener_verificacion_en_curso(self):
+        """Interrumpe el hilo de verificación (al cerrar la aplicación)"""
+        worker = getattr(self, 'worker_verificacion', None)
+        if worker is not None and worker.isRunning():
+            worker.requestInterruption()
+            worker.wait()
+
+    def _ruta_json_actual(self):
+        """Ruta del JSON del activo abierto en la ficha"""
+        tipo = getattr(self, 'current_tipo', 'instrumentos')
+        return get_data_path(os.path.join('data', tipo, self.current_familia, self.current_elemento_id, f'{self.current_elemento_id}.json'))
+
+    def asegurar_activo_verificado(self, id_elemento, ruta_json, tipo_elemento='elemento'):
+        """
+        Retiene una escritura sobre un activo cuya verificación de arranque no ha
+        terminado: se verifica en el momento (un solo archivo) en lugar de
+        bloquear el resto de la aplicación.
+
+        Returns:
+            True si se puede escribir
+        """
+        if not self._verificacion_en_curso or id_elemento in self._activos_verificados:
+            return True
+        self.log(f'[INFO] {id_elemento} aún no verificado - verificando antes de modificar')
+        continuar = self.verificar_integridad_elemento(ruta_json, id_elemento, tipo_elemento)
+        if continuar:
+            self._activos_verificados.add(id_elemento)
+        else:
+            self._comprometidos_inicio.append(id_elemento)
+        return continuar
 
     def closeEvent(self, event):
         """Versión corregida: El visor cierra legítimamente pero preserva problemas del vault"""
         import time
         try:
+            # La verificación en segundo plano no debe competir con la regeneración del vault
+            self.detener_verificacion_en_curso()
+            if self.vigilancia_datos is not None:
+                self.vigilancia_datos.detener()
+            
             # Si somos visor, cerramos legítimamente PERO preservando problemas existentes
             es_visor = getattr(self, 'user_type', '').lower() == 'visor'
             
@@ -529,6 +613,8 @@ class MetrologiaApp(QMainWindow):
                     self.logger.log_hash_vault(hash_vault, total_elementos, "SESION")
             else:
                 self.log('[WARNING] Hay discrepancia previa - NO se actualizan hashes de datos para proteger integridad')
+                # Los guardados de esta sesión sí se consolidan en el vault
+                compactar_vault()
             
             # 2. Usuarios NO visores sellan el log
             ruta_log = 'metrologia_log.json'
@@ -555,6 +641,8 @@ class MetrologiaApp(QMainWindow):
             event.accept()
 
     def mostrar_ventana_discrepancia_hash(self, titulo, mensaje_principal, mensaje_secundario, tipo_elemento=None, id_elemento=None):
+        import qtawesome as qta
+
         msg_box = QMessageBox(self)
         
         # Usamos shield-alt con un color naranja-amarillo para dar sensación de alerta de seguridad
@@ -651,8 +739,7 @@ class MetrologiaApp(QMainWindow):
             if not os.path.exists(ruta_log):
                 return False
                 
-            with open(ruta_log, 'r', encoding='utf-8') as f:
-                log_data = json.load(f)
+            log_data = cargar_archivo(ruta_log)
             
             # Buscar el último evento de la última sesión
             if log_data and len(log_data) > 0:
@@ -825,46 +912,64 @@ class MetrologiaApp(QMainWindow):
         else:
             self.log(f'[INFO] Vault íntegro ({len(vault)} elementos)')
         
-        # 4. Verificar hash del vault contra el guardado en el log
-        hash_vault_actual = generar_hash_vault()
-        hash_vault_log = obtener_ultimo_hash_vault_del_log()
-        
-        if hash_vault_actual and hash_vault_log:
-            if hash_vault_log.endswith('...'):
-                # Hash truncado del log - comparar primeros 16 caracteres
-                if hash_vault_actual.startswith(hash_vault_log.replace('...', '')):
-                    self.log('[INFO] Integridad del vault verificada contra log')
-                else:
-                    self.log('[SECURITY] ⚠️ DISCREPANCIA: Vault modificado externamente')
-                    self.log(f'[SECURITY] Hash guardado: {hash_vault_log}')
-                    self.log(f'[SECURITY] Hash actual: {hash_vault_actual[:16]}...')
+        # 4. Verificar la raíz de Merkle del vault contra la registrada en el log
+        raiz_ok, raiz_actual, raiz_log = verificar_raiz_vault()
+        if raiz_ok:
+            self.log(f'[INFO] Integridad del vault verificada contra log (raíz Merkle {raiz_log[:16]}...)')
+        elif raiz_ok is False:
+            self.log('[SECURITY] ⚠️ DISCREPANCIA: Vault modificado externamente')
+            self.log(f'[SECURITY] Raíz guardada: {raiz_log[:16]}...')
+            self.log(f'[SECURITY] Raíz actual: {(raiz_actual or "árbol inexistente")[:16]}...')
+            resultado = self.mostrar_ventana_discrepancia_hash(
+                titulo="🚨 VAULT COMPROMETIDO",
+                mensaje_principal="Se ha detectado manipulación del vault de hashes",
+                mensaje_secundario=f"El vault ha sido modificado externamente entre sesiones.\n\nRaíz anterior: {raiz_log[:16]}...\nRaíz actual: {(raiz_actual or 'árbol inexistente')[:16]}...\n\nUse 'Escanear sistema' en Auditoría para localizar las familias y activos afectados.\n\n¿Desea continuar bajo su propio riesgo?",
+                tipo_elemento='vault'
+            )
+            
+            if resultado == 'cancelar':
+                return False
+        else:
+            # Log anterior al árbol de Merkle: comparación con el hash del archivo vault
+            hash_vault_actual = generar_hash_vault()
+            hash_vault_log = obtener_ultimo_hash_vault_del_log()
+        
+            if hash_vault_actual and hash_vault_log:
+                if hash_vault_log.endswith('...'):
+                    # Hash truncado del log - comparar primeros 16 caracteres
+                    if hash_vault_actual.startswith(hash_vault_log.replace('...', '')):
+                        self.log('[INFO] Integridad del vault verificada contra log')
+                    else:
+                        self.log('[SECURITY] ⚠️ DISCREPANCIA: Vault modificado externamente')
+                        self.log(f'[SECURITY] Hash guardado: {hash_vault_log}')
+                        self.log(f'[SECURITY] Hash actual: {hash_vault_actual[:16]}...')
                     
-                    resultado = self.mostrar_ventana_discrepancia_hash(
-                        titulo="🚨 VAULT COMPROMETIDO",
-                        mensaje_principal="Se ha detectado manipulación del vault de hashes",
-                        mensaje_secundario=f"El vault ha sido modificado externamente entre sesiones.\n\nHash anterior: {hash_vault_log}\nHash actual: {hash_vault_actual[:16]}...\n\nEsto podría indicar manipulación maliciosa de archivos de datos.\n\n¿Desea continuar bajo su propio riesgo?",
-                        tipo_elemento='vault'
-                    )
+                        resultado = self.mostrar_ventana_discrepancia_hash(
+                            titulo="🚨 VAULT COMPROMETIDO",
+                            mensaje_principal="Se ha detectado manipulación del vault de hashes",
+                            mensaje_secundario=f"El vault ha sido modificado externamente entre sesiones.\n\nHash anterior: {hash_vault_log}\nHash actual: {hash_vault_actual[:16]}...\n\nEsto podría indicar manipulación maliciosa de archivos de datos.\n\n¿Desea continuar bajo su propio riesgo?",
+                            tipo_elemento='vault'
+                        )
                     
-                    if resultado == 'cancelar':
-                        return False
-            else:
-                # Hash completo del log - comparación exacta
-                if hash_vault_actual == hash_vault_log:
-                    self.log('[INFO] Integridad del vault verificada contra log')
+                        if resultado == 'cancelar':
+                            return False
                 else:
-                    self.log('[SECURITY] ⚠️ DISCREPANCIA: Vault modificado externamente')
-                    resultado = self.mostrar_ventana_discrepancia_hash(
-                        titulo="🚨 VAULT COMPROMETIDO",
-                        mensaje_principal="Se ha detectado manipulación del vault de hashes",
-                        mensaje_secundario=f"El vault ha sido modificado externamente entre sesiones.\n\nHash anterior: {hash_vault_log}\nHash actual: {hash_vault_actual[:16]}...\n\nEsto podría indicar manipulación maliciosa de archivos de datos.\n\n¿Desea continuar bajo su propio riesgo?",
-                        tipo_elemento='vault'
-                    )
+                    # Hash completo del log - comparación exacta
+                    if hash_vault_actual == hash_vault_log:
+                        self.log('[INFO] Integridad del vault verificada contra log')
+                    else:
+                        self.log('[SECURITY] ⚠️ DISCREPANCIA: Vault modificado externamente')
+                        resultado = self.mostrar_ventana_discrepancia_hash(
+                            titulo="🚨 VAULT COMPROMETIDO",
+                            mensaje_principal="Se ha detectado manipulación del vault de hashes",
+                            mensaje_secundario=f"El vault ha sido modificado externamente entre sesiones.\n\nHash anterior: {hash_vault_log}\nHash actual: {hash_vault_actual[:16]}...\n\nEsto podría indicar manipulación maliciosa de archivos de datos.\n\n¿Desea continuar bajo su propio riesgo?",
+                            tipo_elemento='vault'
+                        )
                     
-                    if resultado == 'cancelar':
-                        return False
-        else:
-            self.log('[INFO] No hay hash anterior del vault para comparar (primera ejecución)')
+                        if resultado == 'cancelar':
+                            return False
+            else:
+                self.log('[INFO] No hay hash anterior del vault para comparar (primera ejecución)')
         
         # 5. Si todo está OK, continuar con el flujo normal
         self.log('[INFO] ✅ Sistema verificado correctamente - listo para operar')
@@ -873,35 +978,20 @@ class MetrologiaApp(QMainWindow):
     def verificar_integridad_elementos_al_inicio(self):
         """Verifica todos los elementos y devuelve lista de IDs comprometidos (máx 5)"""
         try:
-            vault = cargar_vault_hashes()
             elementos_comprometidos = []
             
-            for id_elemento, hash_guardado in vault.items():
-                # Buscar el archivo JSON del elemento
-                ruta_elemento = None
-                for rama in ['instrumentos', 'patrones']:
-                    base_path = get_data_path(os.path.join('data', rama))
-                    if os.path.exists(base_path):
-                        for fam in os.listdir(base_path):
-                            ruta_fam = os.path.join(base_path, fam)
-                            ruta_elem = os.path.join(ruta_fam, id_elemento, f"{id_elemento}.json")
-                            if os.path.exists(ruta_elem):
-                                ruta_elemento = ruta_elem
-                                break
-                        if ruta_elemento:
-                            break
-                
-                if ruta_elemento:
-                    # Verificar hash del archivo
-                    hash_actual = generar_hash_archivo(ruta_elemento)
-                    if hash_actual != hash_guardado:
-                        elementos_comprometidos.append(id_elemento)
-                        self.log(f'[SECURITY] ⚠️ Elemento comprometido: {id_elemento}')
-                        
-                        # Limitar a 5 elementos para no saturar
-                        if len(elementos_comprometidos) >= 5:
-                            self.log(f'[WARNING] Demasiados elementos comprometidos, mostrando solo los primeros 5')
-                            break
+            for clave, estado, _ in iterar_verificacion(get_data_path('data')):
+                if estado is False:
+                    id_elemento = id_activo_de_clave(clave)
+                    if id_elemento in elementos_comprometidos:
+                        continue
+                    elementos_comprometidos.append(id_elemento)
+                    self.log(f'[SECURITY] ⚠️ Elemento comprometido: {id_elemento}')
+                    
+                    # Limitar a 5 elementos para no saturar
+                    if len(elementos_comprometidos) >= 5:
+                        self.log(f'[WARNING] Demasiados elementos comprometidos, mostrando solo los primeros 5')
+                        break
             
             if elementos_comprometidos:
                 self.log(f'[SECURITY] 🚨 Se detectaron {len(elementos_comprometidos)} elementos comprometidos')
@@ -1207,17 +1297,8 @@ class MetrologiaApp(QMainWindow):
     def obtener_nombre_completo_usuario(self, username):
         """Obtiene el nombre completo del usuario desde config/users.json"""
         try:
-            with open('config/users.json', 'r', encoding='utf-8') as f:
-                users_data = json.load(f)
-            
-            # Buscar en técnicos y visores
-            for categoria in ['tecnicos', 'visor']:
-                if categoria in users_data:
-                    for user in users_data[categoria]:
-                        if user.get('username') == username:
-                            return user.get('nombre_completo', username)
-            
-            return username  # Si no encuentra, devuelve el username
+            # Directorio indexado: solo relee users.json si ha cambiado
+            return get_directorio().nombre_completo(username)
         except Exception as e:
             self.log(f'[ERROR] Error obteniendo nombre completo: {e}')
             return username
@@ -1351,6 +1432,7 @@ class MetrologiaApp(QMainWindow):
     def abrir_gestion_usuarios(self):
         try:
             self.log('[ADMIN] Accediendo al panel de usuarios...')
+            from gui.gestion_usuarios import GestionUsuariosDialog
             dialogo = GestionUsuariosDialog(self)
             result = dialogo.exec()
         except Exception as e:
@@ -1361,6 +1443,7 @@ class MetrologiaApp(QMainWindow):
         """Abre la ventana de Auditoría e Integridad del Sistema"""
         try:
             self.log('[ADMIN] Accediendo al panel de Auditoría e Integridad...')
+            from gui.auditoria import VentanaAuditoria
             dialogo = VentanaAuditoria(self)
             result = dialogo.exec()
             
@@ -1524,7 +1607,7 @@ class MetrologiaApp(QMainWindow):
         header_layout.addStretch()
         self.filter_group = QButtonGroup(self)
         filter_layout = QHBoxLayout()
-        filters = [('TODOS', 'all'), ('PATRONES', 'patrones'), ('INSTRUMENTOS', 'instrumentos')]
+        filters = [('TODOS', 'all'), ('PATRONES', 'patrones'), ('INSTRUMENTOS', 'instrumentos'), ('PLAN SEMANAL', 'plan')]
         for text, filter_id in filters:
             btn = QPushButton(text)
             btn.setCheckable(True)
@@ -1545,6 +1628,15 @@ class MetrologiaApp(QMainWindow):
         self.tabla_proximos.itemClicked.connect(self.ir_a_ficha_desde_proximos)
         self.tabla_proximos.setCursor(Qt.CursorShape.PointingHandCursor)
         layout.addWidget(self.tabla_proximos)
+        # Plan semanal: semana -> lote (juego de patrones) -> instrumentos
+        self.arbol_plan = QTreeWidget()
+        self.arbol_plan.setColumnCount(5)
+        self.arbol_plan.setHeaderLabels(['SEMANA / LOTE', 'PATRONES', 'INSTRUMENTOS', 'PRIMER VENCIMIENTO', 'ESTADO'])
+        self.arbol_plan.setStyleSheet('\n            QTreeWidget {\n                background-color: #1e1e1e; color: #d4d4d4;\n                border: 1px solid #333333; font-size: 13px;\n            }\n            QHeaderView::section {\n                background-color: #2d2d2d; color: #569cd6; padding: 5px; font-weight: bold; border: 1px solid #333333;\n            }\n        ')
+        self.arbol_plan.header().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.arbol_plan.itemClicked.connect(self.ir_a_ficha_desde_plan)
+        self.arbol_plan.hide()
+        layout.addWidget(self.arbol_plan)
         self.actualizar_tabla_proximos()
 
     def setup_page_ficha_tecnica(self):
@@ -1707,10 +1799,7 @@ class MetrologiaApp(QMainWindow):
             row = self.tabla_calibraciones.row(selected_rows[0])
         
         idx = len(self.historial_actual) - 1 - row
-        puntos = self.historial_actual[idx].get('puntos', []) if 0 <= idx < len(self.historial_actual) else self.historial_actual[idx].get('puntos', [])
-        calibracion_info = self.historial_actual[idx]
-        
-        dialogo = VentanaPuntos(puntos, calibracion_info, parent=self)
+        dialogo = VentanaPuntos(self.historial_actual[idx], parent=self)
         dialogo.exec()
 
     def lanzar_calibracion(self):
@@ -1728,6 +1817,8 @@ class MetrologiaApp(QMainWindow):
             self.log(f'[SISTEMA] Acceso denegado: {self.current_user} no es técnico') if self.user_type!= 'tecnicos' else None
             QMessageBox.warning(self, 'Acceso Denegado', 'Solo los técnicos pueden realizar calibraciones.')
         else:
+            if not self.asegurar_activo_verificado(self.current_elemento_id, self._ruta_json_actual()):
+                return
             self.log(f'[SISTEMA] Iniciando protocolo de calibración para: {self.current_elemento_id}')
             self.logger.log_calibration(self.current_elemento_id, self.current_familia, self.current_user)
             from gui.calibration_window import CalibrationWindow
@@ -1736,6 +1827,10 @@ class MetrologiaApp(QMainWindow):
             self.win_cal.show()
     def modal_actualizar_patron(self, data_json, path_json):
         # ***<module>.MetrologiaApp.modal_actualizar_patron: Failure: Different bytecode
+        if not self.asegurar_activo_verificado(self.current_elemento_id, path_json, 'patron'):
+            return
+        # La ficha muestra la vista de solo lectura de la caché
+        data_json = copia_mutable(data_json)
         from PyQt6.QtWidgets import QDateEdit, QFileDialog
         from PyQt6.QtCore import QDate
         import shutil
@@ -1765,6 +1860,7 @@ class MetrologiaApp(QMainWindow):
             f, _ = QFileDialog.getOpenFileName(dialog, 'Seleccionar PDF', '', 'PDF Files (*.pdf)')
             if f:
                 path_pdf[0] = f
+                lbl_pdf.setText(os.path.basename(f))
         btn_pdf.clicked.connect(get_pdf)
         layout.addWidget(btn_pdf)
         layout.addWidget(lbl_pdf)
@@ -1778,10 +1874,16 @@ class MetrologiaApp(QMainWindow):
                 QMessageBox.warning(dialog, 'Aviso', 'Rellena laboratorio e incertidumbre')
                 return
                 
-            # Crear carpeta de documentos si es necesario
+            elemento_id = self.current_elemento_id
+            nombre_certificado = ''
+            # Registrar el certificado en el almacén de adjuntos del patrón
             if path_pdf[0]:
-                folder_docs = os.path.join(os.path.dirname(path_json), 'documentos')
-                os.makedirs(folder_docs, exist_ok=True)
+                try:
+                    nombre_certificado, _ = registrar_adjunto(os.path.dirname(path_json), elemento_id, path_pdf[0])
+                    self.logger.log_file_upload(nombre_certificado, elemento_id, 'certificado')
+                except OSError as e:
+                    QMessageBox.critical(dialog, 'Error', f'No se pudo adjuntar el certificado: {e}')
+                    return
                 
             # Crear nueva entrada
             nueva_entrada = {
@@ -1790,7 +1892,7 @@ class MetrologiaApp(QMainWindow):
                 'incertidumbre': inc_input.toPlainText(),
                 'usuario_tecnico': self.current_user,
                 'fecha_registro': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'certificado': os.path.basename(path_pdf[0]) if path_pdf[0] else ''
+                'certificado': nombre_certificado
             }
             
             if 'historial' not in data_json:
@@ -1800,7 +1902,8 @@ class MetrologiaApp(QMainWindow):
             data_json['fecha_ultima_calibracion'] = nueva_entrada['fecha_calibracion']
             data_json['incertidumbre'] = nueva_entrada['incertidumbre']
             
-            if guardar_json_con_hash(path_json, data_json, elemento_id):
+            evento = ('DATA', f'Calibración de patrón {elemento_id} actualizada por {nueva_entrada["usuario_tecnico"]}')
+            if guardar_json_con_hash(path_json, data_json, elemento_id, evento):
                 self.log(f'[HASH] Hash actualizado para {elemento_id} tras actualizar calibración')
             else:
                 self.log(f'[ERROR] No se pudo actualizar hash para {elemento_id}')
@@ -1832,20 +1935,19 @@ class MetrologiaApp(QMainWindow):
                     try:
                         tipo_folder = getattr(self, 'current_tipo', 'instrumentos')
                         path = get_data_path(os.path.join('data', tipo_folder, self.current_familia, self.current_elemento_id, f'{self.current_elemento_id}.json'))
-                        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-                            data = json.load(f)
+                        if not self.asegurar_activo_verificado(self.current_elemento_id, path):
+                            return
+                        data = copia_documento(path)
                         data['estado'] = 'obsoleto'
                         
-                        if guardar_json_con_hash(path, data, self.current_elemento_id):
+                        evento = ('RETIREMENT', f'{tipo_folder.upper()} {self.current_elemento_id} marcado como OBSOLETO por {self.current_user}', 'warning')
+                        if guardar_json_con_hash(path, data, self.current_elemento_id, evento):
                             self.log(f'[HASH] Hash actualizado para {self.current_elemento_id} tras marcar como obsoleto')
                         else:
                             self.log(f'[ERROR] No se pudo actualizar hash para {self.current_elemento_id}')
                         
-                        self.logger.log_event('RETIREMENT', f'{tipo_folder.upper()} {self.current_elemento_id} marcado como OBSOLETO por {self.current_user}', 'warning')
                         self.log(f'[INFO] {tipo_folder} {self.current_elemento_id} marcado como OBSOLETO')
                         QMessageBox.information(self, 'Éxito', 'Elemento marcado como OBSOLETO')
-                        from indices import generar_indices
-                        generar_indices()
                         if tipo_folder == 'patrones':
                             self.cargar_ficha_patron(self.current_elemento_id)
                         else:
@@ -1876,21 +1978,20 @@ class MetrologiaApp(QMainWindow):
                     try:
                         tipo_folder = getattr(self, 'current_tipo', 'instrumentos')
                         path = get_data_path(os.path.join('data', tipo_folder, self.current_familia, self.current_elemento_id, f'{self.current_elemento_id}.json'))
-                        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-                            data = json.load(f)
+                        if not self.asegurar_activo_verificado(self.current_elemento_id, path):
+                            return
+                        data = copia_documento(path)
                         if 'estado' in data:
                             del data['estado']
                         
-                        if guardar_json_con_hash(path, data, self.current_elemento_id):
+                        evento = ('RESTORE', f'{tipo_folder.upper()} {self.current_elemento_id} reactivado como APTO por {self.current_user}', 'success')
+                        if guardar_json_con_hash(path, data, self.current_elemento_id, evento):
                             self.log(f'[HASH] Hash actualizado para {self.current_elemento_id} tras marcar como apto')
                         else:
                             self.log(f'[ERROR] No se pudo actualizar hash para {self.current_elemento_id}')
                         
-                        self.logger.log_event('RESTORE', f'{tipo_folder.upper()} {self.current_elemento_id} reactivado como APTO por {self.current_user}', 'success')
                         self.log(f'[INFO] {tipo_folder} {self.current_elemento_id} restaurado como APTO')
                         QMessageBox.information(self, 'Éxito', 'Elemento marcado como APTO')
-                        from indices import generar_indices
-                        generar_indices()
                         if tipo_folder == 'patrones':
                             self.cargar_ficha_patron(self.current_elemento_id)
                         else:
@@ -1920,33 +2021,24 @@ class MetrologiaApp(QMainWindow):
         path_json = get_data_path(os.path.join('data/instrumentos', self.current_familia, self.current_elemento_id, f'{self.current_elemento_id}.json'))
         
         try:
-            with open(path_json, 'r', encoding='utf-8', errors='ignore') as f:
-                data_completo = json.load(f)
+            instrumento = modelo.cargar_instrumento(path_json)
             
             # Extraer solo la calibración seleccionada
             calibracion_seleccionada = self.historial_actual[indice_real]
             
-            # Crear estructura de datos solo para la calibración seleccionada
-            datos_pdf = {
-                'id': data_completo.get('id', 'N/A'),
-                'descripcion': data_completo.get('descripcion', 'N/A'),
-                'rango_min': data_completo.get('rango_min', 'N/A'),
-                'rango_max': data_completo.get('rango_max', 'N/A'),
-                'periodicidad_meses': data_completo.get('periodicidad_meses', 'N/A'),
-                'patrones_sugeridos': data_completo.get('patrones_sugeridos', 'N/A'),
-                'historial': [calibracion_seleccionada]  # SOLO la calibración seleccionada
-            }
+            # Instrumento con SOLO la calibración seleccionada
+            datos_pdf = instrumento.con_historial([calibracion_seleccionada])
             
             # Generar PDF específico con fecha en el nombre
-            fecha_cal = calibracion_seleccionada.get('fecha_calibracion', '').split()[0].replace('-', '')
+            fecha_cal = calibracion_seleccionada.fecha.split()[0].replace('-', '')
             ruta_pdf = get_data_path(os.path.join('data/instrumentos', self.current_familia, self.current_elemento_id, f'ICI_{self.current_elemento_id}_{fecha_cal}.pdf'))
             
             from core.pdf_generator import exportar_a_pdf
             exportar_a_pdf(datos_pdf, ruta_pdf)
             
             # --- REGISTRO DE IMPRESIÓN EN LOG ---
-            elemento_id = datos_pdf.get('id', 'N/A')
-            fecha_calibracion = calibracion_seleccionada.get('fecha_calibracion', 'N/A')
+            elemento_id = datos_pdf.id
+            fecha_calibracion = calibracion_seleccionada.fecha or 'N/A'
             
             # Generar ID del informe para el log
             if fecha_calibracion != 'N/A':
@@ -1986,39 +2078,19 @@ class MetrologiaApp(QMainWindow):
         if not self.verificar_integridad_elemento(path, id_elemento, 'elemento'):
             return
         
-        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-            data = json.load(f)
-        self.lbl_id_elemento.setText(f'ID: {data['id']}')
-        r_min = data.get('rango_min', 'N/A')
-        r_max = data.get('rango_max', 'N/A')
-        try:
-            self._current_rango_min = float(r_min) if isinstance(r_min, (int, float, str)) and r_min!= 'N/A' else 0
-            self._current_rango_max = float(r_max) if isinstance(r_max, (int, float, str)) and r_max!= 'N/A' else 25
-        except (ValueError, TypeError):
-            self._current_rango_min = 0
-            self._current_rango_max = 25
-        incertidumbre_total_str = '0.0000'
-        res = data.get('resolucion', '0.0001')
-        historial = data.get('historial', [])
-        if historial:
-            ultima_calib = historial[(-1)]
-            puntos = ultima_calib.get('puntos', [])
-            if puntos:
-                try:
-                    valores_totales = []
-                    for p in puntos:
-                        error = abs(float(p.get('error', 0)))
-                        inc_k2 = float(p.get('incertidumbre_k2', 0))
-                        valores_totales.append(error + inc_k2)
-                    max_total = max(valores_totales)
-                    incertidumbre_total_str = f'{max_total:.4f}'
-                except (ValueError, TypeError):
-                    incertidumbre_total_str = '0.0000'
-                else:
-                    pass
+        with medir("json.cargar_activo"):
+            data = cargar_documento(path)
+            instrumento = modelo.como_instrumento(data)
+        self.instrumento_actual = instrumento
+        self.lbl_id_elemento.setText(f'ID: {instrumento.id}')
+        r_min = modelo.formato(instrumento.rango_min)
+        r_max = modelo.formato(instrumento.rango_max)
+        res = f'{instrumento.resolucion:g}'
+        ultima_calibracion = instrumento.ultima_calibracion()
+        if ultima_calibracion is not None:
+            incertidumbre_total_str = f'{ultima_calibracion.incertidumbre_total():.4f}'
         else:
-            inc_base = data.get('incertidumbre_elemento', 0)
-            incertidumbre_total_str = f'{float(inc_base):.4f}'
+            incertidumbre_total_str = f'{instrumento.incertidumbre_elemento:.4f}'
         proxima_dt, ultima_calib = self.calcular_proxima_calibracion(data)
         proxima_calib = proxima_dt.strftime('%Y-%m-%d') if proxima_dt else 'N/A'
         if ultima_calib is None:
@@ -2030,19 +2102,17 @@ class MetrologiaApp(QMainWindow):
         else:
             if estado_elemento == 'NO APTO':
                 clase_estado = 'estado-no-apto'
-        texto_info = f'''\n                <style>\n                    body {{ font-family: 'Segoe UI', Arial; color: #d4d4d4; }}\n                    .label {{ font-weight: bold; color: #3498db; }}\n                    .valor {{ color: #ffffff; }}\n                    .linea {{ margin: 8px 0; }}\n                    .estado-apto {{ color: #2ecc71; font-weight: bold; }}\n                    .estado-no-apto {{ color: #e74c3c; font-weight: bold; }}\n                    .estado-obsoleto {{ color: #f39c12; font-weight: bold; }}\n                </style>\n                <div class="linea"><span class="label">Descripción:</span> <span class="valor">{data.get('descripcion', 'N/A')}</span></div>\n                <div class="linea"><span class="label">Rango de Medida:</span> <span class="valor">{r_min} a {r_max} mm</span></div>\n                <div class="linea"><span class="label">Incertidumbre Total (|E|+U):</span> <span class="valor">{incertidumbre_total_str} mm</span></div>\n                <div class="linea"><span class="label">Resolución:</span> <span class="valor">{res} mm</span></div>\n                <div class="linea"><span class="label">Periodicidad:</span> <span class="valor">{data.get('periodicidad_meses', 12)} meses</span></div>\n                <div class="linea"><span class="label">Patrones:</span> <span class="valor">{data.get('patrones_sugeridos', 'N/A')}</span></div>\n                <div class="linea"><span class="label">ESTADO:</span> <span class="{clase_estado}">{estado_elemento}</span></div>\n                <div class="linea"><span class="label">Última Calibración:</span> <span class="valor">{ultima_calib}</span></div>\n                <div class="linea"><span class="label">Próxima Calibración:</span> <span class="valor">{proxima_calib}</span></div>\n                '''
+        texto_info = f'''\n                <style>\n                    body {{ font-family: 'Segoe UI', Arial; color: #d4d4d4; }}\n                    .label {{ font-weight: bold; color: #3498db; }}\n                    .valor {{ color: #ffffff; }}\n                    .linea {{ margin: 8px 0; }}\n                    .estado-apto {{ color: #2ecc71; font-weight: bold; }}\n                    .estado-no-apto {{ color: #e74c3c; font-weight: bold; }}\n                    .estado-obsoleto {{ color: #f39c12; font-weight: bold; }}\n                </style>\n                <div class="linea"><span class="label">Descripción:</span> <span class="valor">{instrumento.descripcion}</span></div>\n                <div class="linea"><span class="label">Rango de Medida:</span> <span class="valor">{r_min} a {r_max} mm</span></div>\n                <div class="linea"><span class="label">Incertidumbre Total (|E|+U):</span> <span class="valor">{incertidumbre_total_str} mm</span></div>\n                <div class="linea"><span class="label">Resolución:</span> <span class="valor">{res} mm</span></div>\n                <div class="linea"><span class="label">Periodicidad:</span> <span class="valor">{modelo.formato(instrumento.periodicidad_meses)} meses</span></div>\n                <div class="linea"><span class="label">Patrones:</span> <span class="valor">{instrumento.patrones_sugeridos}</span></div>\n                <div class="linea"><span class="label">ESTADO:</span> <span class="{clase_estado}">{estado_elemento}</span></div>\n                <div class="linea"><span class="label">Última Calibración:</span> <span class="valor">{ultima_calib}</span></div>\n                <div class="linea"><span class="label">Próxima Calibración:</span> <span class="valor">{proxima_calib}</span></div>\n                '''
         self.info_txt.setHtml(texto_info)
-        self.historial_actual = data.get('historial', [])
+        self.historial_actual = instrumento.historial
         historial = self.historial_actual
         self.tabla_calibraciones.setRowCount(len(historial))
         from PyQt6.QtWidgets import QTableWidgetItem
         from PyQt6.QtGui import QColor
         for row, calibracion in enumerate(reversed(historial)):
-            fecha = calibracion.get('fecha_calibracion', 'N/A')
-            responsable = calibracion.get('responsable', 'N/A')
-            apto_calibracion = 'APTO' if calibracion.get('apto', False) else 'NO APTO'
-            item_fecha = QTableWidgetItem(str(fecha))
-            item_responsable = QTableWidgetItem(str(responsable))
+            apto_calibracion = 'APTO' if calibracion.apto else 'NO APTO'
+            item_fecha = QTableWidgetItem(calibracion.fecha or 'N/A')
+            item_responsable = QTableWidgetItem(calibracion.responsable)
             item_estado = QTableWidgetItem(apto_calibracion)
             color = QColor('#2ecc71') if apto_calibracion == 'APTO' else QColor('#e74c3c')
             item_estado.setForeground(color)
@@ -2061,14 +2131,12 @@ class MetrologiaApp(QMainWindow):
                 widget.deleteLater()
         
         from core.grafica_generator import crear_grafica_metrologia
-        canvas = crear_grafica_metrologia(data)
+        canvas = crear_grafica_metrologia(instrumento)
         canvas.mousePressEvent = lambda event: self.abrir_grafica_detallada(event, canvas)
         self.grafica_layout.addWidget(canvas)
         
         rol = str(self.user_type).lower().strip()
-        estado_actual = data.get('estado', '').lower()
-        
-        if estado_actual == 'obsoleto':
+        if instrumento.estado == 'obsoleto':
             self.btn_estado_dinamico.setText('MARCAR COMO APTO')
             self.btn_estado_dinamico.setStyleSheet('background-color: #27ae60; color: white; font-weight: bold; border-radius: 4px;')
             self.btn_estado_dinamico.clicked.connect(self.marcar_apto)
@@ -2115,8 +2183,9 @@ class MetrologiaApp(QMainWindow):
             return None
         
         try:
-            with open(path_json, 'r', encoding='utf-8', errors='ignore') as f:
-                data = json.load(f)
+            with medir("json.cargar_activo"):
+                data = cargar_documento(path_json)
+                patron = modelo.como_patron(data)
             proxima_calib, _ = self.calcular_proxima_calibracion(data)
             proxima_calib_str = proxima_calib.strftime('%Y-%m-%d') if proxima_calib else 'N/A'
             
@@ -2149,11 +2218,11 @@ class MetrologiaApp(QMainWindow):
                 .linea {{ margin: 6px 0; }}
                 hr {{ border: 0; border-top: 1px solid #3e3e42; margin: 15px 0; }}
             </style>
-            <div class="linea"><span class="label">Descripción:</span> <span class="valor">{data.get('descripcion', 'N/A')}</span></div>
+            <div class="linea"><span class="label">Descripción:</span> <span class="valor">{patron.descripcion or 'N/A'}</span></div>
             <div class="linea"><span class="label">Familia:</span> <span class="valor">{self.current_familia}</span></div>
-            <div class="linea"><span class="label">Valor Nominal:</span> <span class="valor">{data.get('valor_nominal', 'N/A')} mm</span></div>
-            <div class="linea"><span class="label">Incertidumbre (k=2):</span> <span class="valor">{data.get('incertidumbre', 'N/A')}</span></div>
-            <div class="linea"><span class="label">Periodicidad:</span> <span class="valor">{data.get('periodicidad_meses', 'N/A')} meses</span></div>
+            <div class="linea"><span class="label">Valor Nominal:</span> <span class="valor">{patron.valor_nominal:g} mm</span></div>
+            <div class="linea"><span class="label">Incertidumbre (k=2):</span> <span class="valor">{patron.incertidumbre:g}</span></div>
+            <div class="linea"><span class="label">Periodicidad:</span> <span class="valor">{modelo.formato(patron.periodicidad_meses)} meses</span></div>
             <div class="linea"><span class="label">Fecha Última Calibración:</span> <span class="valor">{data.get('fecha_ultima_calibracion', 'N/A')}</span></div>
             <div class="linea"><span class="label">Fecha Próxima Calibración:</span> <span class="valor">{proxima_calib_str}</span></div>
             <hr>
@@ -2166,6 +2235,8 @@ class MetrologiaApp(QMainWindow):
             ruta_docs = os.path.join(ruta_elemento, 'documentos')
             if os.path.exists(ruta_docs):
                 for archivo in os.listdir(ruta_docs):
+                    if archivo == NOMBRE_MANIFIESTO:
+                        continue
                     btn_file = QPushButton(f'  {archivo}')
                     btn_file.setStyleSheet(style_botones_archivos)
                     btn_file.clicked.connect(lambda ch, p=os.path.join(ruta_docs, archivo): os.startfile(p))
@@ -2207,12 +2278,20 @@ class MetrologiaApp(QMainWindow):
         if not self.current_elemento_id:
             return
         
+        if not self.asegurar_activo_verificado(self.current_elemento_id, self._ruta_json_actual()):
+            return
+        
         file, _ = QFileDialog.getOpenFileName(self, 'Añadir documento')
         if file:
             tipo = getattr(self, 'current_tipo', 'instrumentos')
-            destino = get_data_path(os.path.join('data', tipo, self.current_familia, self.current_elemento_id, 'documentos'))
-            os.makedirs(destino, exist_ok=True)
-            self.log(f'Archivo añadido a {self.current_elemento_id}')
+            carpeta_activo = get_data_path(os.path.join('data', tipo, self.current_familia, self.current_elemento_id))
+            try:
+                nombre, sha = registrar_adjunto(carpeta_activo, self.current_elemento_id, file)
+            except OSError as e:
+                QMessageBox.critical(self, 'Error', f'No se pudo añadir el documento: {e}')
+                return
+            self.logger.log_file_upload(nombre, self.current_elemento_id, 'documento')
+            self.log(f'Archivo añadido a {self.current_elemento_id}: {nombre} ({sha[:12]})')
             if tipo == 'patrones':
                 self.cargar_ficha_patron(self.current_elemento_id)
     def actualizar_boton_estado(self, data):
@@ -2280,8 +2359,7 @@ class MetrologiaApp(QMainWindow):
             return None
         
         from core.grafica_generator import crear_grafica_metrologia
-        datos_para_grafica = {'historial': self.historial_actual, 'rango_min': getattr(self, '_current_rango_min', 0), 'rango_max': getattr(self, '_current_rango_max', 25)}
-        self.canvas_grafica = crear_grafica_metrologia(datos_para_grafica, indice_seleccionado=indice_real)
+        self.canvas_grafica = crear_grafica_metrologia(self.instrumento_actual, indice_seleccionado=indice_real)
         self.canvas_grafica.mousePressEvent = lambda event: self.abrir_grafica_detallada(event, self.canvas_grafica)
         self.grafica_layout.addWidget(self.canvas_grafica)
         
@@ -2303,8 +2381,7 @@ class MetrologiaApp(QMainWindow):
             return None
         
         from core.grafica_generator import crear_grafica_metrologia
-        datos_para_grafica = {'historial': self.historial_actual, 'rango_min': getattr(self, '_current_rango_min', 0), 'rango_max': getattr(self, '_current_rango_max', 25)}
-        self.canvas_grafica = crear_grafica_metrologia(datos_para_grafica, indice_seleccionado=indice_real)
+        self.canvas_grafica = crear_grafica_metrologia(self.instrumento_actual, indice_seleccionado=indice_real)
         self.canvas_grafica.mousePressEvent = lambda event: self.abrir_grafica_detallada(event, self.canvas_grafica)
         self.grafica_layout.addWidget(self.canvas_grafica)
         
@@ -2354,51 +2431,25 @@ class MetrologiaApp(QMainWindow):
         self.actualizar_arbol_contexto('familia')
 
     def calcular_proxima_calibracion(self, data):
-        # irreducible cflow, using cdg fallback
-        """Calcula la fecha de próxima calibración usando historial o raíz del JSON"""
-        # ***<module>.MetrologiaApp.calcular_proxima_calibracion: Failure: Compilation Error
-        pass
-        periodicidad = int(data.get('periodicidad_meses', 12) or 12)
-        historial = data.get('historial', [])
-        ultima_calib_str = None
-        if historial:
-            ultima_calib_str = historial[(-1)].get('fecha_calibracion') or historial[(-1)].get('fecha_ultima_calibracion')
-        if not ultima_calib_str:
-            ultima_calib_str = data.get('FECHA_ULTIMA_CALIBRACION') or data.get('fecha_ultima_calibracion')
-        try:
-            fecha_ultima = datetime.strptime(str(ultima_calib_str).split()[0], '%Y-%m-%d') if ultima_calib_str and ultima_calib_str!= 'N/A' else None
-            if fecha_ultima is None:
-                return (None, None)
-            proxima = fecha_ultima + relativedelta(months=periodicidad)
-            return (proxima, str(ultima_calib_str))
-        except Exception as e:
-            self.log(f'[ERROR] Fallo en cálculo de fecha: {e}') if hasattr(self, 'log') else self
+        """Fecha de próxima calibración (datetime) y texto de la última, o (None, None)"""
+        proxima, ultima, _, _ = vencimientos.evaluar(data)
+        if proxima is None:
             return (None, None)
+        return (datetime.combine(proxima, datetime.min.time()), ultima)
+
+    @staticmethod
+    def estado_interfaz(estado):
+        """Estado de core.vencimientos con las etiquetas de las tarjetas (URGENTE sigue siendo APTO)"""
+        if estado == vencimientos.CADUCADO:
+            return 'NO APTO'
+        if estado == vencimientos.URGENTE:
+            return 'APTO'
+        return estado
 
     def obtener_estado_calibracion(self, data):
-        """Obtiene el estado del elemento de forma robusta"""
-        # ***<module>.MetrologiaApp.obtener_estado_calibracion: Failure: Different bytecode
-        if data.get('estado') == 'obsoleto':
-            return 'OBSOLETO'
-        else:
-            from dateutil.relativedelta import relativedelta
-            periodicidad = int(data.get('periodicidad_meses', 12) or 12)
-            fecha_str = None
-            if data.get('historial'):
-                if len(data['historial']) > 0:
-                    fecha_str = data['historial'][(-1)].get('fecha_calibracion')
-            if not fecha_str:
-                fecha_str = data.get('fecha_ultima_calibracion', '2000-01-01')
-            try:
-                if not fecha_str or fecha_str == 'N/A':
-                    return 'SIN CALIBRAR'
-                fecha_limpia = str(fecha_str).split(' ')[0]
-                fecha_ultima = datetime.strptime(fecha_limpia, '%Y-%m-%d')
-                fecha_caducidad = fecha_ultima + relativedelta(months=periodicidad)
-                return 'APTO' if datetime.now() <= fecha_caducidad else 'NO APTO'
-            except:
-                return 'SIN CALIBRAR'
-                
+        """APTO, NO APTO, OBSOLETO o SIN CALIBRAR"""
+        return self.estado_interfaz(vencimientos.evaluar(data)[3])
+
     def refresh_tabla_elementos(self):
         """Crea tarjetas de elementos con alertas de colores, estados dinámicos y avisos de fecha"""
         if not hasattr(self, 'layout_elementos') or self.layout_elementos is None:
@@ -2419,29 +2470,32 @@ class MetrologiaApp(QMainWindow):
                 return None
             else:
                 elementos_info = []
+                documentos = []
                 elementos = sorted([e for e in os.listdir(ruta_familia) if os.path.isdir(os.path.join(ruta_familia, e))])
                 for elemento_id in elementos:
                     json_path = os.path.join(ruta_familia, elemento_id, f'{elemento_id}.json')
-                    desc = 'Sin descripción'
-                    estado = 'SIN CALIBRAR'
-                    proxima_calib = None
+                    info = {'id': elemento_id, 'descripcion': 'Sin descripción', 'estado': vencimientos.SIN_CALIBRAR,
+                            'proxima_calib': None, 'aviso': None}
                     if os.path.exists(json_path):
                         try:
-                            with open(json_path, 'r', encoding='utf-8', errors='ignore') as f:
-                                data = json.load(f)
-                                desc = data.get('descripcion', 'N/A')
-                                estado = self.obtener_estado_calibracion(data)
-                                proxima_calib, _ = self.calcular_proxima_calibracion(data)
+                            data = cargar_documento(json_path)
+                            info['descripcion'] = data.get('descripcion', 'N/A')
+                            documentos.append((info, data))
                         except Exception as err:
                             self.log(f'[ERROR] Error leyendo JSON de {elemento_id}: {err}')
-                    elementos_info.append({'id': elemento_id, 'descripcion': desc, 'estado': estado.upper(), 'proxima_calib': proxima_calib})
+                    elementos_info.append(info)
+                # Toda la familia en un solo cálculo; URGENTE a 15 días en las tarjetas
+                lote = vencimientos.evaluar_lote([data for _, data in documentos], dias_urgente=15)
+                for (info, _), (proxima, _, _, estado) in zip(documentos, lote):
+                    info['estado'] = self.estado_interfaz(estado)
+                    info['aviso'] = estado
+                    if proxima:
+                        info['proxima_calib'] = datetime.combine(proxima, datetime.min.time())
                 orden_actual = self.combo_orden.currentText() if hasattr(self, 'combo_orden') else 'Nombre (A-Z)'
                 if orden_actual == 'Próxima Calibración':
                     elementos_info.sort(key=lambda x: x['proxima_calib'] if x['proxima_calib'] else datetime(2099, 12, 31))
                 else:
                     elementos_info.sort(key=lambda x: x['id'])
-                hoy = datetime.now()
-                umbral_15_dias = hoy + timedelta(days=15)
                 for elem in elementos_info:
                     btn_wrapper = QPushButton()
                     btn_wrapper.setObjectName('WrapperBtn')
@@ -2455,13 +2509,12 @@ class MetrologiaApp(QMainWindow):
                     fecha_str = elem['proxima_calib'].strftime('%Y-%m-%d') if elem['proxima_calib'] else 'N/A'
                     color_fecha = '#aaaaaa'
                     aviso_extra = ''
-                    if elem['proxima_calib']:
-                        if elem['proxima_calib'] < hoy:
-                            color_fecha = '#ff4444'
-                            aviso_extra = ' - [CADUCADO]'
-                        elif elem['proxima_calib'] <= umbral_15_dias:
-                            color_fecha = '#ffa500'
-                            aviso_extra = ' - [URGENTE]'
+                    if elem['aviso'] == vencimientos.CADUCADO:
+                        color_fecha = '#ff4444'
+                        aviso_extra = ' - [CADUCADO]'
+                    elif elem['aviso'] == vencimientos.URGENTE:
+                        color_fecha = '#ffa500'
+                        aviso_extra = ' - [URGENTE]'
                     lbl_fecha = QLabel(f'Próxima Calibración: {fecha_str}{aviso_extra}')
                     lbl_fecha.setStyleSheet(f'color: {color_fecha}; font-size: 12px; border: none; background: none;')
                     info_layout.addWidget(lbl_id)
@@ -2512,23 +2565,26 @@ class MetrologiaApp(QMainWindow):
                 return None
             else:
                 lista_elementos = []
-                hoy = datetime.now()
+                documentos = []
                 directorios = [e for e in os.listdir(ruta_familia) if os.path.isdir(os.path.join(ruta_familia, e))]
                 for id_patron in directorios:
                     json_path = os.path.join(ruta_familia, id_patron, f'{id_patron}.json')
-                    info = {'id': id_patron, 'descripcion': 'Patrón de medida', 'estado': 'SIN CALIBRAR', 'proxima': datetime(9999, 12, 31)}
+                    info = {'id': id_patron, 'descripcion': 'Patrón de medida', 'estado': vencimientos.SIN_CALIBRAR,
+                            'proxima': datetime(9999, 12, 31), 'caducado': False}
                     if os.path.exists(json_path):
                         try:
-                            with open(json_path, 'r', encoding='utf-8') as f:
-                                data = json.load(f)
-                                info['descripcion'] = data.get('descripcion', 'N/A')
-                                info['estado'] = self.obtener_estado_calibracion(data)
-                                p, _ = self.calcular_proxima_calibracion(data)
-                                if p:
-                                    info['proxima'] = p
+                            data = cargar_documento(json_path)
+                            info['descripcion'] = data.get('descripcion', 'N/A')
+                            documentos.append((info, data))
                         except:
                             pass
                     lista_elementos.append(info)
+                lote = vencimientos.evaluar_lote([data for _, data in documentos])
+                for (info, _), (proxima, _, dias, estado) in zip(documentos, lote):
+                    info['estado'] = self.estado_interfaz(estado)
+                    if proxima:
+                        info['proxima'] = datetime.combine(proxima, datetime.min.time())
+                        info['caducado'] = dias <= 0
                 criterio = self.combo_orden_pat.currentText()
                 if criterio == 'Nombre (A-Z)':
                     lista_elementos.sort(key=lambda x: x['id'])
@@ -2540,6 +2596,7 @@ class MetrologiaApp(QMainWindow):
                     desc = el['descripcion']
                     estado = el['estado']
                     proxima = el['proxima']
+                    caducado = el['caducado']
                     btn_card = QPushButton()
                     btn_card.setObjectName('WrapperBtn')
                     btn_card.setMinimumHeight(90)
@@ -2550,7 +2607,7 @@ class MetrologiaApp(QMainWindow):
                     lbl_tit.setStyleSheet('font-weight: bold; font-size: 15px; color: #ffffff; border: none; background: none;')
                     fecha_disp = proxima.strftime('%Y-%m-%d') if proxima.year!= 9999 else 'N/A'
                     color_f = '#aaaaaa'
-                    if proxima < hoy:
+                    if caducado:
                         color_f = '#ff4444'
                     lbl_f = QLabel(f'Próxima Calibración: {fecha_disp}')
                     lbl_f.setStyleSheet(f'color: {color_f}; font-size: 12px; border: none; background: none;')
@@ -2644,13 +2701,9 @@ class MetrologiaApp(QMainWindow):
         if not hasattr(self, 'tree') or not hasattr(self, 'model'):
             return
 
-        # Forzar recarga del modelo sin perder iconos
+        # QFileSystemModel ya vigila path_data: no hace falta forzar la recarga del modelo
         path_data = get_data_path('data')
         
-        # Actualizar el path raíz para forzar recarga
-        self.model.setRootPath("")
-        self.model.setRootPath(path_data)
-        
         # Asegurar que la raíz es correcta
         index_raiz = self.model.index(path_data)
         self.tree.setRootIndex(self.proxy_model.mapFromSource(index_raiz))
@@ -2695,6 +2748,70 @@ class MetrologiaApp(QMainWindow):
                     self.tree.scrollTo(index_ele_proxy)
 
 
+    def iniciar_vigilancia_datos(self):
+        """Arranca la vigilancia de data/ (eventos del sistema de archivos o sondeo)"""
+        try:
+            self.vigilancia_datos = VigilanciaDatos(get_data_path('data'), self)
+            self.vigilancia_datos.cambios.connect(self.on_datos_modificados)
+            self.log(f'[SYNC] Vigilancia de datos activa (modo {self.vigilancia_datos.modo})')
+        except Exception as e:
+            self.vigilancia_datos = None
+            self.log(f'[WARNING] No se pudo iniciar la vigilancia de datos: {e}')
+
+    def on_datos_modificados(self, cambios):
+        """Aplica cambios de data/ solo a los índices, hashes y vistas afectados"""
+        rutas = [ruta for _, ruta in cambios]
+        
+        # 1. Caché de hashes: descartar y precalcular solo lo que ha cambiado
+        invalidar_cache_hashes(rutas)
+        for ruta in rutas:
+            registro_ids.aplicar_cambio(ruta, get_data_path('data'))
+        for tipo, ruta in cambios:
+            if tipo != BAJA:
+                try:
+                    generar_hash_archivo_cacheado(ruta)
+                except OSError:
+                    pass
+        
+        # 2. Índices: reescribir solo las filas afectadas (si se están
+        #    regenerando en segundo plano, se aplican al terminar)
+        rutas_json = [ruta for ruta in rutas if ruta.endswith('.json')]
+        if not self._indices_listos:
+            self._rutas_indice_pendientes.extend(rutas_json)
+        else:
+            try:
+                actualizar_indices(rutas_json, base=get_data_path('data'))
+            except Exception as e:
+                self.log(f'[ERROR] No se pudieron actualizar los índices: {e}')
+        
+        # 3. Vistas: solo la familia abierta y los contadores de la rama con altas o bajas
+        familias = set()
+        ramas_estructura = set()
+        for tipo, ruta in cambios:
+            info = describir_ruta(ruta, get_data_path('data'))
+            if not info:
+                continue
+            familias.add((info['rama'], info['familia']))
+            if tipo != MODIFICACION:
+                ramas_estructura.add(info['rama'])
+        
+        tipo_actual = getattr(self, 'current_tipo', 'instrumentos')
+        if (tipo_actual, self.current_familia) in familias:
+            if tipo_actual == 'instrumentos' and self.stack.currentIndex() == 1:
+                self.refresh_tabla_elementos()
+            elif tipo_actual == 'patrones' and self.stack_patrones.currentIndex() == 1:
+                self.refresh_lista_patrones()
+        
+        grids = {'instrumentos': getattr(self, 'bento_grid_inst', None), 'patrones': getattr(self, 'bento_grid_pat', None)}
+        for rama in ramas_estructura:
+            if grids.get(rama) is not None:
+                self._llenar_grid_desde_disco(get_data_path(os.path.join('data', rama)), grids[rama])
+        
+        if hasattr(self, 'tabla_proximos'):
+            self.actualizar_tabla_proximos()
+        
+        self.log(f'[SYNC] {len(cambios)} cambio(s) en data/ aplicados ({len(familias)} familia(s))')
+
     def refresh_bento_view(self):
         """Refresca las vistas buscando la carpeta data de forma relativa al ejecutable"""
         # 1. Localizar la carpeta raíz del proyecto (donde esté main.py)
@@ -2874,7 +2991,7 @@ class MetrologiaApp(QMainWindow):
         """Maneja el clic en las fechas de calibración"""
         if row >= 0 and row < len(self.historial_actual):
                 calibracion = self.historial_actual[row]
-                self.log(f'[INFO] Calibración seleccionada: {calibracion.get('fecha_calibracion', 'N/A')}')
+                self.log(f'[INFO] Calibración seleccionada: {calibracion.fecha or 'N/A'}')
                 self.actualizar_tabla_puntos()
 
     def on_tree_double_click(self, index):
@@ -2943,8 +3060,14 @@ class MetrologiaApp(QMainWindow):
     def actualizar_tabla_proximos(self, button=None):
         """Lee los índices y rellena la tabla según el filtro"""
         filtro_actual = self.filter_group.checkedButton().property('filter_id')
+        es_plan = filtro_actual == 'plan'
+        self.tabla_proximos.setVisible(not es_plan)
+        if hasattr(self, 'arbol_plan'):
+            self.arbol_plan.setVisible(es_plan)
+            if es_plan:
+                self.actualizar_plan()
+                return
         data_final = []
-        hoy = datetime.now()
         try:
             archivos = []
             if filtro_actual in ['all', 'patrones']:
@@ -2955,26 +3078,24 @@ class MetrologiaApp(QMainWindow):
             for arc in archivos:
                 path = get_data_path(os.path.join('data', arc))
                 if os.path.exists(path):
-                    with open(path, 'r', encoding='utf-8') as f:
-                        data_final.extend(json.load(f))
+                    data_final.extend(cargar_archivo(path))
 
             data_final.sort(key=lambda x: x.get('vencimiento', '9999-12-31'))
             self.tabla_proximos.setRowCount(len(data_final))
+            estados = vencimientos.clasificar_fechas([item.get('vencimiento') for item in data_final])
 
             for i, item in enumerate(data_final):
                 venc_str = item.get('vencimiento', 'N/A')
                 color_texto = '#d4d4d4'
                 status_text = 'VIGENTE'
                 
-                if venc_str != 'N/A' and venc_str != '9999-12-31':
-                    venc_dt = datetime.strptime(venc_str, '%Y-%m-%d')
-                    dias_restantes = (venc_dt - hoy).days
-                    if dias_restantes < 0:
-                        color_texto = '#f44747'  # Rojo
-                        status_text = 'CADUCADO'
-                    elif dias_restantes <= 30:
-                        color_texto = '#ce9178'  # Naranja/Marrón
-                        status_text = 'URGENTE'
+                _, estado = estados[i]
+                if estado == vencimientos.CADUCADO:
+                    color_texto = '#f44747'  # Rojo
+                    status_text = 'CADUCADO'
+                elif estado == vencimientos.URGENTE:
+                    color_texto = '#ce9178'  # Naranja/Marrón
+                    status_text = 'URGENTE'
 
                 row_data = [
                     item.get('id', ''), 
@@ -2995,6 +3116,57 @@ class MetrologiaApp(QMainWindow):
             # Uso self.log porque si el log falla, al menos lo ves en consola
             self.log(f'Error en tabla próximos: {e}')
 
+    def actualizar_plan(self):
+        """Rellena el árbol del plan semanal de recalibraciones (ver core.planificador)"""
+        self.arbol_plan.clear()
+        try:
+            from core import planificador, asignacion_patrones
+            plan = planificador.planificar_inventario(get_data_path('data'), puntos=asignacion_patrones.PUNTOS_DEFECTO)
+        except Exception as e:
+            self.log(f'Error en plan de calibraciones: {e}')
+            return
+
+        for semana in plan['semanas']:
+            if not semana['lotes']:
+                continue
+            item_semana = QTreeWidgetItem([f"{semana['semana']}  (lunes {semana['lunes']})", '',
+                                           str(semana['instrumentos']), '', f"{len(semana['lotes'])} LOTES"])
+            item_semana.setForeground(0, QColor('#569cd6'))
+            for lote in semana['lotes']:
+                if lote['bloqueado']:
+                    estado, color = 'BLOQUEADO', '#f44747'
+                elif lote['vencidos']:
+                    estado, color = f"{lote['vencidos']} CADUCADOS", '#f44747'
+                elif lote['patrones_no_vigentes']:
+                    estado, color = 'RECALIBRAR PATRONES', '#ce9178'
+                else:
+                    estado, color = 'LISTO', '#d4d4d4'
+                familia = lote['familia_patrones'] or 'SIN PATRÓN ASIGNADO'
+                item_lote = QTreeWidgetItem([f"{familia} {lote['rango_min']:g}-{lote['rango_max']:g}",
+                                             f"{len(lote['patrones_a_preparar'])} a preparar / {len(lote['patrones'])} vigentes",
+                                             str(len(lote['instrumentos'])), lote['primer_vencimiento'], estado])
+                item_lote.setForeground(4, QColor(color))
+                tooltip = f"Preparar: {', '.join(lote['patrones_a_preparar'])}" if lote['patrones'] else 'Ningún patrón vigente'
+                if lote['patrones_no_vigentes']:
+                    tooltip += f"\nRecalibrar antes: {', '.join(lote['patrones_no_vigentes'])}"
+                item_lote.setToolTip(1, tooltip)
+                for id_instrumento in lote['instrumentos']:
+                    item_inst = QTreeWidgetItem([id_instrumento, ', '.join(lote['asignacion'][id_instrumento]), '', '', ''])
+                    item_inst.setData(0, Qt.ItemDataRole.UserRole, id_instrumento)
+                    item_lote.addChild(item_inst)
+                item_semana.addChild(item_lote)
+            self.arbol_plan.addTopLevelItem(item_semana)
+            item_semana.setExpanded(True)
+
+        if plan['patrones_caducan']:
+            item_caducan = QTreeWidgetItem(['PATRONES QUE CADUCAN EN EL PLAN', '', '', '', str(len(plan['patrones_caducan']))])
+            item_caducan.setForeground(0, QColor('#ce9178'))
+            for p in plan['patrones_caducan']:
+                item_pat = QTreeWidgetItem([p['id'], p['familia'], '', p['vencimiento'], 'CADUCA'])
+                item_pat.setData(0, Qt.ItemDataRole.UserRole, p['id'])
+                item_caducan.addChild(item_pat)
+            self.arbol_plan.addTopLevelItem(item_caducan)
+
     def limpiar_ficha_instrumento(self):
         """Limpia el contenido de la ficha de instrumento al volver"""
         # ***<module>.MetrologiaApp.limpiar_ficha_instrumento: Failure: Different control flow
@@ -3011,6 +3183,7 @@ class MetrologiaApp(QMainWindow):
                 w.setParent(None)
         self.current_elemento_id = None
         self.historial_actual = []
+        self.instrumento_actual = None
     def limpiar_ficha_patron(self):
         """Limpia el contenido de la ficha de patrón al volver"""
         # ***<module>.MetrologiaApp.limpiar_ficha_patron: Failure: Different control flow
@@ -3056,6 +3229,7 @@ class MetrologiaApp(QMainWindow):
                 
                 if ruta_a_borrar:
                     shutil.rmtree(ruta_a_borrar)
+                    registro_ids.aplicar_cambio(ruta_a_borrar, get_data_path('data'))
                     if hasattr(self, 'logger') and self.logger:
                         self.logger.log_event('PHYSICAL_DELETE', f'{id_elemento} borrado por {self.current_user}')
                     
@@ -3063,7 +3237,7 @@ class MetrologiaApp(QMainWindow):
                     
                     # Ejecutar re-indexación si la función existe
                     if generar_indices:
-                        generar_indices()
+                        generar_indices(base=get_data_path('data'))
                     
                     # Cambiar vista según el tipo
                     if tipo_folder == 'patrones':
@@ -3081,16 +3255,22 @@ class MetrologiaApp(QMainWindow):
                 self.log(f'Error crítico al borrar: {str(e)}')
 
     def ir_a_ficha_desde_proximos(self, item):
+        # 1. Obtener el ID del elemento desde la fila clicada
+        id_item = self.tabla_proximos.item(item.row(), 0)
+        if not id_item:
+            self.log("[ERROR] No se pudo obtener ID del elemento")
+            return
+        self.abrir_ficha_por_id(id_item.text())
+
+    def ir_a_ficha_desde_plan(self, item, columna=0):
+        """Abre la ficha de un instrumento o patrón del plan (las filas de semana y lote no tienen ID)"""
+        id_elemento = item.data(0, Qt.ItemDataRole.UserRole)
+        if id_elemento:
+            self.abrir_ficha_por_id(id_elemento)
+
+    def abrir_ficha_por_id(self, id_elemento):
         """Busca un elemento por ID en todas las carpetas y abre su ficha"""
         try:
-            # 1. Obtener el ID del elemento desde la fila clicada
-            fila = item.row()
-            id_item = self.tabla_proximos.item(fila, 0)
-            if not id_item:
-                self.log("[ERROR] No se pudo obtener ID del elemento")
-                return
-            id_elemento = id_item.text()
-            
             self.log(f"[DEBUG] Buscando elemento: {id_elemento}")
             
             tipo_encontrado = None